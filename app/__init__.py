@@ -2,6 +2,7 @@ from flask import Flask
 import os
 import json
 from spotipy.oauth2 import SpotifyOAuth
+from app.auth import MemoryFirstCacheHandler, TokenManager
 from flask_cors import CORS
 
 app = Flask(__name__, template_folder = r'E:/Spotify/templates', static_folder=r'E:/Spotify/static')
@@ -15,19 +16,55 @@ with open('./settings.json') as config_file:
 CLIENT_ID = config['CLIENT_ID']
 CLIENT_SECRET = config['CLIENT_SECRET']
 REDIRECT_URI = config['REDIRECT_URI']
-SCOPE = 'user-read-private user-read-email'
+# Optional SQLite-backed query engine for library analytics
+USE_SQLITE_LIBRARY_STORE = config.get('USE_SQLITE_LIBRARY_STORE', False)
+# Base URL of the Spotify Web API, overridable to point at a local fake API for load tests
+SPOTIFY_API_PREFIX = config.get('SPOTIFY_API_PREFIX', 'https://api.spotify.com/v1/')
+# Directory of the shared-memory cache published by a loader process, for multi-worker deployments
+SHARED_CACHE_DIR = config.get('SHARED_CACHE_DIR')
+# Opt-in request profiling: single requests carrying the admin token, and a fraction of traffic to sample
+PROFILING_ENABLED = config.get('PROFILING_ENABLED', False)
+PROFILING_SAMPLE_RATE = config.get('PROFILING_SAMPLE_RATE', 0.0)
+PROFILING_DIR = config.get('PROFILING_DIR', 'profiles')
+# Durable job queue refreshes are handed to, run by `flask job-workers`; refreshes run inline if unset
+JOB_QUEUE_DB = config.get('JOB_QUEUE_DB')
+JOB_WORKERS = config.get('JOB_WORKERS', 2)
+# Token required by the admin routes, and to profile a request, in the X-Admin-Token header
+ADMIN_TOKEN = config.get('ADMIN_TOKEN')
+SCOPE = 'user-read-private user-read-email user-read-recently-played user-top-read playlist-modify-public playlist-modify-private'
+
+# Token file is read once, afterwards the token is served from memory
+token_cache_handler = MemoryFirstCacheHandler(cache_path='token_info.json')
 
 # Spotipy auth manager setup remains the same
 auth_manager = SpotifyOAuth(client_id=CLIENT_ID,
                             client_secret=CLIENT_SECRET,
                             redirect_uri=REDIRECT_URI,
                             scope=SCOPE,
-                            cache_path='token_info.json')
+                            cache_handler=token_cache_handler)
+
+# Keeps the token fresh in the background and answers validity checks from memory
+token_manager = TokenManager(auth_manager, token_cache_handler)
+token_manager.schedule_refresh()
 
 print("auth manager set up succesful")
 
+# Profiling hooks are only registered when configured, leaving the request path untouched otherwise
+request_profiler = None
+if PROFILING_ENABLED or PROFILING_SAMPLE_RATE:
+    from app.profiling import RequestProfiler
+    request_profiler = RequestProfiler(PROFILING_DIR, admin_token=ADMIN_TOKEN, sample_rate=PROFILING_SAMPLE_RATE)
+    request_profiler.register(app)
+
 ## Initialize global cache
-from app.utils import initialize_global_cache
-from app import routes
+from app.utils import initialize_global_cache, attach_shared_cache, attach_job_queue
+from app import routes, commands
+
+if SHARED_CACHE_DIR:
+    # Workers map the cache published by `flask shared-cache-loader` instead of loading their own
+    attach_shared_cache(SHARED_CACHE_DIR)
+else:
+    initialize_global_cache()
 
-initialize_global_cache()
\ No newline at end of file
+if JOB_QUEUE_DB:
+    attach_job_queue(JOB_QUEUE_DB)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import logging
+import threading
+from collections import Counter
+
+# Fixed-bin histograms so distributions can be updated incrementally: (min, max, number of bins)
+FEATURE_HISTOGRAM_BINS = {
+    'energy': (0.0, 1.0, 10),
+    'danceability': (0.0, 1.0, 10),
+    'valence': (0.0, 1.0, 10),
+    'acousticness': (0.0, 1.0, 10),
+    'instrumentalness': (0.0, 1.0, 10),
+    'speechiness': (0.0, 1.0, 10),
+    'liveness': (0.0, 1.0, 10),
+    'tempo': (0.0, 250.0, 25),
+    'loudness': (-60.0, 0.0, 12),
+}
+
+TOP_GENRES_LIMIT = 50
+TOP_ARTISTS_LIMIT = 50
+
+
+def _top_counts(counter, limit):
+    # Ties broken by key so incremental updates and rebuilds rank identically
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def _histogram_bin(value, low, high, num_bins):
+    position = int((value - low) / (high - low) * num_bins)
+    return min(max(position, 0), num_bins - 1)
+
+
+def _artist_key(artist):
+    # The fields of an artist the aggregates depend on
+    return (artist.get('name'), artist.get('genre')) if artist else None
+
+
+def _track_key(track):
+    # The fields of a track the aggregates depend on
+    return track.get('artists'), track.get('release_date'), track.get('audio_features')
+
+
+class LibraryAnalytics:
+    """
+    Library-wide aggregates (genre distribution, release decades, artist frequency and audio feature
+    distributions) maintained with Counter reductions.
+
+    The aggregates are built in a single pass over the tracks at refresh time and then updated
+    incrementally from the tracks added or removed by later refreshes. The response payload is
+    precomputed, so serving it costs the same regardless of library size.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.genre_counts = Counter()
+        self.decade_counts = Counter()
+        self.artist_counts = Counter()
+        self.artist_names = {}
+        self.feature_histograms = {feature: Counter() for feature in FEATURE_HISTOGRAM_BINS}
+        self.feature_sums = Counter()
+        self.feature_counts = Counter()
+        self.num_tracks = 0
+        self._snapshot = None
+
+    def _apply_track(self, track, artists_details, sign):
+        """Adds (sign=1) or removes (sign=-1) the contribution of a single track."""
+        self.num_tracks += sign
+
+        try:
+            release_year = int(track['release_date'][:4])
+            if release_year > 0:
+                self.decade_counts[release_year // 10 * 10] += sign
+        except (KeyError, TypeError, ValueError):
+            pass  # Handle tracks without release dates
+
+        # A genre counts once per track, even if several of its artists share it
+        track_genres = set()
+        for artist_id in track.get('artists', []):
+            self.artist_counts[artist_id] += sign
+            artist = artists_details.get(artist_id)
+            if artist:
+                self.artist_names[artist_id] = artist['name']
+                track_genres.update(artist.get('genre', []))
+        for genre in track_genres:
+            self.genre_counts[genre] += sign
+
+        audio_features = track.get('audio_features')
+        if audio_features:
+            for feature, (low, high, num_bins) in FEATURE_HISTOGRAM_BINS.items():
+                value = audio_features.get(feature)
+                if value is None:
+                    continue
+                self.feature_histograms[feature][_histogram_bin(value, low, high, num_bins)] += sign
+                self.feature_sums[feature] += sign * value
+                self.feature_counts[feature] += sign
+
+    def rebuild(self, tracks_details, artists_details):
+        """
+        Recomputes every aggregate in a single pass over the tracks.
+
+        Args:
+        - tracks_details (dict): Tracks keyed by track ID, as held in the cache.
+        - artists_details (dict): Artists keyed by artist ID, as held in the cache.
+        """
+        with self._lock:
+            self._reset_counters()
+            for track in tracks_details.values():
+                self._apply_track(track, artists_details, 1)
+            self._snapshot = None
+        logging.info(f"Library analytics rebuilt over {self.num_tracks} tracks.")
+
+    def _reset_counters(self):
+        self.genre_counts.clear()
+        self.decade_counts.clear()
+        self.artist_counts.clear()
+        self.artist_names.clear()
+        for histogram in self.feature_histograms.values():
+            histogram.clear()
+        self.feature_sums.clear()
+        self.feature_counts.clear()
+        self.num_tracks = 0
+
+    def apply_refresh(self, old_tracks, old_artists, new_tracks, new_artists):
+        """
+        Updates the aggregates from one cache generation to the next, touching only the tracks that
+        were added, removed, changed (artists, release date or audio features), or that reference an
+        artist that was added, removed, or whose name or genres changed.
+
+        Args:
+        - old_tracks, old_artists (dict): Tracks and artists of the previous cache generation.
+        - new_tracks, new_artists (dict): Tracks and artists of the new cache generation.
+        """
+        changed_artist_ids = {
+            artist_id for artist_id in old_artists.keys() | new_artists.keys()
+            if _artist_key(old_artists.get(artist_id)) != _artist_key(new_artists.get(artist_id))
+        }
+
+        removed_ids = [track_id for track_id in old_tracks if track_id not in new_tracks]
+        added_ids = [track_id for track_id in new_tracks if track_id not in old_tracks]
+        # Re-apply kept tracks that changed or credit a changed artist
+        kept_ids = [track_id for track_id, track in new_tracks.items()
+                    if track_id in old_tracks and (
+                        _track_key(old_tracks[track_id]) != _track_key(track)
+                        or changed_artist_ids.intersection(old_tracks[track_id].get('artists', []))
+                        or changed_artist_ids.intersection(track.get('artists', [])))]
+        removed_ids.extend(kept_ids)
+        added_ids.extend(kept_ids)
+
+        with self._lock:
+            for track_id in removed_ids:
+                self._apply_track(old_tracks[track_id], old_artists, -1)
+            for track_id in added_ids:
+                self._apply_track(new_tracks[track_id], new_artists, 1)
+            for artist_id in changed_artist_ids - new_artists.keys():
+                self.artist_names.pop(artist_id, None)
+            self._remove_empty_counts()
+            self._snapshot = None
+        logging.info(
+            f"Library analytics updated incrementally: {len(added_ids)} tracks applied, {len(removed_ids)} retracted.")
+
+    def _remove_empty_counts(self):
+        for counter in (self.genre_counts, self.decade_counts, self.artist_counts):
+            for key in [key for key, count in counter.items() if count <= 0]:
+                del counter[key]
+        for artist_id in [artist_id for artist_id in self.artist_names if artist_id not in self.artist_counts]:
+            del self.artist_names[artist_id]
+
+    def snapshot(self):
+        """
+        Returns the precomputed analytics payload, building it once per change of the aggregates.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._build_snapshot()
+            return self._snapshot
+
+    def _build_snapshot(self):
+        feature_distributions = {}
+        for feature, (low, high, num_bins) in FEATURE_HISTOGRAM_BINS.items():
+            bin_width = (high - low) / num_bins
+            histogram = self.feature_histograms[feature]
+            feature_distributions[feature] = {
+                'bins': [round(low + i * bin_width, 4) for i in range(num_bins + 1)],
+                'counts': [histogram[i] for i in range(num_bins)],
+                'mean': round(self.feature_sums[feature] / self.feature_counts[feature], 4) if self.feature_counts[feature] else None,
+            }
+
+        return {
+            'num_tracks': self.num_tracks,
+            'num_genres': len(self.genre_counts),
+            'genre_distribution': [
+                {'genre': genre, 'tracks': count} for genre, count in _top_counts(self.genre_counts, TOP_GENRES_LIMIT)],
+            'release_decades': [
+                {'decade': f"{decade}s", 'tracks': self.decade_counts[decade]} for decade in sorted(self.decade_counts)],
+            'top_artists': [
+                {'id': artist_id, 'name': self.artist_names.get(artist_id), 'tracks': count}
+                for artist_id, count in _top_counts(self.artist_counts, TOP_ARTISTS_LIMIT)],
+            'audio_feature_distributions': feature_distributions,
+        }
@@ -0,0 +1,231 @@
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from flask import send_file
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow, artwork is cached at its original size
+    Image = None
+
+# Thumbnail sizes served, requested sizes are rounded up to the next one
+ARTWORK_SIZES = (64, 160, 300, 640)
+DEFAULT_ARTWORK_SIZE = 300
+
+ARTWORK_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# Evict down to this share of the limit, so evictions happen in batches rather than on every insert
+EVICTION_TARGET_RATIO = 0.9
+# Access times are only written back this often per thumbnail, keeping hits read-only
+ACCESS_TIME_RESOLUTION_SECONDS = 60
+FETCH_TIMEOUT_SECONDS = 10
+JPEG_QUALITY = 85
+# Artwork rarely changes, browsers keep it for a week and revalidate by content hash afterwards
+ARTWORK_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    entity_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    mimetype TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS thumbnails (
+    url TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (url, size)
+);
+CREATE INDEX IF NOT EXISTS blobs_by_access ON blobs (last_access);
+CREATE INDEX IF NOT EXISTS thumbnails_by_digest ON thumbnails (digest);
+"""
+
+
+def snap_artwork_size(size):
+    """Rounds a requested size up to the nearest served thumbnail size."""
+    for artwork_size in ARTWORK_SIZES:
+        if size <= artwork_size:
+            return artwork_size
+    return ARTWORK_SIZES[-1]
+
+
+def resize_image(image_bytes, size):
+    """
+    Resizes an image to fit in a size x size box, as JPEG.
+
+    Returns:
+    A (bytes, mimetype) tuple. The original bytes are returned if Pillow is not installed or the
+    image is already small enough.
+    """
+    if Image is None:
+        return image_bytes, None
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        if max(image.size) <= size:
+            return image_bytes, Image.MIME.get(image.format)
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.convert('RGB').save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue(), 'image/jpeg'
+
+
+def artwork_response(artwork):
+    """
+    Builds the response serving a thumbnail returned by ArtworkCache.get, with its digest as strong
+    ETag so a matching If-None-Match is answered with 304 Not Modified. Must run in a request context.
+    """
+    path, mimetype, digest = artwork
+    response = send_file(path, mimetype=mimetype, etag=digest, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={ARTWORK_MAX_AGE_SECONDS}'
+    return response
+
+
+class ArtworkCache:
+    """
+    Disk cache of resized artwork. Each image is fetched from Spotify's CDN once per size, and the
+    thumbnails are stored content-addressed (named by the SHA-256 of their bytes) so identical
+    artwork shared by several albums or sizes is kept once. The least recently used thumbnails are
+    evicted once the cache grows past its size limit.
+
+    The index lives in SQLite next to the files, so every worker process shares the same cache.
+    """
+
+    def __init__(self, directory, max_bytes=ARTWORK_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._last_access_written = {}
+        self._session = requests.Session()
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def register_sources(self, image_urls):
+        """
+        Records the image URL of each entity, so artwork can be requested by playlist, track or artist ID.
+
+        Args:
+        - image_urls (dict): Image URLs keyed by entity ID, entries without a URL are skipped.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?)",
+                ((entity_id, url) for entity_id, url in image_urls.items() if url))
+
+    def source_url(self, entity_id):
+        with self._lock:
+            row = self._conn.execute("SELECT url FROM sources WHERE entity_id = ?", (entity_id,)).fetchone()
+        return row[0] if row else None
+
+    def _lookup(self, url, size):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT b.digest, b.mimetype FROM thumbnails t JOIN blobs b ON b.digest = t.digest "
+                "WHERE t.url = ? AND t.size = ?", (url, size)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - self._last_access_written.get(row[0], 0) > ACCESS_TIME_RESOLUTION_SECONDS:
+                self._last_access_written[row[0]] = now
+                with self._conn:
+                    self._conn.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, row[0]))
+        path = self._blob_path(row[0])
+        return (path, row[1], row[0]) if os.path.exists(path) else None
+
+    def _store(self, url, size, image_bytes, mimetype):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, path)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)", (digest, mimetype, len(image_bytes), time.time()))
+            self._conn.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?)", (url, size, digest))
+        self._evict(keep_digest=digest)
+        return path, mimetype, digest
+
+    def _evict(self, keep_digest=None):
+        with self._lock:
+            total_bytes = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM blobs").fetchone()[0]
+            if total_bytes <= self.max_bytes:
+                return
+            target_bytes = self.max_bytes * EVICTION_TARGET_RATIO
+            evicted = []
+            for digest, size_bytes in self._conn.execute("SELECT digest, size_bytes FROM blobs ORDER BY last_access"):
+                if total_bytes <= target_bytes:
+                    break
+                if digest == keep_digest:
+                    # Never evict the thumbnail about to be served
+                    continue
+                evicted.append(digest)
+                total_bytes -= size_bytes
+            with self._conn:
+                self._conn.executemany("DELETE FROM thumbnails WHERE digest = ?", ((digest,) for digest in evicted))
+                self._conn.executemany("DELETE FROM blobs WHERE digest = ?", ((digest,) for digest in evicted))
+        for digest in evicted:
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+        logging.info(f"Artwork cache evicted {len(evicted)} thumbnails.")
+
+    def get(self, entity_id, size=DEFAULT_ARTWORK_SIZE):
+        """
+        Returns the thumbnail of an entity's artwork, fetching and resizing it on first request.
+
+        Args:
+        - entity_id (str): Playlist, track or artist ID.
+        - size (int): Requested size in pixels, rounded up to one of ARTWORK_SIZES.
+
+        Returns:
+        A (file path, mimetype, digest) tuple, or None if the entity has no known artwork.
+        """
+        url = self.source_url(entity_id)
+        if url is None:
+            return None
+        size = snap_artwork_size(size)
+
+        cached = self._lookup(url, size)
+        if cached is not None:
+            return cached
+
+        # One fetch per thumbnail, concurrent requests for it wait and then hit the cache
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault((url, size), threading.Lock())
+        with fetch_lock:
+            cached = self._lookup(url, size)
+            if cached is not None:
+                return cached
+
+            response = self._session.get(url, timeout=FETCH_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            image_bytes, mimetype = resize_image(response.content, size)
+            mimetype = mimetype or response.headers.get('Content-Type', 'image/jpeg')
+            stored = self._store(url, size, image_bytes, mimetype)
+
+        with self._lock:
+            self._fetch_locks.pop((url, size), None)
+        return stored
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,98 @@
+import logging
+import re
+
+from app import token_manager, utils, services, SPOTIFY_API_PREFIX
+from app.async_spotify import AsyncSpotifyClient
+from app.serialization import dumps
+
+
+def _json_body(payload):
+    return dumps(payload)
+
+
+async def get_user_account_details(client):
+    """
+    Async endpoint to get Spotify user details.
+    """
+    try:
+        user_details = await services.get_user_profile_async(client)
+        logging.info("Successfully fetched user details.")
+        return 200, user_details
+    except Exception as e:
+        logging.error(f"Failed to fetch user details: {e}")
+        return 500, {'error': str(e)}
+
+
+async def get_track_by_id(client, track_id):
+    """
+    Async endpoint fetching details for a track by its Spotify ID, from the cache or else from Spotify.
+    """
+    try:
+        track_info = utils.get_track_information_from_cache(track_id)
+        if track_info is None:
+            logging.info(f"Cache miss for track ID {track_id}. Checking Spotify.")
+            track_info = utils.format_spotify_track(await client.track(track_id))
+
+        logging.info(f"Track for ID {track_id} retrieved successfully.")
+        return 200, track_info
+    except Exception as e:
+        logging.error(f"Failed to fetch track for ID {track_id}: {e}")
+        return 500, {'error': str(e)}
+
+
+# I/O-bound endpoints served natively on the event loop, everything else goes to the Flask app
+ASYNC_ROUTES = [
+    (re.compile(r'^/get-user-details/?$'), get_user_account_details),
+    (re.compile(r'^/get-track/(?P<track_id>[^/]+)$'), get_track_by_id),
+]
+
+
+class AsyncRouter:
+    """
+    ASGI application serving the Spotify-bound endpoints with an async client, so waiting on the
+    Spotify API does not hold a worker thread. Requests it does not handle are passed to `fallback`,
+    typically the Flask app wrapped with asgiref's WsgiToAsgi.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.client = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, handler in ASYNC_ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    status, payload = await handler(self._get_client(), **match.groupdict())
+                    return await self._send_json(send, status, payload)
+
+        return await self.fallback(scope, receive, send)
+
+    def _get_client(self):
+        if self.client is None:
+            self.client = AsyncSpotifyClient(token_manager, prefix=SPOTIFY_API_PREFIX)
+        return self.client
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.client is not None:
+                    await self.client.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _send_json(send, status, payload):
+        body = _json_body(payload)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
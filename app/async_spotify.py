@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+try:
+    import httpx
+except ImportError:  # Async serving mode is optional
+    httpx = None
+
+# Upper bound on pooled upstream connections shared by all in-flight requests
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 50
+REQUEST_TIMEOUT_SECONDS = 30
+MAX_RETRIES = 3
+
+
+class AsyncSpotifyError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"Spotify API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class AsyncSpotifyClient:
+    """
+    Minimal asyncio Spotify Web API client for the routes served natively on the event loop
+    (current_user, track). All requests share one pooled httpx.AsyncClient, so a single process can
+    keep hundreds of slow upstream calls in flight.
+    """
+
+    def __init__(self, token_manager, prefix='https://api.spotify.com/v1/'):
+        if httpx is None:
+            raise RuntimeError("The async serving mode requires httpx, install it with `pip install httpx`.")
+        self.token_manager = token_manager
+        self.prefix = prefix
+        self._client = httpx.AsyncClient(
+            base_url=prefix,
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS))
+
+    async def _get(self, url, params=None):
+        for attempt in range(MAX_RETRIES + 1):
+            token_info = self.token_manager.get_token() or {}
+            response = await self._client.get(
+                url, params=params, headers={'Authorization': f"Bearer {token_info.get('access_token', '')}"})
+
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                # Rate limited, wait as long as Spotify asks before retrying
+                retry_after = int(response.headers.get('Retry-After', 1))
+                logging.warning(f"Spotify rate limit hit, retrying in {retry_after} seconds.")
+                await asyncio.sleep(retry_after)
+                continue
+            if response.status_code >= 400:
+                raise AsyncSpotifyError(response.status_code, response.text)
+            return response.json()
+
+    async def current_user(self):
+        return await self._get('me')
+
+    async def track(self, track_id):
+        return await self._get(f'tracks/{track_id}')
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+
+from spotipy.cache_handler import CacheFileHandler, CacheHandler
+
+# Refresh the access token this many seconds before it expires
+REFRESH_AHEAD_SECONDS = 300
+
+# Retry delay when a background refresh fails
+REFRESH_RETRY_SECONDS = 30
+
+
+class MemoryFirstCacheHandler(CacheHandler):
+    """
+    Token cache handler that reads the token file once and then serves the token from memory.
+    New tokens are written through to the file so they survive restarts.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._file_handler = CacheFileHandler(cache_path=cache_path)
+        self._lock = threading.Lock()
+        self._token_info = self._file_handler.get_cached_token()
+
+    def get_cached_token(self):
+        with self._lock:
+            return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        with self._lock:
+            self._token_info = token_info
+            self._file_handler.save_token_to_cache(token_info)
+
+    def clear(self):
+        """Forgets the token and removes the token file."""
+        with self._lock:
+            self._token_info = None
+            if os.path.exists(self.cache_path):
+                os.remove(self.cache_path)
+
+
+class TokenManager:
+    """
+    Keeps the OAuth token state in memory, answers validity checks without any I/O and refreshes the
+    access token in the background ahead of its expiry. Refreshes are single-flight: concurrent callers
+    wait for the refresh already in progress instead of starting their own. The background refresh is
+    scheduled under the same lock, so there is only ever one timer, and a timer superseded while it was
+    waiting for the lock does nothing.
+    """
+
+    def __init__(self, auth_manager, cache_handler):
+        self.auth_manager = auth_manager
+        self.cache_handler = cache_handler
+        # Reentrant, refreshing reschedules the timer while holding it
+        self._refresh_lock = threading.RLock()
+        self._timer = None
+        self._timer_generation = 0
+
+    def get_token(self):
+        """Returns the current token info dictionary, or None if the user is not authenticated."""
+        return self.cache_handler.get_cached_token()
+
+    def is_valid(self):
+        """Checks the in-memory token expiry, refreshing first if the token is about to expire."""
+        token_info = self.get_token()
+        if not token_info:
+            return False
+        if token_info.get('expires_at', 0) - time.time() < 60:
+            token_info = self.refresh()
+        return bool(token_info) and token_info.get('expires_at', 0) > time.time()
+
+    def refresh(self, force=False):
+        """
+        Refreshes the access token, unless another thread refreshed it while this one was waiting.
+
+        Args:
+        - force: Refresh even if the token is not close to expiry yet.
+
+        Returns:
+        The current token info dictionary, or None if there is no token to refresh.
+        """
+        with self._refresh_lock:
+            token_info = self.get_token()
+            if not token_info or not token_info.get('refresh_token'):
+                return None
+            if not force and token_info.get('expires_at', 0) - time.time() > REFRESH_AHEAD_SECONDS:
+                return token_info
+
+            try:
+                token_info = self.auth_manager.refresh_access_token(token_info['refresh_token'])
+                logging.info("Spotify access token refreshed.")
+            except Exception as e:
+                logging.error(f"Failed to refresh Spotify access token: {e}")
+                self._schedule(REFRESH_RETRY_SECONDS)
+                return self.get_token()
+
+            self.schedule_refresh()
+            return token_info
+
+    def schedule_refresh(self):
+        """Schedules the next background refresh shortly before the current token expires."""
+        with self._refresh_lock:
+            token_info = self.get_token()
+            if not token_info:
+                return
+            self._schedule(max(token_info.get('expires_at', 0) - time.time() - REFRESH_AHEAD_SECONDS, 0))
+
+    def _schedule(self, delay):
+        # Called with the refresh lock held
+        self._cancel_timer()
+        self._timer = threading.Timer(delay, self._scheduled_refresh, args=(self._timer_generation,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        # A timer that already fired cannot be cancelled, bumping the generation makes it a no-op
+        self._timer_generation += 1
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _scheduled_refresh(self, generation):
+        with self._refresh_lock:
+            if generation != self._timer_generation:
+                # Another refresh rescheduled the timer while this one was waiting for the lock
+                return
+            self.refresh(force=True)
+
+    def clear(self):
+        """Cancels the background refresh and forgets the token, e.g. on logout."""
+        with self._refresh_lock:
+            self._cancel_timer()
+            self.cache_handler.clear()
@@ -0,0 +1,124 @@
+import logging
+import sqlite3
+import threading
+import time
+
+CHANGE_ENTITIES = ('playlists', 'tracks', 'artists')
+ADDED, REMOVED, UPDATED = 'added', 'removed', 'updated'
+
+# Generations kept in the log, clients further behind must resync in full
+RETAINED_GENERATIONS = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    generation INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    generation INTEGER NOT NULL,
+    entity TEXT NOT NULL,
+    action TEXT NOT NULL,
+    id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_by_generation ON changes (generation);
+"""
+
+
+def diff_entities(old_entities, new_entities):
+    """
+    Compares two generations of an entity dictionary.
+
+    Returns:
+    A list of (action, ID) tuples for the added, removed and updated entities.
+    """
+    changes = [(ADDED, entity_id) for entity_id in new_entities.keys() - old_entities.keys()]
+    changes += [(REMOVED, entity_id) for entity_id in old_entities.keys() - new_entities.keys()]
+    changes += [
+        (UPDATED, entity_id) for entity_id, entity in new_entities.items()
+        if entity_id in old_entities and old_entities[entity_id] != entity]
+    return changes
+
+
+class ChangeLog:
+    """
+    SQLite-backed log of the playlists, tracks and artists added, removed or updated by each cache
+    generation. Only IDs are logged, so a generation costs a row per changed entity regardless of
+    library size, and clients sync by refetching just the changed entities.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @property
+    def latest_generation(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(generation) FROM generations").fetchone()
+        return row[0] or 0
+
+    @property
+    def oldest_generation(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(generation) FROM generations").fetchone()
+        return row[0] or 0
+
+    def record(self, generation, changes):
+        """
+        Records the changes made by a generation and prunes generations beyond RETAINED_GENERATIONS.
+
+        Args:
+        - generation (int): The new cache generation.
+        - changes (dict): Lists of (action, ID) tuples keyed by entity name.
+        """
+        rows = [(generation, entity, action, entity_id)
+                for entity, entity_changes in changes.items() for action, entity_id in entity_changes]
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO generations VALUES (?, ?)", (generation, time.time()))
+            self._conn.execute("DELETE FROM changes WHERE generation = ?", (generation,))
+            self._conn.executemany("INSERT INTO changes VALUES (?, ?, ?, ?)", rows)
+            oldest_kept = generation - RETAINED_GENERATIONS + 1
+            self._conn.execute("DELETE FROM generations WHERE generation < ?", (oldest_kept,))
+            self._conn.execute("DELETE FROM changes WHERE generation < ?", (oldest_kept,))
+        logging.info(f"Change log: generation {generation} recorded with {len(rows)} changes.")
+
+    def changes_since(self, since):
+        """
+        Folds every change made after generation `since` into the net change per entity: an entity
+        added then removed is left out, added then updated is reported as added, and so on.
+
+        Returns:
+        A dictionary with the latest 'version', whether a 'full_resync' is needed because `since` is
+        older than the log, and the added, removed and updated IDs per entity.
+        """
+        latest_generation = self.latest_generation
+        if since < self.oldest_generation - 1 or since > latest_generation:
+            return {'version': latest_generation, 'full_resync': True, 'changes': None}
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entity, action, id FROM changes WHERE generation > ? ORDER BY generation, rowid",
+                (since,)).fetchall()
+
+        first_and_last_actions = {}
+        for entity, action, entity_id in rows:
+            first_action = first_and_last_actions.get((entity, entity_id), (action, None))[0]
+            first_and_last_actions[(entity, entity_id)] = (first_action, action)
+
+        changes = {entity: {ADDED: [], REMOVED: [], UPDATED: []} for entity in CHANGE_ENTITIES}
+        for (entity, entity_id), (first_action, last_action) in first_and_last_actions.items():
+            if last_action == REMOVED:
+                if first_action != ADDED:
+                    changes[entity][REMOVED].append(entity_id)
+            elif first_action == ADDED:
+                changes[entity][ADDED].append(entity_id)
+            else:
+                changes[entity][UPDATED].append(entity_id)
+        return {'version': latest_generation, 'full_resync': False, 'changes': changes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,253 @@
+import logging
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Audio features clustered on, with the (min, max) used to bring each onto a 0-1 scale
+CLUSTER_FEATURES = {
+    'danceability': (0.0, 1.0),
+    'energy': (0.0, 1.0),
+    'valence': (0.0, 1.0),
+    'acousticness': (0.0, 1.0),
+    'instrumentalness': (0.0, 1.0),
+    'speechiness': (0.0, 1.0),
+    'tempo': (0.0, 250.0),
+    'loudness': (-60.0, 0.0),
+}
+
+NUM_CLUSTERS = 12
+BATCH_SIZE = 1024
+# A cold start needs more passes than a warm start from the previous refresh's centroids
+COLD_START_ITERATIONS = 100
+WARM_START_ITERATIONS = 20
+
+# Genres grouped together when at least this share of the rarer genre's tracks also carry the other
+GENRE_ASSOCIATION_THRESHOLD = 0.3
+MAX_GROUPED_GENRES = 300
+TOP_CLUSTER_GENRES = 5
+
+
+def _nearest_centroids(points, centroids):
+    # Squared distances without materializing the points x centroids x features array
+    distances = (
+        (points ** 2).sum(axis=1)[:, None]
+        - 2 * points @ centroids.T
+        + (centroids ** 2).sum(axis=1)[None, :])
+    return distances.argmin(axis=1)
+
+
+def _kmeans_plus_plus(points, num_clusters, rng):
+    centroids = [points[rng.integers(len(points))]]
+    closest_distances = ((points - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, num_clusters):
+        total = closest_distances.sum()
+        if total == 0:
+            break
+        centroids.append(points[rng.choice(len(points), p=closest_distances / total)])
+        closest_distances = np.minimum(closest_distances, ((points - centroids[-1]) ** 2).sum(axis=1))
+    return np.array(centroids, dtype=np.float32)
+
+
+def mini_batch_kmeans(points, num_clusters, initial_centroids=None, initial_counts=None,
+                      iterations=COLD_START_ITERATIONS, batch_size=BATCH_SIZE, seed=0):
+    """
+    Mini-batch k-means: each iteration assigns a random batch to its nearest centroids and moves them
+    towards the batch with a per-centroid learning rate that decays as the centroid absorbs points.
+
+    Args:
+    - points (np.ndarray): (n, d) float32 matrix.
+    - num_clusters (int): Number of clusters, capped at the number of points.
+    - initial_centroids (np.ndarray): Centroids to warm start from, k-means++ seeding otherwise.
+    - initial_counts (np.ndarray): Number of points each initial centroid already absorbed, typically
+      the previous cluster sizes. Without them the first batch replaces the warm-start centroids
+      outright, since a centroid's first learning rate is 1.
+
+    Returns:
+    A (centroids, labels) tuple, labels being the nearest centroid of every point.
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = min(num_clusters, len(points))
+    if num_clusters == 0:
+        return np.empty((0, points.shape[1]), dtype=np.float32), np.empty(0, dtype=np.uint8)
+
+    counts = np.zeros(num_clusters, dtype=np.float64)
+    if initial_centroids is not None and len(initial_centroids) == num_clusters:
+        centroids = initial_centroids.astype(np.float32, copy=True)
+        if initial_counts is not None and len(initial_counts) == num_clusters:
+            counts[:] = initial_counts
+    else:
+        sample = points[rng.choice(len(points), size=min(len(points), 10 * BATCH_SIZE), replace=False)]
+        centroids = _kmeans_plus_plus(sample, num_clusters, rng)
+        num_clusters = len(centroids)
+        counts = np.zeros(num_clusters, dtype=np.float64)
+    for _ in range(iterations):
+        batch = points[rng.integers(len(points), size=min(batch_size, len(points)))]
+        labels = _nearest_centroids(batch, centroids)
+        batch_counts = np.bincount(labels, minlength=num_clusters)
+        batch_sums = np.zeros_like(centroids)
+        np.add.at(batch_sums, labels, batch)
+
+        updated = batch_counts > 0
+        counts[updated] += batch_counts[updated]
+        learning_rates = (batch_counts[updated] / counts[updated])[:, None]
+        batch_means = batch_sums[updated] / batch_counts[updated][:, None]
+        centroids[updated] += (learning_rates * (batch_means - centroids[updated])).astype(np.float32)
+
+    return centroids, _nearest_centroids(points, centroids).astype(np.uint8)
+
+
+def group_genres(artist_genres, artist_track_counts):
+    """
+    Groups genres that co-occur on the same artists. Genres are visited from the most to the least
+    common, each joining the group of the more common genre it co-occurs with most, as long as the
+    association is strong enough, and starting its own group otherwise.
+
+    Args:
+    - artist_genres (dict): Genre lists keyed by artist ID.
+    - artist_track_counts (Counter): Number of library tracks per artist ID, used as weights.
+
+    Returns:
+    A dictionary mapping every grouped genre to the name of its group (its most common genre).
+    """
+    genre_counts = Counter()
+    pair_counts = Counter()
+    for artist_id, genres in artist_genres.items():
+        weight = artist_track_counts.get(artist_id, 0)
+        if not weight or not genres:
+            continue
+        genre_counts.update({genre: weight for genre in genres})
+
+    top_genres = {genre for genre, _ in genre_counts.most_common(MAX_GROUPED_GENRES)}
+    for artist_id, genres in artist_genres.items():
+        weight = artist_track_counts.get(artist_id, 0)
+        genres = sorted(set(genres) & top_genres)
+        for index, genre in enumerate(genres):
+            for other_genre in genres[index + 1:]:
+                pair_counts[(genre, other_genre)] += weight
+
+    neighbours = defaultdict(list)
+    for (genre, other_genre), count in pair_counts.items():
+        neighbours[genre].append((other_genre, count))
+        neighbours[other_genre].append((genre, count))
+
+    genre_groups = {}
+    for genre in sorted(top_genres, key=lambda genre: (-genre_counts[genre], genre)):
+        best_group, best_association = None, GENRE_ASSOCIATION_THRESHOLD
+        for other_genre, count in neighbours[genre]:
+            if other_genre not in genre_groups:
+                continue
+            association = count / min(genre_counts[genre], genre_counts[other_genre])
+            if association >= best_association:
+                best_group, best_association = genre_groups[other_genre], association
+        genre_groups[genre] = best_group or genre
+    return genre_groups
+
+
+class LibraryClusters:
+    """
+    Mood clusters of the library's tracks by audio features, and groups of co-occurring genres.
+
+    Computed at refresh time. Assignments are kept as one uint8 label per track alongside the track
+    ID array. Re-clustering after a refresh is warm-started from the previous centroids, so it needs
+    a fraction of the cold-start iterations and clusters keep their numbers across refreshes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.track_ids = np.array([], dtype=object)
+        self.labels = np.array([], dtype=np.uint8)
+        self.centroids = None
+        self.cluster_sizes = None
+        self._summary = None
+
+    def rebuild(self, tracks_details, artists_details):
+        """
+        Re-clusters the library from the cache.
+
+        Args:
+        - tracks_details (dict): Tracks keyed by track ID, as held in the cache.
+        - artists_details (dict): Artists keyed by artist ID, as held in the cache.
+        """
+        track_ids, feature_rows, primary_artists = [], [], []
+        artist_track_counts = Counter()
+        for track_id, track in tracks_details.items():
+            artist_ids = track.get('artists', [])
+            artist_track_counts.update(artist_ids)
+            audio_features = track.get('audio_features')
+            if not audio_features:
+                continue
+            track_ids.append(track_id)
+            feature_rows.append([audio_features.get(feature) or 0 for feature in CLUSTER_FEATURES])
+            primary_artists.append(artist_ids[0] if artist_ids else None)
+        feature_ranges = np.array(list(CLUSTER_FEATURES.values()), dtype=np.float32)
+        points = np.array(feature_rows, dtype=np.float32).reshape(-1, len(CLUSTER_FEATURES))
+        points = (points - feature_ranges[:, 0]) / (feature_ranges[:, 1] - feature_ranges[:, 0])
+
+        warm_start = self.centroids is not None
+        centroids, labels = mini_batch_kmeans(
+            points, NUM_CLUSTERS, initial_centroids=self.centroids, initial_counts=self.cluster_sizes,
+            iterations=WARM_START_ITERATIONS if warm_start else COLD_START_ITERATIONS)
+
+        genre_groups = group_genres(
+            {artist_id: artist.get('genre', []) for artist_id, artist in artists_details.items()}, artist_track_counts)
+        summary = self._summarize(primary_artists, labels, centroids, artists_details, genre_groups)
+
+        with self._lock:
+            self.track_ids = np.array(track_ids, dtype=object)
+            self.labels = labels
+            self.centroids = centroids if len(centroids) else None
+            self.cluster_sizes = np.bincount(labels, minlength=len(centroids)) if len(centroids) else None
+            self._summary = summary
+        logging.info(f"Library clustered into {len(centroids)} clusters ({'warm' if warm_start else 'cold'} start).")
+
+    def _summarize(self, primary_artists, labels, centroids, artists_details, genre_groups):
+        # Tally the genre groups of each track's primary artist per cluster, counting every
+        # (cluster, artist) pair once with its number of tracks
+        artist_index = {}
+        artist_rows = np.array(
+            [artist_index.setdefault(artist_id, len(artist_index)) for artist_id in primary_artists], dtype=np.int64)
+        artist_ids = list(artist_index)
+        pairs, pair_counts = np.unique(labels.astype(np.int64) * max(len(artist_ids), 1) + artist_rows, return_counts=True)
+
+        cluster_genre_counts = [Counter() for _ in range(len(centroids))]
+        for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+            label, artist_row = divmod(pair, max(len(artist_ids), 1))
+            artist_genres = artists_details.get(artist_ids[artist_row], {}).get('genre', [])
+            for genre_group in {genre_groups[genre] for genre in artist_genres if genre in genre_groups}:
+                cluster_genre_counts[label][genre_group] += count
+
+        feature_ranges = np.array(list(CLUSTER_FEATURES.values()), dtype=np.float32)
+        cluster_sizes = np.bincount(labels, minlength=len(centroids))
+        clusters = []
+        for label, centroid in enumerate(centroids):
+            centroid_values = feature_ranges[:, 0] + centroid * (feature_ranges[:, 1] - feature_ranges[:, 0])
+            clusters.append({
+                'cluster': label,
+                'num_tracks': int(cluster_sizes[label]),
+                'centroid': {feature: round(float(value), 4) for feature, value in zip(CLUSTER_FEATURES, centroid_values)},
+                'top_genre_groups': [
+                    {'genre_group': genre_group, 'tracks': count}
+                    for genre_group, count in sorted(
+                        cluster_genre_counts[label].items(), key=lambda item: (-item[1], item[0]))[:TOP_CLUSTER_GENRES]]
+            })
+
+        grouped_genres = defaultdict(list)
+        for genre, genre_group in genre_groups.items():
+            grouped_genres[genre_group].append(genre)
+        return {
+            'clusters': clusters,
+            'genre_groups': [
+                {'name': genre_group, 'genres': sorted(genres)}
+                for genre_group, genres in sorted(grouped_genres.items(), key=lambda item: (-len(item[1]), item[0]))]
+        }
+
+    def snapshot(self):
+        """Returns the cluster summaries and genre groups."""
+        with self._lock:
+            return self._summary
+
+    def cluster_track_ids(self, label):
+        """Returns the IDs of the tracks assigned to a cluster."""
+        with self._lock:
+            return self.track_ids[self.labels == label].tolist()
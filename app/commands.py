@@ -0,0 +1,122 @@
+import logging
+import time
+import click
+from app import app, utils, SHARED_CACHE_DIR, JOB_QUEUE_DB, JOB_WORKERS
+from app.shared_cache import SharedCacheWriter
+from app.job_queue import JobQueue, WorkerPool, REFRESH, HYDRATE_ARTISTS, AUDIO_FEATURES, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from app.export import EXPORT_COLUMNS, EXPORT_FORMATS
+
+
+@app.cli.command('ingest-history')
+@click.argument('path', type=click.Path(exists=True))
+def ingest_history(path):
+    """Ingests a Spotify streaming history export (JSON file or directory) into the listening history store."""
+    ingestion_stats = utils.ingest_streaming_history_export(path)
+    logging.info(f"Ingested {ingestion_stats['added']} new plays out of {ingestion_stats['received']}.")
+
+
+@app.cli.command('export-library')
+@click.option('--entity', type=click.Choice(list(EXPORT_COLUMNS)), default='tracks', show_default=True)
+@click.option('--format', 'export_format', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), required=True)
+def export_library(entity, export_format, output):
+    """Exports an entity of the cached library to a CSV, NDJSON or Parquet file."""
+    chunks = utils.export_library(entity, export_format)
+    if chunks is None:
+        raise click.ClickException("The Spotify cache is not available.")
+    with open(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    logging.info(f"Exported {entity} to {output}.")
+
+
+@app.cli.command('shared-cache-loader')
+@click.option('--interval', default=60, show_default=True, help='Seconds between freshness checks.')
+def shared_cache_loader(interval):
+    """Builds the cache and publishes it to SHARED_CACHE_DIR for the worker processes, then keeps it fresh."""
+    if not SHARED_CACHE_DIR:
+        raise click.UsageError("SHARED_CACHE_DIR is not set in settings.json.")
+    if JOB_QUEUE_DB:
+        # The job workers own the cache then, and publish every generation they produce themselves
+        raise click.UsageError("JOB_QUEUE_DB is set in settings.json, the job workers publish the shared cache.")
+    from app.routes import sp
+
+    # The loader owns the cache, it must not read it back from the shared mapping
+    utils.detach_shared_cache()
+    utils.initialize_global_cache()
+    writer = SharedCacheWriter(SHARED_CACHE_DIR)
+
+    published_version = None
+    handled_refresh_requests = writer.refresh_requests
+    while True:
+        if writer.refresh_requests != handled_refresh_requests:
+            handled_refresh_requests = writer.refresh_requests
+            logging.info("Refresh requested by a worker.")
+            utils.get_spotify_cache_instance().invalidate()
+
+        utils.ensure_cache_data_freshness(sp)
+        if utils.get_cache_version() != published_version:
+            published_version = utils.get_cache_version()
+            writer.publish(utils.build_shared_resources())
+        time.sleep(interval)
+
+
+def job_worker_setup():
+    """Runs once in each job worker process: loads its own copy of the cache and returns the job handlers."""
+    from app.routes import sp
+
+    # Workers run the refreshes the web processes queue, inline and on the cache they own
+    utils.detach_job_queue()
+    utils.detach_shared_cache()
+    if utils.get_spotify_cache_instance() is None:
+        utils.initialize_global_cache()
+    writer = SharedCacheWriter(SHARED_CACHE_DIR) if SHARED_CACHE_DIR else None
+
+    def handler(run_job):
+        def run(user_id, payload):
+            version = utils.get_cache_version()
+            followups = run_job(sp, payload)
+            if writer is not None and utils.get_cache_version() != version:
+                writer.publish(utils.build_shared_resources())
+            return followups
+        return run
+
+    return {
+        REFRESH: handler(utils.run_refresh_job),
+        HYDRATE_ARTISTS: handler(utils.run_hydrate_artists_job),
+        AUDIO_FEATURES: handler(utils.run_audio_features_job),
+    }
+
+
+@app.cli.command('job-workers')
+@click.option('--processes', default=JOB_WORKERS, show_default=True, help='Number of worker processes.')
+@click.option('--interval', default=900, show_default=True, help='Seconds between background freshness checks.')
+def job_workers(processes, interval):
+    """Runs the job queue workers, restarting crashed ones, and queues background refreshes."""
+    if not JOB_QUEUE_DB:
+        raise click.UsageError("JOB_QUEUE_DB is not set in settings.json.")
+    from app.routes import sp
+
+    job_queue = JobQueue(JOB_QUEUE_DB)
+    pool = WorkerPool(JOB_QUEUE_DB, job_worker_setup, num_workers=processes)
+    pool.start()
+    writer = SharedCacheWriter(SHARED_CACHE_DIR) if SHARED_CACHE_DIR else None
+    handled_refresh_requests = writer.refresh_requests if writer is not None else 0
+    next_freshness_check = next_prune = 0
+    try:
+        while True:
+            pool.supervise(job_queue)
+            if writer is not None and writer.refresh_requests != handled_refresh_requests:
+                # Shared cache workers ask for refreshes through the control file
+                handled_refresh_requests = writer.refresh_requests
+                job_queue.enqueue(utils.get_job_user_id(sp), REFRESH, {'force': True}, priority=PRIORITY_INTERACTIVE)
+            if time.time() >= next_freshness_check:
+                # Keeps the cache fresh for users not currently using the app, the job is a no-op if it is
+                job_queue.enqueue(utils.get_job_user_id(sp), REFRESH, priority=PRIORITY_BACKGROUND)
+                next_freshness_check = time.time() + interval
+            if time.time() >= next_prune:
+                job_queue.prune()
+                next_prune = time.time() + 3600
+            time.sleep(5)
+    finally:
+        pool.stop()
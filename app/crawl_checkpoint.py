@@ -0,0 +1,266 @@
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.serialization import dumps, loads
+
+# Checkpoints older than this are discarded rather than resumed, the library has likely moved on
+MAX_CHECKPOINT_AGE_SECONDS = 6 * 3600
+
+# A crawl not recording anything for this long is presumed dead, and another process may take it over
+CRAWL_LEASE_SECONDS = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    started_at REAL NOT NULL,
+    playlists BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playlist_progress (
+    playlist_id TEXT PRIMARY KEY,
+    next_url TEXT,
+    complete INTEGER NOT NULL,
+    track_count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    track_id TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tracks (
+    track_id TEXT PRIMARY KEY,
+    details BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artists (
+    artist_id TEXT PRIMARY KEY,
+    details BLOB
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS crawl_owner (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+class CrawlLockedError(Exception):
+    """Raised when another process holds the crawl checkpoint."""
+
+
+class CrawlCheckpoint:
+    """
+    SQLite-backed progress of a library crawl, so a crawl interrupted by a failed Spotify call or a
+    process restart resumes where it stopped instead of starting over.
+
+    The playlist listing is recorded when the crawl starts. Every page of playlist tracks is then
+    recorded in one transaction together with the cursor of the next page, and every batch of artists
+    likewise, so the checkpoint never holds half a page. Nothing reaches the cache before the crawl
+    completes: the crawled library is read back from here in one go, and the checkpoint is cleared
+    once it is committed.
+
+    Web processes share the checkpoint file, so only one of them crawls into it at a time: acquire()
+    records this instance as the owner, and every write checks it in an immediate transaction and
+    refreshes the owner's heartbeat. A crawl whose owner wrote nothing for `lease_seconds` is taken over.
+    """
+
+    def __init__(self, db_path, lease_seconds=CRAWL_LEASE_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @contextmanager
+    def _immediate_transaction(self):
+        # BEGIN IMMEDIATE takes the database write lock up front, so what is read in the transaction
+        # cannot change under it before the writes depending on it are committed
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    @contextmanager
+    def _owned_transaction(self):
+        with self._immediate_transaction():
+            row = self._conn.execute("SELECT owner FROM crawl_owner").fetchone()
+            if row is None or row[0] != self.owner:
+                raise CrawlLockedError("The crawl checkpoint is held by another process.")
+            self._conn.execute("UPDATE crawl_owner SET heartbeat_at = ?", (time.time(),))
+            yield
+
+    def acquire(self):
+        """
+        Takes ownership of the checkpoint for a crawl, unless another process is crawling into it.
+
+        Returns:
+        True if this instance owns the checkpoint, False if another live crawl holds it.
+        """
+        with self._immediate_transaction():
+            row = self._conn.execute("SELECT owner, heartbeat_at FROM crawl_owner").fetchone()
+            if row is not None and row[0] != self.owner:
+                if time.time() - row[1] < self.lease_seconds:
+                    return False
+                logging.warning(f"Taking over the crawl checkpoint from an owner silent since {row[1]}.")
+            self._conn.execute("INSERT OR REPLACE INTO crawl_owner (id, owner, heartbeat_at) VALUES (1, ?, ?)",
+                               (self.owner, time.time()))
+        return True
+
+    def release(self):
+        """Gives up ownership of the checkpoint, once the crawl was committed or failed."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM crawl_owner WHERE owner = ?", (self.owner,))
+
+    def resume(self, committed_at=0, max_age_seconds=MAX_CHECKPOINT_AGE_SECONDS):
+        """
+        Returns the playlist listing of the crawl in progress, discarding a checkpoint that is too old
+        or whose crawl was already committed.
+
+        Args:
+        - committed_at (float): Timestamp of the last committed crawl, checkpoints started before it are stale.
+        - max_age_seconds (float): Maximum age of a resumable checkpoint.
+
+        Returns:
+        The playlist items recorded by start(), or None if there is no crawl to resume.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT started_at, playlists FROM crawl").fetchone()
+        if row is None:
+            return None
+        started_at, playlists = row
+        if started_at < committed_at or time.time() - started_at > max_age_seconds:
+            logging.info(f"Discarding crawl checkpoint started at {started_at}.")
+            self.clear()
+            return None
+        return loads(playlists)
+
+    def start(self, playlist_items):
+        """Starts a new checkpoint for a crawl of the given playlist items, dropping any previous one."""
+        with self._owned_transaction():
+            self._clear()
+            self._conn.execute("INSERT INTO crawl (id, started_at, playlists) VALUES (1, ?, ?)",
+                               (time.time(), dumps(playlist_items)))
+
+    def restart_changed_playlists(self, playlist_items):
+        """
+        Brings a resumed checkpoint up to date with the current playlist listing. The progress of every
+        playlist whose snapshot ID changed since it was recorded, or which is no longer listed, is
+        dropped, so changed playlists are crawled again from their first page.
+
+        Args:
+        - playlist_items (list): The current playlist items, replacing the recorded listing.
+
+        Returns:
+        The IDs of the playlists whose progress was dropped.
+        """
+        with self._owned_transaction():
+            row = self._conn.execute("SELECT playlists FROM crawl").fetchone()
+            recorded_snapshots = {item.get('id'): item.get('snapshot_id') for item in loads(row[0])} if row else {}
+            current_snapshots = {item.get('id'): item.get('snapshot_id') for item in playlist_items}
+            restarted = [playlist_id for playlist_id, snapshot_id in recorded_snapshots.items()
+                         if playlist_id not in current_snapshots or current_snapshots[playlist_id] != snapshot_id]
+            for table in ('playlist_progress', 'playlist_tracks'):
+                self._conn.executemany(f"DELETE FROM {table} WHERE playlist_id = ?",
+                                       ((playlist_id,) for playlist_id in restarted))
+            self._conn.execute("UPDATE crawl SET playlists = ?", (dumps(playlist_items),))
+        return restarted
+
+    def playlist_progress(self, playlist_id):
+        """
+        Returns the crawl progress of a playlist.
+
+        Returns:
+        A dictionary with the 'next_url' page cursor, whether the playlist is 'complete' and its
+        'track_count' so far, or None if no page of the playlist was recorded yet.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT next_url, complete, track_count FROM playlist_progress WHERE playlist_id = ?",
+                (playlist_id,)).fetchone()
+        if row is None:
+            return None
+        return {'next_url': row[0], 'complete': bool(row[1]), 'track_count': row[2]}
+
+    def record_tracks_page(self, playlist_id, track_ids, tracks_details, next_url):
+        """
+        Records one page of playlist tracks and the cursor of the next page, atomically.
+
+        Args:
+        - playlist_id (str): The Spotify ID of the playlist.
+        - track_ids (list): The track IDs of the page, in playlist order.
+        - tracks_details (dict): Details of the page's tracks keyed by ID, tracks already recorded are kept.
+        - next_url (str): URL of the next page, or None if this was the last page of the playlist.
+        """
+        with self._owned_transaction():
+            row = self._conn.execute(
+                "SELECT track_count FROM playlist_progress WHERE playlist_id = ?", (playlist_id,)).fetchone()
+            track_count = row[0] if row else 0
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO playlist_tracks (playlist_id, position, track_id) VALUES (?, ?, ?)",
+                ((playlist_id, track_count + offset, track_id) for offset, track_id in enumerate(track_ids)))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tracks (track_id, details) VALUES (?, ?)",
+                ((track_id, dumps(details)) for track_id, details in tracks_details.items()))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO playlist_progress (playlist_id, next_url, complete, track_count) "
+                "VALUES (?, ?, ?, ?)",
+                (playlist_id, next_url, next_url is None, track_count + len(track_ids)))
+
+    def record_artists(self, artists_details):
+        """
+        Records a batch of fetched artists. Artists Spotify returned nothing for are recorded with None
+        details, so they are not asked for again when the crawl resumes.
+        """
+        with self._owned_transaction():
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO artists (artist_id, details) VALUES (?, ?)",
+                ((artist_id, dumps(details) if details else None) for artist_id, details in artists_details.items()))
+
+    def playlist_track_ids(self, playlist_id):
+        """Returns the recorded track IDs of a playlist, in playlist order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT track_id FROM playlist_tracks WHERE playlist_id = ? ORDER BY position", (playlist_id,))
+            return [row[0] for row in rows]
+
+    def tracks(self):
+        """
+        Returns the recorded details of the tracks in the recorded playlists keyed by track ID, in the
+        order the tracks were first seen.
+        """
+        with self._lock:
+            return {track_id: loads(details) for track_id, details in self._conn.execute(
+                "SELECT track_id, details FROM tracks WHERE track_id IN (SELECT track_id FROM playlist_tracks) "
+                "ORDER BY rowid")}
+
+    def artists(self):
+        """
+        Returns the recorded artists keyed by artist ID, with None for the artists Spotify returned
+        nothing for.
+        """
+        with self._lock:
+            return {artist_id: loads(details) if details is not None else None
+                    for artist_id, details in self._conn.execute("SELECT artist_id, details FROM artists")}
+
+    def _clear(self):
+        for table in ('crawl', 'playlist_progress', 'playlist_tracks', 'tracks', 'artists'):
+            self._conn.execute(f"DELETE FROM {table}")
+
+    def clear(self):
+        """Drops the checkpoint, once its crawl was committed to the cache or is no longer resumable."""
+        with self._owned_transaction():
+            self._clear()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
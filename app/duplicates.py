@@ -0,0 +1,131 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Suffixes that mark another release of the same recording, not a different recording
+RELEASE_VARIANT_PATTERN = re.compile(
+    r'\s*(?:[-–]\s*|[(\[]\s*)(?:\d{4}\s+)?(?:remaster(?:ed)?|single version|album version|radio edit|'
+    r'mono|stereo|deluxe(?: edition)?|bonus track|feat\.?|ft\.?|with)\b[^)\]]*[)\]]?',
+    re.IGNORECASE)
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^0-9a-z]+')
+
+# Tracks whose durations differ by more than this are never considered the same song
+DURATION_TOLERANCE_MS = 3000
+
+# Audio features compared by the optional proximity check, and the maximum allowed difference for each
+AUDIO_PROXIMITY_FEATURES = ('danceability', 'energy', 'valence', 'acousticness')
+AUDIO_PROXIMITY_TOLERANCE = 0.1
+TEMPO_PROXIMITY_TOLERANCE = 3.0
+
+
+def normalize_track_name(name):
+    """Lowercases a track name and strips accents, punctuation and release variant suffixes."""
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    name = RELEASE_VARIANT_PATTERN.sub('', name.lower())
+    return NON_ALPHANUMERIC_PATTERN.sub(' ', name).strip()
+
+
+def _audio_features_close(features, other_features):
+    if not features or not other_features:
+        # Without features there is nothing to contradict the name, artist and duration match
+        return True
+    for feature in AUDIO_PROXIMITY_FEATURES:
+        if abs((features.get(feature) or 0) - (other_features.get(feature) or 0)) > AUDIO_PROXIMITY_TOLERANCE:
+            return False
+    return abs((features.get('tempo') or 0) - (other_features.get('tempo') or 0)) <= TEMPO_PROXIMITY_TOLERANCE
+
+
+def find_duplicates(playlists_details, tracks_details, check_audio_features=False):
+    """
+    Finds duplicate tracks across the library in near-linear time: tracks are hashed on
+    (normalized name, primary artist) and only compared with their neighbours by duration
+    inside the same bucket, never pairwise across the library.
+
+    Args:
+    - playlists_details (dict): Playlists keyed by playlist ID, as held in the cache.
+    - tracks_details (dict): Tracks keyed by track ID, as held in the cache.
+    - check_audio_features (bool): Also require near-duplicates to have close audio features.
+
+    Returns:
+    A dictionary with:
+    - 'within_playlists': track IDs appearing more than once in the same playlist.
+    - 'across_playlists': track IDs appearing in more than one playlist.
+    - 'near_duplicates': groups of distinct track IDs that are the same song (e.g. single vs album
+      release, remasters).
+    """
+    within_playlists = []
+    track_playlists = defaultdict(list)
+    for playlist_id, playlist in playlists_details.items():
+        occurrences = Counter(playlist.get('track_ids', []))
+        for track_id, count in occurrences.items():
+            track_playlists[track_id].append(playlist_id)
+            if count > 1:
+                within_playlists.append({
+                    'playlist_id': playlist_id,
+                    'playlist_name': playlist.get('name'),
+                    'track_id': track_id,
+                    'track_name': tracks_details.get(track_id, {}).get('name'),
+                    'occurrences': count
+                })
+
+    across_playlists = [
+        {'track_id': track_id, 'track_name': tracks_details.get(track_id, {}).get('name'), 'playlist_ids': playlist_ids}
+        for track_id, playlist_ids in track_playlists.items() if len(playlist_ids) > 1
+    ]
+
+    buckets = defaultdict(list)
+    for track_id, track in tracks_details.items():
+        if not track.get('artists'):
+            continue
+        buckets[(normalize_track_name(track.get('name')), track['artists'][0])].append(track_id)
+
+    near_duplicates = []
+    for (normalized_name, primary_artist_id), track_ids in buckets.items():
+        if len(track_ids) < 2 or not normalized_name:
+            continue
+        track_ids.sort(key=lambda track_id: tracks_details[track_id].get('duration_ms') or 0)
+
+        # Split the bucket wherever consecutive durations are too far apart
+        group = [track_ids[0]]
+        for previous_id, track_id in zip(track_ids, track_ids[1:]):
+            gap = (tracks_details[track_id].get('duration_ms') or 0) - (tracks_details[previous_id].get('duration_ms') or 0)
+            if gap <= DURATION_TOLERANCE_MS:
+                group.append(track_id)
+                continue
+            near_duplicates.extend(_near_duplicate_groups(group, tracks_details, track_playlists, check_audio_features))
+            group = [track_id]
+        near_duplicates.extend(_near_duplicate_groups(group, tracks_details, track_playlists, check_audio_features))
+
+    return {
+        'within_playlists': within_playlists,
+        'across_playlists': across_playlists,
+        'near_duplicates': near_duplicates
+    }
+
+
+def _near_duplicate_groups(group, tracks_details, track_playlists, check_audio_features):
+    if len(group) < 2:
+        return []
+
+    if check_audio_features:
+        # Compare each track with the first track of the group only, keeping the check linear
+        anchor_features = tracks_details[group[0]].get('audio_features')
+        group = [group[0]] + [
+            track_id for track_id in group[1:]
+            if _audio_features_close(anchor_features, tracks_details[track_id].get('audio_features'))]
+        if len(group) < 2:
+            return []
+
+    return [{
+        'tracks': [
+            {
+                'id': track_id,
+                'name': tracks_details[track_id].get('name'),
+                'album': tracks_details[track_id].get('album'),
+                'duration_ms': tracks_details[track_id].get('duration_ms'),
+                'playlist_ids': track_playlists.get(track_id, [])
+            }
+            for track_id in group
+        ]
+    }]
@@ -0,0 +1,87 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+# Events kept for subscribers connecting (or reconnecting) mid-refresh
+EVENT_HISTORY_SIZE = 1000
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Comment line sent on idle streams so proxies and browsers keep the connection open
+KEEPALIVE_SECONDS = 15
+
+
+def format_sse(event):
+    """Formats an event as a Server-Sent Events message."""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe for progress events. Every subscriber gets its own bounded queue;
+    a subscriber too slow to keep up is dropped rather than slowing down the publisher, and catches
+    up from the event history when it reconnects with its last event ID.
+    """
+
+    def __init__(self, history_size=EVENT_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+
+    def publish(self, event, data=None, reset_history=False):
+        """
+        Publishes an event to every subscriber.
+
+        Args:
+        - event (str): Event name.
+        - data (dict): JSON-serializable payload.
+        - reset_history (bool): Forget earlier events first, so late subscribers only replay from here.
+        """
+        with self._lock:
+            if reset_history:
+                self._history.clear()
+            message = {'id': next(self._ids), 'event': event, 'data': data or {}}
+            self._history.append(message)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    self._subscribers.discard(subscriber)
+                    # Make room to end the subscriber's stream, a reconnect replays what it missed
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(None)
+        return message['id']
+
+    def subscribe(self, last_event_id=None):
+        """
+        Returns a queue receiving every event published from now on, prefilled with the history
+        after `last_event_id` (the whole history if None).
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + EVENT_HISTORY_SIZE)
+        with self._lock:
+            for message in self._history:
+                if last_event_id is None or message['id'] > last_event_id:
+                    subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, last_event_id=None):
+        """Yields Server-Sent Events messages until the subscriber is dropped or the client goes away."""
+        subscriber = self.subscribe(last_event_id)
+        try:
+            while True:
+                try:
+                    message = subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield format_sse(message)
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+from app.feature_store import AUDIO_FEATURE_FIELDS
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Audio features exported as track columns, leaving out identifiers and the track's own duration
+EXPORTED_AUDIO_FEATURES = [field for field in AUDIO_FEATURE_FIELDS if field not in ('id', 'analysis_url', 'duration_ms')]
+
+EXPORT_COLUMNS = {
+    'tracks': ['track_id', 'name', 'artist_ids', 'artist_names', 'album', 'duration_ms', 'release_date',
+               'spotify_url'] + EXPORTED_AUDIO_FEATURES,
+    'artists': ['artist_id', 'name', 'popularity', 'genres', 'spotify_url'],
+    'playlist_tracks': ['playlist_id', 'playlist_name', 'position', 'track_id', 'track_name', 'artist_names'],
+}
+
+# Columns that are not strings, used to type the Parquet schema
+INTEGER_COLUMNS = {'duration_ms', 'popularity', 'position', 'key', 'mode', 'time_signature'}
+FLOAT_COLUMNS = {'acousticness', 'danceability', 'energy', 'instrumentalness', 'liveness', 'loudness',
+                 'speechiness', 'tempo', 'valence'}
+
+# Rows buffered per chunk written to the stream (and per Parquet row group)
+EXPORT_BATCH_SIZE = 5000
+
+# Multi-valued fields are joined into one column
+LIST_SEPARATOR = ';'
+
+
+def _artist_names(artist_ids, artists_details):
+    return LIST_SEPARATOR.join(artists_details.get(artist_id, {}).get('name') or '' for artist_id in artist_ids)
+
+
+def iter_export_rows(entity, playlists_details, tracks_details, artists_details):
+    """
+    Yields the rows of an export entity one at a time, as tuples in EXPORT_COLUMNS order.
+
+    Args:
+    - entity (str): 'tracks', 'artists' or 'playlist_tracks'.
+    - playlists_details, tracks_details, artists_details (dict): The cache content.
+    """
+    if entity == 'tracks':
+        for track_id, track in tracks_details.items():
+            artist_ids = track.get('artists', [])
+            audio_features = track.get('audio_features') or {}
+            yield (track_id, track.get('name'), LIST_SEPARATOR.join(artist_ids), _artist_names(artist_ids, artists_details),
+                   track.get('album'), track.get('duration_ms'), track.get('release_date'), track.get('spotify_url'),
+                   *(audio_features.get(feature) for feature in EXPORTED_AUDIO_FEATURES))
+    elif entity == 'artists':
+        for artist_id, artist in artists_details.items():
+            yield (artist_id, artist.get('name'), artist.get('popularity'),
+                   LIST_SEPARATOR.join(artist.get('genre', [])), artist.get('spotify_url'))
+    elif entity == 'playlist_tracks':
+        for playlist_id, playlist in playlists_details.items():
+            # Copied since playlist edits patch the list in place
+            for position, track_id in enumerate(list(playlist.get('track_ids', []))):
+                track = tracks_details.get(track_id, {})
+                yield (playlist_id, playlist.get('name'), position, track_id, track.get('name'),
+                       _artist_names(track.get('artists', []), artists_details))
+    else:
+        raise ValueError(f"Unsupported export entity: {entity}")
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(columns, rows):
+    """Yields UTF-8 encoded CSV chunks, a header then EXPORT_BATCH_SIZE rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in _batches(rows, EXPORT_BATCH_SIZE):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_ndjson(columns, rows):
+    """Yields UTF-8 encoded newline-delimited JSON chunks, one object per row."""
+    for batch in _batches(rows, EXPORT_BATCH_SIZE):
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in batch).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object collecting what the Parquet writer emits, drained after each row group."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(columns, rows):
+    """Yields a Parquet file in chunks, one row group per EXPORT_BATCH_SIZE rows. Requires pyarrow."""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow, install it with `pip install pyarrow`.")
+
+    schema = pa.schema([
+        (column, pa.int64() if column in INTEGER_COLUMNS else pa.float64() if column in FLOAT_COLUMNS else pa.string())
+        for column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in _batches(rows, EXPORT_BATCH_SIZE):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(entity, export_format, playlists_details, tracks_details, artists_details):
+    """
+    Streams an entity of the cached library in the given format without building the table in memory.
+
+    Args:
+    - entity (str): 'tracks', 'artists' or 'playlist_tracks'.
+    - export_format (str): 'csv', 'ndjson' or 'parquet'.
+    - playlists_details, tracks_details, artists_details (dict): The cache content.
+
+    Returns:
+    A generator of byte chunks.
+    """
+    if entity not in EXPORT_COLUMNS:
+        raise ValueError(f"Unsupported export entity: {entity}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == 'parquet' and pa is None:
+        raise RuntimeError("Parquet export requires pyarrow, install it with `pip install pyarrow`.")
+
+    writers = {'csv': stream_csv, 'ndjson': stream_ndjson, 'parquet': stream_parquet}
+    rows = iter_export_rows(entity, playlists_details, tracks_details, artists_details)
+    return writers[export_format](EXPORT_COLUMNS[entity], rows)
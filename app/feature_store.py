@@ -0,0 +1,115 @@
+import logging
+import sqlite3
+import threading
+import time
+
+# Audio features columns persisted per track, in the same order as returned by Spotify
+AUDIO_FEATURE_FIELDS = (
+    'acousticness', 'analysis_url', 'danceability', 'duration_ms', 'energy',
+    'instrumentalness', 'key', 'liveness', 'loudness', 'mode', 'speechiness',
+    'tempo', 'time_signature', 'valence')
+
+# SQLite caps the number of bound parameters per statement, stay well below it
+LOOKUP_BATCH_SIZE = 500
+
+# Spotify sometimes has no features for a track yet, such a track is asked for again after this long
+MISSING_FEATURES_RETRY_SECONDS = 7 * 24 * 3600
+
+
+class AudioFeaturesStore:
+    """
+    Persistent store of Spotify audio features keyed by track ID.
+
+    Audio features of a track never change, so once a track has features its row is never
+    overwritten and it is never requested from Spotify again. Tracks for which Spotify returned no
+    features are recorded as well (with NULL columns and the `checked_at` time of the lookup) so they
+    are not asked for on every refresh either. Once such a row is older than
+    `missing_features_retry_seconds` the track counts as unknown again, and the next lookup replaces
+    the row in place, with features or with a new `checked_at`.
+    """
+
+    def __init__(self, db_path, missing_features_retry_seconds=MISSING_FEATURES_RETRY_SECONDS):
+        self.db_path = db_path
+        self.missing_features_retry_seconds = missing_features_retry_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        # Job workers write features while web processes read them
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ', '.join(AUDIO_FEATURE_FIELDS)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS audio_features (track_id TEXT PRIMARY KEY, has_features INTEGER NOT NULL, "
+                f"{columns}, checked_at REAL)")
+            existing_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(audio_features)")}
+            if 'checked_at' not in existing_columns:
+                # Stores created before missing features were retried, their missing tracks are retried right away
+                self._conn.execute("ALTER TABLE audio_features ADD COLUMN checked_at REAL")
+        logging.info(f"Audio features store ready at {self.db_path}.")
+
+    def get_many(self, track_ids):
+        """
+        Looks up audio features for a batch of tracks.
+
+        Args:
+        - track_ids: An iterable of Spotify track IDs.
+
+        Returns:
+        A dictionary mapping every known track ID to its audio features dictionary, or to None
+        if Spotify had no features for that track when last asked. Unknown track IDs, and tracks
+        without features due for another lookup, are absent from the result.
+        """
+        track_ids = list(dict.fromkeys(track_ids))
+        found = {}
+        select_columns = ', '.join(AUDIO_FEATURE_FIELDS)
+        retry_before = time.time() - self.missing_features_retry_seconds
+        with self._lock:
+            for pos in range(0, len(track_ids), LOOKUP_BATCH_SIZE):
+                batch = track_ids[pos:pos + LOOKUP_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT track_id, has_features, {select_columns} FROM audio_features "
+                    f"WHERE track_id IN ({placeholders}) AND (has_features OR checked_at >= ?)",
+                    batch + [retry_before])
+                for row in rows:
+                    found[row[0]] = dict(zip(AUDIO_FEATURE_FIELDS, row[2:])) if row[1] else None
+        return found
+
+    def put_many(self, features_by_track_id):
+        """
+        Records audio features for a batch of tracks. Tracks already stored with features are left
+        untouched, tracks stored without features take the new lookup.
+
+        Args:
+        - features_by_track_id: A dictionary mapping track IDs to audio features dictionaries,
+          or to None for tracks Spotify has no features for.
+        """
+        checked_at = time.time()
+        rows = []
+        for track_id, features in features_by_track_id.items():
+            if features:
+                rows.append((track_id, 1) + tuple(features.get(field) for field in AUDIO_FEATURE_FIELDS) + (checked_at,))
+            else:
+                rows.append((track_id, 0) + (None,) * len(AUDIO_FEATURE_FIELDS) + (checked_at,))
+        if not rows:
+            return
+
+        updated_columns = ('has_features',) + AUDIO_FEATURE_FIELDS + ('checked_at',)
+        columns = ', '.join(('track_id',) + updated_columns)
+        placeholders = ', '.join('?' * (len(updated_columns) + 1))
+        updates = ', '.join(f'{column} = excluded.{column}' for column in updated_columns)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"""INSERT INTO audio_features ({columns}) VALUES ({placeholders})
+                    ON CONFLICT (track_id) DO UPDATE SET {updates} WHERE NOT audio_features.has_features""", rows)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM audio_features").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
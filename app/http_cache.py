@@ -0,0 +1,184 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+from app.serialization import dumps, compress, negotiate_encoding, MIN_COMPRESSED_BYTES
+
+# Serialized bodies kept in memory, track lists of large libraries run to several MB each
+BODY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Compressed bodies kept in memory, they are small next to the bodies they are derived from
+COMPRESSED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    Memoizes serialized JSON bodies per resource and cache version, with a strong ETag derived
+    from the body content so repeat requests can be answered with 304 Not Modified.
+
+    Gzip and Brotli variants of each body are compressed once, on the first request accepting them,
+    and memoized by ETag. The ETag changes with the content, so a variant never outlives its body.
+    Both maps evict their least recently used entries once over their total size in bytes.
+    """
+
+    def __init__(self, max_entries=1024, max_body_bytes=BODY_CACHE_MAX_BYTES,
+                 max_compressed_bytes=COMPRESSED_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.max_compressed_bytes = max_compressed_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._body_bytes = 0
+        self._compressed = OrderedDict()
+        self._compressed_bytes = 0
+        # When attached to a shared cache, bodies are served straight from the shared mapping
+        self.shared_reader = None
+
+    def get_or_build(self, key, version, producer, local=False):
+        """
+        Returns the serialized body and ETag for a resource, building them with producer() only if
+        the memoized entry is missing or belongs to another cache version.
+
+        Args:
+        - key: Unique name of the resource, e.g. 'playlist:<id>'.
+        - version: Version of the data the resource is derived from.
+        - producer: Callable returning the JSON-serializable payload, or None if unavailable.
+        - local: Memoize in this process even when attached to a shared cache, for resources the
+          loader process does not publish.
+
+        Returns:
+        A (body, etag) tuple, or None if the producer returned no data.
+        """
+        if self.shared_reader is not None and not local:
+            entry = self.shared_reader.get(key)
+            return (bytes(entry[0]), entry[1]) if entry else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+
+        data = producer()
+        if data is None:
+            return None
+        body = dumps(data, sort_keys=True)
+        etag = hashlib.sha1(body).hexdigest()
+
+        with self._lock:
+            replaced = self._entries.pop(key, None)
+            if replaced is not None:
+                self._body_bytes -= len(replaced[1])
+            self._entries[key] = (version, body, etag)
+            self._body_bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._body_bytes > self.max_body_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._body_bytes -= len(evicted[1])
+        return body, etag
+
+    def get_compressed(self, body, etag, encoding):
+        """
+        Returns the body compressed with the given encoding, compressing it only on the first call.
+        """
+        compressed_key = (etag, encoding)
+        with self._lock:
+            compressed = self._compressed.get(compressed_key)
+            if compressed is not None:
+                self._compressed.move_to_end(compressed_key)
+                return compressed
+
+        compressed = compress(body, encoding)
+
+        with self._lock:
+            if compressed_key not in self._compressed:
+                self._compressed[compressed_key] = compressed
+                self._compressed_bytes += len(compressed)
+            while self._compressed_bytes > self.max_compressed_bytes:
+                _, evicted = self._compressed.popitem(last=False)
+                self._compressed_bytes -= len(evicted)
+        return compressed
+
+    def invalidate(self, *keys):
+        """
+        Drops the memoized entries for the given keys and their compressed variants, or every entry
+        if no key is given.
+        """
+        with self._lock:
+            if not keys:
+                self._entries.clear()
+                self._body_bytes = 0
+                self._compressed.clear()
+                self._compressed_bytes = 0
+            for key in keys:
+                evicted = self._entries.pop(key, None)
+                if evicted is None:
+                    continue
+                self._body_bytes -= len(evicted[1])
+                for compressed_key in [compressed_key for compressed_key in self._compressed
+                                       if compressed_key[0] == evicted[2]]:
+                    self._compressed_bytes -= len(self._compressed.pop(compressed_key))
+
+
+response_cache = ResponseCache()
+
+
+def cached_json_response(key, version, producer, local=False):
+    """
+    Builds a JSON response for a cache-backed resource, reusing the memoized body when possible and
+    honouring If-None-Match with a 304. The body is sent gzip or Brotli compressed when the client's
+    Accept-Encoding allows it. See ResponseCache.get_or_build for `local`.
+
+    Returns:
+    A Flask response, or None if the producer returned no data.
+    """
+    cached = response_cache.get_or_build(key, version, producer, local=local)
+    if cached is None:
+        return None
+    return _json_response(*cached)
+
+
+def cached_json_batch_response(field, key_prefix, ids, version, producer):
+    """
+    Builds one JSON response for several cache-backed resources, as {field: [...], 'missing': [...]}
+    with the resources in the order of `ids`. The memoized body of each resource is spliced in as is,
+    so a batch costs no serialization beyond the resources never requested before.
+
+    Args:
+    - field: Name of the list of resources in the response.
+    - key_prefix: Resources are memoized under '<key_prefix>:<id>', as for their single-resource endpoints.
+    - ids: IDs of the requested resources.
+    - version: Version of the data the resources are derived from.
+    - producer: Callable taking an ID and returning its payload, or None if unavailable.
+
+    Returns:
+    A Flask response, the IDs with no data are listed under 'missing'.
+    """
+    bodies = []
+    missing = []
+    for resource_id in ids:
+        cached = response_cache.get_or_build(f'{key_prefix}:{resource_id}', version, lambda: producer(resource_id))
+        if cached is None:
+            missing.append(resource_id)
+        else:
+            bodies.append(cached[0])
+
+    body = b''.join((b'{', dumps(field), b':[', b','.join(bodies), b'],"missing":', dumps(missing), b'}'))
+    return _json_response(body, hashlib.sha1(body).hexdigest())
+
+
+def _json_response(body, etag):
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if len(body) >= MIN_COMPRESSED_BYTES else None
+    if encoding is not None:
+        body = response_cache.get_compressed(body, etag, encoding)
+        # Each representation needs its own strong ETag
+        etag = f'{etag}-{encoding}'
+
+    response = Response(body, mimetype='application/json')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
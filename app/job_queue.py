@@ -0,0 +1,369 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+# Job kinds run by the workers
+REFRESH, HYDRATE_ARTISTS, AUDIO_FEATURES = 'refresh', 'hydrate-artists', 'audio-features'
+JOB_KINDS = (REFRESH, HYDRATE_ARTISTS, AUDIO_FEATURES)
+
+# Jobs asked for by someone using the app go before background upkeep
+PRIORITY_INTERACTIVE = 100
+PRIORITY_BACKGROUND = 0
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# A running job whose lease is not renewed in time is assumed crashed and queued again
+LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 30
+POLL_SECONDS = 1
+FINISHED_RETENTION_SECONDS = 7 * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT
+);
+-- At most one queued job per user and kind, later requests merge into it
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_queued_dedupe ON jobs (user_id, kind) WHERE state = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_by_finished ON jobs (finished_at) WHERE finished_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    jobs_done INTEGER NOT NULL DEFAULT 0,
+    jobs_failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+JOB_COLUMNS = ('id', 'user_id', 'kind', 'priority', 'payload', 'state', 'attempts', 'available_at', 'enqueued_at',
+               'started_at', 'finished_at', 'lease_owner', 'lease_expires', 'error')
+
+
+def _job_from_row(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    job['payload'] = json.loads(job['payload'])
+    return job
+
+
+class JobQueue:
+    """
+    Durable job queue in SQLite, shared by the web processes enqueueing jobs and the worker processes
+    running them.
+
+    - Jobs are deduplicated by user and kind: enqueueing a job already queued merges into it, keeping
+      the higher priority.
+    - Workers claim the highest priority job first, and never two jobs of the same user at once, since
+      they all edit that user's cache.
+    - A claimed job is leased: the worker renews the lease while it runs, and a job whose lease
+      expires (its worker crashed) is queued again, up to MAX_ATTEMPTS.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent claims from other processes serialize
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def _run(self, function):
+        with self._lock:
+            conn = self._transaction()
+            try:
+                result = function(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, user_id, kind, payload=None, priority=PRIORITY_BACKGROUND):
+        """
+        Queues a job, or merges it into the job of the same user and kind already queued.
+
+        Returns:
+        A (job ID, created) tuple, created being False if the job was merged.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+
+        def enqueue_job(conn):
+            row = conn.execute(
+                "SELECT id, payload FROM jobs WHERE user_id = ? AND kind = ? AND state = ?", (user_id, kind, QUEUED)).fetchone()
+            if row is not None:
+                # Later options win, e.g. a forced refresh requested while a regular one is queued
+                merged_payload = dict(json.loads(row[1]), **(payload or {}))
+                conn.execute(
+                    "UPDATE jobs SET priority = MAX(priority, ?), available_at = MIN(available_at, ?), payload = ? "
+                    "WHERE id = ?", (priority, now, json.dumps(merged_payload), row[0]))
+                return row[0], False
+            cursor = conn.execute(
+                "INSERT INTO jobs (user_id, kind, priority, payload, state, available_at, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (user_id, kind, priority, json.dumps(payload or {}), QUEUED, now, now))
+            return cursor.lastrowid, True
+
+        job_id, created = self._run(enqueue_job)
+        if created:
+            logging.info(f"Job {job_id} queued: {kind} for {user_id} (priority {priority}).")
+        return job_id, created
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """
+        Claims the next job for a worker, highest priority first.
+
+        Returns:
+        The job as a dictionary, or None if no job can run now.
+        """
+        now = time.time()
+
+        def claim_job(conn):
+            row = conn.execute(
+                f"UPDATE jobs SET state = ?, attempts = attempts + 1, started_at = ?, lease_owner = ?, lease_expires = ? "
+                f"WHERE id = (SELECT id FROM jobs WHERE state = ? AND available_at <= ? AND user_id NOT IN "
+                f"(SELECT user_id FROM jobs WHERE state = ?) ORDER BY priority DESC, id LIMIT 1) "
+                f"RETURNING {', '.join(JOB_COLUMNS)}",
+                (RUNNING, now, worker_id, now + lease_seconds, QUEUED, now, RUNNING)).fetchone()
+            conn.execute(
+                "INSERT INTO workers (worker_id, started_at, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET last_seen = excluded.last_seen", (worker_id, now, now))
+            return row
+
+        row = self._run(claim_job)
+        return _job_from_row(row) if row else None
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """Renews the lease of a running job. Returns False if the worker lost the job."""
+        now = time.time()
+
+        def renew(conn):
+            conn.execute("UPDATE workers SET last_seen = ? WHERE worker_id = ?", (now, worker_id))
+            return conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state = ?",
+                (now + lease_seconds, job_id, worker_id, RUNNING)).rowcount == 1
+
+        return self._run(renew)
+
+    def complete(self, job_id, worker_id):
+        now = time.time()
+
+        def finish(conn):
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, lease_owner = NULL, lease_expires = NULL, error = NULL "
+                "WHERE id = ? AND lease_owner = ?", (DONE, now, job_id, worker_id))
+            conn.execute("UPDATE workers SET last_seen = ?, jobs_done = jobs_done + 1 WHERE worker_id = ?", (now, worker_id))
+
+        self._run(finish)
+
+    def fail(self, job_id, worker_id, error):
+        """Records a failed attempt, queueing the job again with a backoff unless it is out of attempts."""
+        now = time.time()
+
+        def fail_job(conn):
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ?", (job_id, worker_id)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE workers SET last_seen = ?, jobs_failed = jobs_failed + 1 WHERE worker_id = ?",
+                         (now, worker_id))
+            return self._retry_or_fail(conn, job_id, row[0], str(error), now)
+
+        return self._run(fail_job)
+
+    @staticmethod
+    def _retry_or_fail(conn, job_id, attempts, error, now):
+        if attempts < MAX_ATTEMPTS:
+            try:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, error = ? "
+                    "WHERE id = ?", (QUEUED, now + RETRY_BACKOFF_SECONDS * attempts, error, job_id))
+                return QUEUED
+            except sqlite3.IntegrityError:
+                # The same job was queued again meanwhile, that one takes over
+                pass
+        conn.execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, lease_owner = NULL, lease_expires = NULL, error = ? WHERE id = ?",
+            (FAILED, now, error, job_id))
+        return FAILED
+
+    def reclaim_expired(self, worker_id=None):
+        """
+        Queues again the running jobs whose lease expired, or every job held by `worker_id` (a worker
+        known to be dead).
+
+        Returns:
+        The number of reclaimed jobs.
+        """
+        now = time.time()
+
+        def reclaim(conn):
+            if worker_id is not None:
+                rows = conn.execute("SELECT id, attempts FROM jobs WHERE state = ? AND lease_owner = ?",
+                                    (RUNNING, worker_id)).fetchall()
+            else:
+                rows = conn.execute("SELECT id, attempts FROM jobs WHERE state = ? AND lease_expires < ?",
+                                    (RUNNING, now)).fetchall()
+            for job_id, attempts in rows:
+                self._retry_or_fail(conn, job_id, attempts, 'Worker lost', now)
+            return len(rows)
+
+        reclaimed = self._run(reclaim)
+        if reclaimed:
+            logging.warning(f"Reclaimed {reclaimed} jobs from lost workers.")
+        return reclaimed
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def prune(self, retention_seconds=FINISHED_RETENTION_SECONDS):
+        """Deletes the finished jobs older than the retention period."""
+        cutoff = time.time() - retention_seconds
+        return self._run(lambda conn: conn.execute(
+            "DELETE FROM jobs WHERE finished_at < ?", (cutoff,)).rowcount)
+
+    def stats(self, recent_limit=20):
+        """
+        Returns the queue depth per kind and priority, throughput and durations of the jobs finished
+        in the last hour, the workers seen recently and the latest jobs.
+        """
+        now = time.time()
+        with self._lock:
+            depth = self._conn.execute(
+                "SELECT kind, state, priority, COUNT(*), MIN(enqueued_at) FROM jobs WHERE state IN (?, ?) "
+                "GROUP BY kind, state, priority", (QUEUED, RUNNING)).fetchall()
+            finished = self._conn.execute(
+                "SELECT kind, state, COUNT(*), AVG(started_at - enqueued_at), AVG(finished_at - started_at) "
+                "FROM jobs WHERE finished_at >= ? GROUP BY kind, state", (now - 3600,)).fetchall()
+            workers = self._conn.execute(
+                "SELECT worker_id, started_at, last_seen, jobs_done, jobs_failed FROM workers WHERE last_seen >= ? "
+                "ORDER BY worker_id", (now - 2 * LEASE_SECONDS,)).fetchall()
+            recent = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY id DESC LIMIT ?", (recent_limit,)).fetchall()
+
+        return {
+            'depth': [
+                {'kind': kind, 'state': state, 'priority': priority, 'jobs': count,
+                 'oldest_age_seconds': round(now - oldest, 1)}
+                for kind, state, priority, count, oldest in depth],
+            'last_hour': [
+                {'kind': kind, 'state': state, 'jobs': count, 'per_minute': round(count / 60, 2),
+                 'avg_wait_seconds': round(wait or 0, 2), 'avg_run_seconds': round(run or 0, 2)}
+                for kind, state, count, wait, run in finished],
+            'workers': [
+                {'worker_id': worker, 'started_at': started_at, 'last_seen_seconds_ago': round(now - last_seen, 1),
+                 'jobs_done': done, 'jobs_failed': failed}
+                for worker, started_at, last_seen, done, failed in workers],
+            'recent_jobs': [_job_from_row(row) for row in recent],
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def run_worker(db_path, setup, stop_event=None):
+    """
+    Worker loop: claims jobs and runs them with the handlers returned by setup(), renewing the lease
+    from a heartbeat thread while a job runs.
+
+    Args:
+    - db_path (str): Path of the job queue database.
+    - setup: Callable run once in the worker process, returning the handlers keyed by job kind. Each
+      handler is called with the job's user ID and payload, and may return follow-up jobs for the
+      same user as (kind, payload, priority) tuples.
+    - stop_event: Optional event ending the loop once set.
+    """
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    handlers = setup()
+    job_queue = JobQueue(db_path)
+    logging.info(f"Job worker {worker_id} started.")
+
+    while stop_event is None or not stop_event.is_set():
+        job = job_queue.claim(worker_id)
+        if job is None:
+            time.sleep(POLL_SECONDS)
+            continue
+
+        stop_heartbeat = threading.Event()
+
+        def heartbeat():
+            while not stop_heartbeat.wait(HEARTBEAT_SECONDS):
+                job_queue.heartbeat(job['id'], worker_id)
+
+        threading.Thread(target=heartbeat, name='job-heartbeat', daemon=True).start()
+        started_at = time.perf_counter()
+        try:
+            followups = handlers[job['kind']](job['user_id'], job['payload'])
+            job_queue.complete(job['id'], worker_id)
+            for kind, payload, priority in followups or ():
+                job_queue.enqueue(job['user_id'], kind, payload, priority=priority)
+            logging.info(f"Job {job['id']} ({job['kind']}) done in {time.perf_counter() - started_at:.1f} s.")
+        except Exception as e:
+            state = job_queue.fail(job['id'], worker_id, e)
+            logging.error(f"Job {job['id']} ({job['kind']}) failed, now {state}: {e}")
+        finally:
+            stop_heartbeat.set()
+
+
+class WorkerPool:
+    """
+    Runs a number of worker processes and replaces any that dies, handing its jobs back to the queue
+    right away instead of waiting for their leases to expire.
+    """
+
+    def __init__(self, db_path, setup, num_workers=2):
+        self.db_path = db_path
+        self.setup = setup
+        self.num_workers = num_workers
+        # Spawned processes start clean, without the parent's threads and open connections
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = []
+
+    def _start_worker(self):
+        process = self._context.Process(target=run_worker, args=(self.db_path, self.setup), daemon=True)
+        process.start()
+        return process
+
+    def start(self):
+        self._processes = [self._start_worker() for _ in range(self.num_workers)]
+        logging.info(f"Started {self.num_workers} job workers.")
+
+    def supervise(self, job_queue):
+        """Replaces dead workers and reclaims their jobs and any expired lease. Call periodically."""
+        for index, process in enumerate(self._processes):
+            if not process.is_alive():
+                logging.error(f"Job worker {process.pid} exited with code {process.exitcode}, restarting it.")
+                job_queue.reclaim_expired(worker_id=f'{socket.gethostname()}:{process.pid}')
+                self._processes[index] = self._start_worker()
+        job_queue.reclaim_expired()
+
+    def stop(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
@@ -0,0 +1,291 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.feature_store import AUDIO_FEATURE_FIELDS
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY, position INTEGER NOT NULL, name TEXT, description TEXT,
+    image_url TEXT, owner TEXT, followers TEXT);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id TEXT NOT NULL, position INTEGER NOT NULL, track_id TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, position)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track ON playlist_tracks (track_id);
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY, name TEXT, album TEXT, duration_ms INTEGER, spotify_url TEXT,
+    image_url TEXT, release_date TEXT, release_date_precision TEXT, release_year INTEGER,
+    popularity INTEGER);
+CREATE TABLE IF NOT EXISTS track_artists (
+    track_id TEXT NOT NULL, position INTEGER NOT NULL, artist_id TEXT NOT NULL,
+    PRIMARY KEY (track_id, position)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_track_artists_artist ON track_artists (artist_id);
+CREATE TABLE IF NOT EXISTS artists (
+    id TEXT PRIMARY KEY, name TEXT, spotify_url TEXT, popularity INTEGER, image_url TEXT);
+CREATE TABLE IF NOT EXISTS genres (
+    artist_id TEXT NOT NULL, position INTEGER NOT NULL, genre TEXT NOT NULL,
+    PRIMARY KEY (artist_id, position)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_genres_genre ON genres (genre);
+CREATE TABLE IF NOT EXISTS audio_features (track_id TEXT PRIMARY KEY, {', '.join(AUDIO_FEATURE_FIELDS)});
+"""
+
+# Tables emptied and reloaded on every refresh, children first
+LIBRARY_TABLES = ('playlist_tracks', 'track_artists', 'genres', 'audio_features', 'playlists', 'tracks', 'artists')
+
+# Audio features averaged into the playlist metrics, keyed by their metric name
+AVERAGED_AUDIO_FEATURES = {
+    'Average Energy': 'energy',
+    'Average Danceability': 'danceability',
+    'Average Valence': 'valence',
+    'Average Acousticness': 'acousticness',
+    'Average Instrumentalness': 'instrumentalness',
+    'Average Speechiness': 'speechiness',
+    'Average Loudness': 'loudness',
+    'Average Tempo': 'tempo',
+}
+
+
+def _release_year(release_date):
+    try:
+        release_year = int(release_date[:4])
+    except (TypeError, ValueError):
+        return None
+    return release_year if release_year > 0 else None
+
+
+class LibraryStore:
+    """
+    Optional SQLite-backed query engine over the cached library.
+
+    The cache is bulk loaded into normalized tables once per refresh, and the analytical views
+    (user stats, playlist metrics, all tracks) are answered with indexed SQL aggregations instead of
+    Python loops over the nested cache dictionaries.
+    """
+
+    def __init__(self, db_path, excluded_metric_artist_ids=()):
+        self.db_path = db_path
+        self.excluded_metric_artist_ids = tuple(excluded_metric_artist_ids)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    @property
+    def generation(self):
+        """
+        Returns the cache generation of the last load, or None if the store was never loaded. In-place
+        edits of the cache, such as hydrations, bump the generation without a refresh, so the store is
+        compared to the cache on it rather than on the refresh timestamp.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else None
+
+    def load(self, playlists_details, tracks_details, artists_details, generation):
+        """
+        Replaces the store content with the given cache data in a single transaction.
+
+        Args:
+        - playlists_details (dict): Playlists keyed by playlist ID, as held in the cache.
+        - tracks_details (dict): Tracks keyed by track ID, as held in the cache.
+        - artists_details (dict): Artists keyed by artist ID, as held in the cache.
+        - generation (int): The cache generation being loaded.
+        """
+        start_time = time.time()
+        feature_placeholders = ', '.join('?' * (len(AUDIO_FEATURE_FIELDS) + 1))
+
+        with self._lock, self._conn:
+            for table in LIBRARY_TABLES:
+                self._conn.execute(f"DELETE FROM {table}")
+
+            self._conn.executemany(
+                "INSERT INTO playlists VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((playlist_id, position, playlist.get('name'), playlist.get('description'),
+                  playlist.get('image_url'), playlist.get('owner'), json.dumps(playlist.get('followers', 0)))
+                 for position, (playlist_id, playlist) in enumerate(playlists_details.items())))
+            self._conn.executemany(
+                "INSERT INTO playlist_tracks VALUES (?, ?, ?)",
+                ((playlist_id, position, track_id)
+                 for playlist_id, playlist in playlists_details.items()
+                 for position, track_id in enumerate(playlist.get('track_ids', []))))
+
+            self._conn.executemany(
+                "INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((track_id, track.get('name'), track.get('album'), track.get('duration_ms'),
+                  track.get('spotify_url'), track.get('image_url'), track.get('release_date'),
+                  track.get('release_date_precision'), _release_year(track.get('release_date')),
+                  track.get('popularity'))
+                 for track_id, track in tracks_details.items()))
+            self._conn.executemany(
+                "INSERT INTO track_artists VALUES (?, ?, ?)",
+                ((track_id, position, artist_id)
+                 for track_id, track in tracks_details.items()
+                 for position, artist_id in enumerate(track.get('artists', []))))
+            self._conn.executemany(
+                f"INSERT INTO audio_features VALUES ({feature_placeholders})",
+                ((track_id,) + tuple(track['audio_features'].get(field) for field in AUDIO_FEATURE_FIELDS)
+                 for track_id, track in tracks_details.items() if track.get('audio_features')))
+
+            self._conn.executemany(
+                "INSERT INTO artists VALUES (?, ?, ?, ?, ?)",
+                ((artist_id, artist.get('name'), artist.get('spotify_url'), artist.get('popularity'),
+                  artist.get('image_url'))
+                 for artist_id, artist in artists_details.items()))
+            self._conn.executemany(
+                "INSERT INTO genres VALUES (?, ?, ?)",
+                ((artist_id, position, genre)
+                 for artist_id, artist in artists_details.items()
+                 for position, genre in enumerate(artist.get('genre', []))))
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(generation),))
+
+        logging.info(f"Library store loaded in {time.time() - start_time:.4f} seconds.")
+
+    def replace_playlist_tracks(self, playlist_id, track_ids):
+        """Replaces the track list of a single playlist, e.g. after tracks were removed from it."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+            self._conn.executemany(
+                "INSERT INTO playlist_tracks VALUES (?, ?, ?)",
+                ((playlist_id, position, track_id) for position, track_id in enumerate(track_ids)))
+
+    def user_stats(self):
+        """Returns the number of playlists, unique tracks and unique artists in the library."""
+        with self._lock:
+            num_playlists, num_unique_tracks, num_unique_artists = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM playlists), (SELECT COUNT(*) FROM tracks), (SELECT COUNT(*) FROM artists)"
+            ).fetchone()
+        return {
+            'num_playlists': num_playlists,
+            'num_unique_tracks': num_unique_tracks,
+            'num_unique_artists': num_unique_artists
+        }
+
+    def playlist(self, playlist_id):
+        """
+        Returns a playlist with its track IDs and metrics, shaped like the playlist cache entry,
+        or None if the playlist is not in the store.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, image_url, description, followers, owner FROM playlists WHERE id = ?",
+                (playlist_id,)).fetchone()
+            if row is None:
+                return None
+            track_ids = [track_id for (track_id,) in self._conn.execute(
+                "SELECT track_id FROM playlist_tracks WHERE playlist_id = ? ORDER BY position", (playlist_id,))]
+            metrics = self._playlist_metrics(playlist_id, len(track_ids))
+
+        return {
+            'id': row[0],
+            'name': row[1],
+            'image_url': row[2],
+            'track_ids': track_ids,
+            'description': row[3],
+            'followers': json.loads(row[4]),
+            'owner': row[5],
+            'metrics': metrics
+        }
+
+    def _playlist_metrics(self, playlist_id, track_count):
+        excluded = self.excluded_metric_artist_ids
+        excluded_filter = f"AND ta.artist_id NOT IN ({', '.join('?' * len(excluded))})" if excluded else ""
+        averaged_columns = ', '.join(f"AVG(af.{field})" for field in AVERAGED_AUDIO_FEATURES.values())
+
+        track_row = self._conn.execute(
+            f"""SELECT SUM(af.duration_ms), AVG(af.duration_ms), COUNT(af.track_id),
+                       MIN(t.release_year), MAX(t.release_year), AVG(t.release_year),
+                       AVG(COALESCE(t.popularity, 0)), COUNT(t.id), {averaged_columns}
+                FROM playlist_tracks pt
+                JOIN tracks t ON t.id = pt.track_id
+                LEFT JOIN audio_features af ON af.track_id = pt.track_id
+                WHERE pt.playlist_id = ?""", (playlist_id,)).fetchone()
+        (total_duration_ms, average_duration_ms, feature_count, min_year, max_year, average_year,
+         average_popularity, known_track_count) = track_row[:8]
+        average_features = track_row[8:]
+
+        # Genres and artists are counted once per artist appearance, in playlist order: appearances are
+        # ranked by (track position, artist position, genre position), each ranked by its first one
+        genres = [genre for (genre,) in self._conn.execute(
+            f"""SELECT genre
+                FROM (SELECT g.genre,
+                             ROW_NUMBER() OVER (ORDER BY pt.position, ta.position, g.position) AS appearance
+                      FROM playlist_tracks pt
+                      JOIN track_artists ta ON ta.track_id = pt.track_id
+                      JOIN artists a ON a.id = ta.artist_id
+                      JOIN genres g ON g.artist_id = a.id
+                      WHERE pt.playlist_id = ? {excluded_filter})
+                GROUP BY genre
+                ORDER BY MIN(appearance)""",
+            (playlist_id,) + excluded)]
+        artist_counts = self._conn.execute(
+            f"""SELECT name, COUNT(*) AS appearances
+                FROM (SELECT a.name, ROW_NUMBER() OVER (ORDER BY pt.position, ta.position) AS appearance
+                      FROM playlist_tracks pt
+                      JOIN track_artists ta ON ta.track_id = pt.track_id
+                      JOIN artists a ON a.id = ta.artist_id
+                      WHERE pt.playlist_id = ? {excluded_filter})
+                GROUP BY name
+                ORDER BY appearances DESC, MIN(appearance)""",
+            (playlist_id,) + excluded).fetchall()
+
+        metrics = {
+            'Track Count': track_count,
+            'Total Duration': round(((total_duration_ms or 0) / 1000) / 3600, 2),
+            'Average Track Duration': average_duration_ms / 1000 if feature_count else 0,
+            'Genre Distribution': genres,
+            'Artist Diversity': len(artist_counts),
+            'Release Year Range': f"{min_year} - {max_year}" if min_year is not None else 'N/A',
+            'Average Release Year': average_year if average_year is not None else 'N/A',
+            'Average Popularity Score': average_popularity if known_track_count else 0,
+        }
+        for metric_name, average in zip(AVERAGED_AUDIO_FEATURES, average_features):
+            metrics[metric_name] = average if feature_count else 0
+
+        if artist_counts:
+            metrics['Most Featured Artist(s)'] = [f"{name} ({count})" for name, count in artist_counts[:5]]
+        else:
+            metrics['Most Featured Artist(s)'] = 'N/A'
+        return metrics
+
+    def all_tracks(self):
+        """Returns every track in the library as a list shaped like the tracks cache entries."""
+        with self._lock:
+            track_rows = self._conn.execute(
+                f"""SELECT t.id, t.name, t.album, t.duration_ms, t.spotify_url, t.image_url, t.release_date,
+                           t.release_date_precision, af.track_id, {', '.join('af.' + f for f in AUDIO_FEATURE_FIELDS)}
+                    FROM tracks t LEFT JOIN audio_features af ON af.track_id = t.id
+                    ORDER BY t.id""").fetchall()
+            artist_rows = self._conn.execute(
+                "SELECT track_id, artist_id FROM track_artists ORDER BY track_id, position").fetchall()
+
+        # Both result sets are ordered by track ID, merge them in a single pass
+        all_tracks = []
+        artist_index = 0
+        for row in track_rows:
+            track_id = row[0]
+            artists = []
+            while artist_index < len(artist_rows) and artist_rows[artist_index][0] <= track_id:
+                if artist_rows[artist_index][0] == track_id:
+                    artists.append(artist_rows[artist_index][1])
+                artist_index += 1
+
+            track = {
+                'name': row[1],
+                'artists': artists,
+                'album': row[2],
+                'duration_ms': row[3],
+                'spotify_url': row[4],
+                'image_url': row[5],
+                'release_date': row[6],
+                'release_date_precision': row[7],
+            }
+            if row[8] is not None:
+                track['audio_features'] = dict(zip(AUDIO_FEATURE_FIELDS, row[9:]))
+            all_tracks.append(track)
+        return all_tracks
@@ -0,0 +1,378 @@
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+SECONDS_PER_DAY = 86400
+
+# Audio features tracked for taste drift in the daily rollups
+DRIFT_FEATURES = ('energy', 'valence', 'danceability', 'acousticness', 'tempo')
+
+# Plays shorter than this are skips and do not count as listening
+MIN_MS_PLAYED = 30000
+
+STREAM_CHUNK_SIZE = 1 << 16
+INSERT_BATCH_SIZE = 5000
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS plays (
+    played_at INTEGER NOT NULL, track_key TEXT NOT NULL, track_id TEXT, track_name TEXT,
+    artist_name TEXT, ms_played INTEGER NOT NULL, source TEXT NOT NULL,
+    PRIMARY KEY (played_at, track_key)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_rollup (day INTEGER PRIMARY KEY, ms_played INTEGER NOT NULL, plays INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS daily_artists (
+    day INTEGER NOT NULL, artist_name TEXT NOT NULL, ms_played INTEGER NOT NULL, plays INTEGER NOT NULL,
+    PRIMARY KEY (day, artist_name)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_features (
+    day INTEGER PRIMARY KEY, tracks_with_features INTEGER NOT NULL,
+    {', '.join(f'sum_{feature} REAL NOT NULL' for feature in DRIFT_FEATURES)});
+CREATE TABLE IF NOT EXISTS top_tracks (
+    snapshot_day INTEGER NOT NULL, time_range TEXT NOT NULL, rank INTEGER NOT NULL, track_id TEXT NOT NULL,
+    PRIMARY KEY (snapshot_day, time_range, rank)) WITHOUT ROWID;
+"""
+
+
+def _parse_timestamp(value):
+    """Parses the timestamps used by the Spotify API and exports into epoch seconds (UTC)."""
+    value = value.replace('Z', '+00:00')
+    if 'T' not in value:
+        # Account data exports use "YYYY-MM-DD HH:MM" in UTC
+        value = value.replace(' ', 'T') + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _track_key(track_id, artist_name, track_name):
+    # Account data exports carry no track IDs, so plays from every source are keyed on artist and track
+    # name, the one identity they all report. The ID is only used for plays reporting no names at all.
+    if not artist_name and not track_name:
+        return track_id
+    return f"{(artist_name or '').casefold()}\x1f{(track_name or '').casefold()}"
+
+
+def _played_minute(played_at):
+    # Account data exports report plays to the minute, so plays are stored and matched at that resolution
+    return played_at - played_at % 60
+
+
+def iter_json_array(path, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Incrementally parses a file holding a top-level JSON array, yielding one element at a time
+    so export files of any size are read with bounded memory.
+
+    Args:
+    - path: Path to the JSON file.
+    - chunk_size: Number of characters read from disk at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    exhausted = False
+
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            # Skip whitespace and separators between elements
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                if not started:
+                    if buffer[position] != '[':
+                        raise ValueError(f"{path} does not contain a JSON array.")
+                    started = True
+                    position += 1
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    element, position = decoder.raw_decode(buffer, position)
+                    yield element
+                    continue
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+
+            if exhausted:
+                if started:
+                    raise ValueError(f"{path} ended before the JSON array was closed.")
+                return
+            chunk = f.read(chunk_size)
+            exhausted = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def plays_from_streaming_history(path):
+    """
+    Yields normalized plays from a Spotify streaming history export, either a single JSON file or a
+    directory of them. Both the extended streaming history (`Streaming_History_Audio_*.json`) and the
+    account data (`StreamingHistory*.json`) formats are supported. Podcast episodes are skipped.
+    """
+    paths = sorted(glob.glob(os.path.join(path, '*.json'))) if os.path.isdir(path) else [path]
+    for file_path in paths:
+        logging.info(f"Streaming listening history from {file_path}.")
+        for record in iter_json_array(file_path):
+            if 'ts' in record:
+                # Extended streaming history
+                track_uri = record.get('spotify_track_uri')
+                if not track_uri:
+                    continue
+                yield {
+                    'played_at': _parse_timestamp(record['ts']),
+                    'track_id': track_uri.rsplit(':', 1)[-1],
+                    'track_name': record.get('master_metadata_track_name'),
+                    'artist_name': record.get('master_metadata_album_artist_name'),
+                    'ms_played': record.get('ms_played', 0),
+                    'source': 'export',
+                }
+            elif 'endTime' in record:
+                # Account data streaming history
+                yield {
+                    'played_at': _parse_timestamp(record['endTime']),
+                    'track_id': None,
+                    'track_name': record.get('trackName'),
+                    'artist_name': record.get('artistName'),
+                    'ms_played': record.get('msPlayed', 0),
+                    'source': 'export',
+                }
+
+
+def plays_from_recently_played(items):
+    """
+    Yields normalized plays from the items of a `current_user_recently_played` response. The API does
+    not report how long a track was played, so these plays carry no 'ms_played': they count as plays
+    in the rollups but add no minutes listened.
+    """
+    for item in items:
+        track = item.get('track')
+        if not track:
+            continue
+        artists = track.get('artists') or [{}]
+        yield {
+            'played_at': _parse_timestamp(item['played_at']),
+            'track_id': track.get('id'),
+            'track_name': track.get('name'),
+            'artist_name': artists[0].get('name'),
+            'ms_played': None,
+            'source': 'recently_played',
+        }
+
+
+class ListeningHistoryStore:
+    """
+    Deduplicated store of plays with daily rollups of minutes listened, top artists and audio feature
+    sums. Rollups are updated incrementally from the plays each ingestion actually adds, so history is
+    never rescanned; weekly views are derived from the daily buckets.
+    """
+
+    def __init__(self, db_path, audio_features_lookup=None):
+        """
+        Args:
+        - db_path: Path of the SQLite database file.
+        - audio_features_lookup: Optional callable taking track IDs and returning a dictionary of
+          their audio features, used for the taste drift rollups.
+        """
+        self.db_path = db_path
+        self.audio_features_lookup = audio_features_lookup
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def add_plays(self, plays):
+        """
+        Ingests plays from any iterable, in batches. Plays already stored (same minute, artist and track
+        name, whichever source reported them) are ignored.
+
+        Returns:
+        A dictionary with the number of plays 'received' and 'added'.
+        """
+        received = 0
+        added = 0
+        batch = []
+        for play in plays:
+            received += 1
+            batch.append(play)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                added += self._add_batch(batch)
+                batch = []
+        if batch:
+            added += self._add_batch(batch)
+
+        logging.info(f"Listening history ingestion: {received} plays received, {added} new.")
+        return {'received': received, 'added': added}
+
+    def _add_batch(self, plays):
+        new_plays = []
+        with self._lock, self._conn:
+            for play in plays:
+                play = dict(play, played_at=_played_minute(play['played_at']))
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO plays VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (play['played_at'], _track_key(play['track_id'], play['artist_name'], play['track_name']),
+                     play['track_id'], play['track_name'], play['artist_name'], play['ms_played'] or 0, play['source']))
+                if cursor.rowcount:
+                    new_plays.append(play)
+
+            if new_plays:
+                self._update_rollups(new_plays)
+        return len(new_plays)
+
+    def _update_rollups(self, new_plays):
+        """Folds newly stored plays into the daily buckets. Must run inside the insert transaction."""
+        # Plays of unknown length (recently played) are kept, they count as plays without minutes
+        listened = [play for play in new_plays if play['ms_played'] is None or play['ms_played'] >= MIN_MS_PLAYED]
+        daily = defaultdict(lambda: [0, 0])
+        daily_artists = defaultdict(lambda: [0, 0])
+        for play in listened:
+            day = play['played_at'] // SECONDS_PER_DAY
+            ms_played = play['ms_played'] or 0
+            daily[day][0] += ms_played
+            daily[day][1] += 1
+            if play['artist_name']:
+                daily_artists[(day, play['artist_name'])][0] += ms_played
+                daily_artists[(day, play['artist_name'])][1] += 1
+
+        self._conn.executemany(
+            """INSERT INTO daily_rollup VALUES (?, ?, ?)
+               ON CONFLICT (day) DO UPDATE SET ms_played = ms_played + excluded.ms_played, plays = plays + excluded.plays""",
+            ((day, ms_played, count) for day, (ms_played, count) in daily.items()))
+        self._conn.executemany(
+            """INSERT INTO daily_artists VALUES (?, ?, ?, ?)
+               ON CONFLICT (day, artist_name) DO UPDATE SET
+                   ms_played = ms_played + excluded.ms_played, plays = plays + excluded.plays""",
+            ((day, artist_name, ms_played, count) for (day, artist_name), (ms_played, count) in daily_artists.items()))
+
+        if self.audio_features_lookup is None:
+            return
+        features = self.audio_features_lookup({play['track_id'] for play in listened if play['track_id']})
+        daily_features = defaultdict(Counter)
+        for play in listened:
+            track_features = features.get(play['track_id'])
+            if not track_features:
+                continue
+            day_sums = daily_features[play['played_at'] // SECONDS_PER_DAY]
+            day_sums['tracks_with_features'] += 1
+            for feature in DRIFT_FEATURES:
+                day_sums[feature] += track_features.get(feature) or 0
+
+        sum_columns = ', '.join(f'sum_{feature}' for feature in DRIFT_FEATURES)
+        sum_updates = ', '.join(f'sum_{feature} = sum_{feature} + excluded.sum_{feature}' for feature in DRIFT_FEATURES)
+        self._conn.executemany(
+            f"""INSERT INTO daily_features (day, tracks_with_features, {sum_columns})
+                VALUES ({', '.join('?' * (len(DRIFT_FEATURES) + 2))})
+                ON CONFLICT (day) DO UPDATE SET
+                    tracks_with_features = tracks_with_features + excluded.tracks_with_features, {sum_updates}""",
+            ((day, sums['tracks_with_features']) + tuple(sums[feature] for feature in DRIFT_FEATURES)
+             for day, sums in daily_features.items()))
+
+    def record_top_tracks(self, time_range, track_ids, snapshot_time):
+        """Stores the user's current top tracks for a time range, one snapshot per day."""
+        snapshot_day = int(snapshot_time) // SECONDS_PER_DAY
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM top_tracks WHERE snapshot_day = ? AND time_range = ?", (snapshot_day, time_range))
+            self._conn.executemany(
+                "INSERT INTO top_tracks VALUES (?, ?, ?, ?)",
+                ((snapshot_day, time_range, rank, track_id) for rank, track_id in enumerate(track_ids, start=1)))
+
+    def top_tracks(self, time_range, start=None, end=None):
+        """
+        Returns the recorded top tracks snapshots of a time range, oldest first.
+
+        Args:
+        - time_range: 'short_term', 'medium_term' or 'long_term'.
+        - start, end: Optional inclusive bounds as epoch seconds.
+
+        Returns:
+        A list of dictionaries with the snapshot date and the track IDs in rank order.
+        """
+        start_day = int(start) // SECONDS_PER_DAY if start is not None else -2 ** 31
+        end_day = int(end) // SECONDS_PER_DAY if end is not None else 2 ** 31
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT snapshot_day, track_id FROM top_tracks
+                   WHERE time_range = ? AND snapshot_day BETWEEN ? AND ? ORDER BY snapshot_day, rank""",
+                (time_range, start_day, end_day)).fetchall()
+
+        snapshots = defaultdict(list)
+        for snapshot_day, track_id in rows:
+            snapshots[snapshot_day].append(track_id)
+        return [
+            {
+                'snapshot_date': datetime.fromtimestamp(snapshot_day * SECONDS_PER_DAY, tz=timezone.utc).date().isoformat(),
+                'track_ids': track_ids,
+            }
+            for snapshot_day, track_ids in snapshots.items()
+        ]
+
+    def rollups(self, period='day', start=None, end=None, top_artists_limit=5):
+        """
+        Returns listening rollups per day or per week (weeks start on Monday), read from the daily buckets.
+
+        Args:
+        - period: 'day' or 'week'.
+        - start, end: Optional inclusive bounds as epoch seconds.
+        - top_artists_limit: Number of top artists reported per period.
+
+        Returns:
+        A list of dictionaries with the period start date, minutes listened, play count,
+        top artists and average audio features.
+        """
+        if period not in ('day', 'week'):
+            raise ValueError(f"Unsupported rollup period: {period}")
+        # Epoch day 0 is a Thursday, shift by 3 days so weeks start on Monday
+        bucket = "day" if period == 'day' else "((day + 3) / 7) * 7 - 3"
+        start_day = int(start) // SECONDS_PER_DAY if start is not None else -2 ** 31
+        end_day = int(end) // SECONDS_PER_DAY if end is not None else 2 ** 31
+        feature_columns = ', '.join(f'SUM(sum_{feature})' for feature in DRIFT_FEATURES)
+
+        with self._lock:
+            totals = self._conn.execute(
+                f"""SELECT {bucket} AS bucket, SUM(ms_played), SUM(plays) FROM daily_rollup
+                    WHERE day BETWEEN ? AND ? GROUP BY bucket ORDER BY bucket""", (start_day, end_day)).fetchall()
+            artists = self._conn.execute(
+                f"""SELECT bucket, artist_name, ms_played FROM (
+                        SELECT {bucket} AS bucket, artist_name, SUM(ms_played) AS ms_played,
+                               ROW_NUMBER() OVER (PARTITION BY {bucket} ORDER BY SUM(ms_played) DESC, artist_name) AS artist_rank
+                        FROM daily_artists WHERE day BETWEEN ? AND ? GROUP BY bucket, artist_name)
+                    WHERE artist_rank <= ?""", (start_day, end_day, top_artists_limit)).fetchall()
+            features = self._conn.execute(
+                f"""SELECT {bucket} AS bucket, SUM(tracks_with_features), {feature_columns} FROM daily_features
+                    WHERE day BETWEEN ? AND ? GROUP BY bucket""", (start_day, end_day)).fetchall()
+
+        top_artists = defaultdict(list)
+        for bucket_day, artist_name, ms_played in artists:
+            top_artists[bucket_day].append({'name': artist_name, 'minutes_listened': round(ms_played / 60000, 1)})
+        average_features = {
+            row[0]: {feature: round(total / row[1], 4) for feature, total in zip(DRIFT_FEATURES, row[2:])}
+            for row in features if row[1]
+        }
+
+        return [
+            {
+                'period_start': datetime.fromtimestamp(bucket_day * SECONDS_PER_DAY, tz=timezone.utc).date().isoformat(),
+                'minutes_listened': round(ms_played / 60000, 1),
+                'plays': plays,
+                'top_artists': top_artists.get(bucket_day, []),
+                'audio_features': average_features.get(bucket_day),
+            }
+            for bucket_day, ms_played, plays in totals
+        ]
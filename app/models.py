@@ -10,6 +10,8 @@ class SpotifyCache:
         self.artists_cache = {}
         self.playlist_cache = {}
         self.last_updated = 0  # Timestamp of the last cache update
+        self.generation = 0  # Monotonic version, bumped by every update and in-place edit
+        self.file_mtime = None  # Modification time of the cache file when last loaded or saved
         self.load_cache()
 
     def load_cache(self):
@@ -20,6 +22,8 @@ class SpotifyCache:
                 self.tracks_cache = data.get('tracks_details', {})
                 self.artists_cache = data.get('artists_details', {})
                 self.last_updated = data.get('last_updated', time.time())  # Use current time if not available
+                self.generation = data.get('generation', 0)
+            self.file_mtime = os.stat(self.json_file_path).st_mtime_ns
             logging.info("Cache loaded from file.")
         else:
             logging.info("Cache file not found, starting with empty caches.")
@@ -41,19 +45,70 @@ class SpotifyCache:
         self.tracks_cache = tracks_details
         self.artists_cache = artists_details
         self.last_updated = time.time()
+        self.generation += 1
         logging.info("Cache updated with latest data from spotify.")
         self.save_cache_to_file()
 
+    def reload_if_changed(self):
+        """
+        Reloads the cache if another process saved the cache file since it was last loaded or saved here.
+
+        Returns:
+        - bool: True if the cache was reloaded.
+        """
+        try:
+            file_mtime = os.stat(self.json_file_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if file_mtime == self.file_mtime:
+            return False
+        self.load_cache()
+        return True
+
+    def invalidate(self):
+        """Marks the cache as outdated so the next freshness check refetches everything."""
+        self.last_updated = 0
+
+    def remove_playlist_tracks(self, playlist_id, track_ids, snapshot_id=None):
+        """
+        Removes every occurrence of the given tracks from a cached playlist, in place. The generation is
+        left to the caller to bump, once the metrics derived from the playlist are recomputed as well.
+
+        Args:
+        - playlist_id (str): The Spotify ID of the playlist.
+        - track_ids (list): The Spotify IDs of the tracks to remove.
+        - snapshot_id (str): The playlist snapshot ID returned by Spotify after the edit.
+
+        Returns:
+        - int: The number of removed track entries, or None if the playlist is not cached.
+        """
+        playlist = self.playlist_cache.get(playlist_id)
+        if playlist is None:
+            return None
+
+        removed_ids = set(track_ids)
+        kept_track_ids = [track_id for track_id in playlist['track_ids'] if track_id not in removed_ids]
+        removed_count = len(playlist['track_ids']) - len(kept_track_ids)
+        playlist['track_ids'] = kept_track_ids
+        if snapshot_id:
+            playlist['snapshot_id'] = snapshot_id
+        return removed_count
+
     def save_cache_to_file(self):
         data_to_save = {
             'playlists_data': self.playlist_cache,
             'tracks_details': self.tracks_cache,
             'artists_details': self.artists_cache,
-            'last_updated': self.last_updated
+            'last_updated': self.last_updated,
+            'generation': self.generation
         }
         try:
-            with open(self.json_file_path, 'w', encoding='utf-8') as f:
+            # Write then rename, so processes reloading the file never read a partial one
+            tmp_path = f'{self.json_file_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data_to_save, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.json_file_path)
+            self.file_mtime = os.stat(self.json_file_path).st_mtime_ns
             logging.info("Cache successfully saved to file.")
         except Exception as e:
             logging.error(f"Failed to save cache to file: {e}")
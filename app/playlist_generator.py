@@ -0,0 +1,174 @@
+import logging
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+# Audio features a playlist can be generated against, in feature matrix column order
+TARGET_FEATURES = ('energy', 'valence', 'tempo', 'danceability')
+
+# Spread used to put features on a common scale when scoring distance to the target
+FEATURE_SCALES = np.array([1.0, 1.0, 200.0, 1.0], dtype=np.float32)
+
+# Stop adding tracks once the playlist is within this much of the target duration
+DURATION_TOLERANCE_MS = 60000
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class PlaylistGenerator:
+    """
+    Builds playlists from the library by audio-feature targets and constraints.
+
+    The features of every track are held in a NumPy matrix, rebuilt at refresh time, along with
+    posting lists of track rows per artist and per genre. A request is answered by a vectorized
+    candidate filter over the matrix followed by a greedy selection, so no per-track Python work
+    happens outside the (small) selected set.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.track_ids = np.array([], dtype=object)
+        self.features = np.empty((0, len(TARGET_FEATURES)), dtype=np.float32)
+        self.durations = np.array([], dtype=np.int64)
+        self.primary_artist_rows = np.array([], dtype=np.int32)
+        self.artist_rows = {}
+        self.genre_rows = {}
+
+    def rebuild(self, tracks_details, artists_details):
+        """
+        Rebuilds the feature matrix and the artist and genre posting lists from the cache.
+        Tracks without audio features are left out.
+
+        Args:
+        - tracks_details (dict): Tracks keyed by track ID, as held in the cache.
+        - artists_details (dict): Artists keyed by artist ID, as held in the cache.
+        """
+        track_ids, feature_rows, durations, primary_artists = [], [], [], []
+        artist_rows = defaultdict(list)
+        for track_id, track in tracks_details.items():
+            audio_features = track.get('audio_features')
+            if not audio_features:
+                continue
+            row = len(track_ids)
+            track_ids.append(track_id)
+            feature_rows.append([audio_features.get(feature) or 0 for feature in TARGET_FEATURES])
+            durations.append(track.get('duration_ms') or 0)
+            artist_ids = track.get('artists', [])
+            primary_artists.append(artist_ids[0] if artist_ids else None)
+            for artist_id in artist_ids:
+                artist_rows[artist_id].append(row)
+
+        genre_rows = defaultdict(list)
+        for artist_id, rows in artist_rows.items():
+            for genre in artists_details.get(artist_id, {}).get('genre', []):
+                genre_rows[genre].extend(rows)
+
+        artist_row_index = {artist_id: index for index, artist_id in enumerate(artist_rows)}
+        with self._lock:
+            self.track_ids = np.array(track_ids, dtype=object)
+            self.features = np.array(feature_rows, dtype=np.float32).reshape(-1, len(TARGET_FEATURES))
+            self.durations = np.array(durations, dtype=np.int64)
+            self.primary_artist_rows = np.array(
+                [artist_row_index.get(artist_id, -1) for artist_id in primary_artists], dtype=np.int32)
+            self.artist_rows = {artist_id: np.array(rows, dtype=np.int32) for artist_id, rows in artist_rows.items()}
+            self.genre_rows = {genre: np.unique(np.array(rows, dtype=np.int32)) for genre, rows in genre_rows.items()}
+        logging.info(f"Playlist generator rebuilt with {len(track_ids)} tracks.")
+
+    def _rows_mask(self, posting_lists, keys, num_tracks):
+        mask = np.zeros(num_tracks, dtype=bool)
+        for key in keys:
+            rows = posting_lists.get(key)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def generate(self, targets=None, genres=None, artists=None, exclude_artists=None, count=None,
+                 target_duration_ms=None, max_tracks_per_artist=None):
+        """
+        Picks tracks matching the audio feature targets and constraints.
+
+        Args:
+        - targets (dict): (min, max) ranges keyed by feature name, any of TARGET_FEATURES.
+        - genres (list): Only tracks by artists in any of these genres.
+        - artists (list): Only tracks by any of these artist IDs.
+        - exclude_artists (list): Leave out tracks by any of these artist IDs.
+        - count (int): Number of tracks to pick.
+        - target_duration_ms (int): Total duration to aim for. Defaults to no limit if count is given.
+        - max_tracks_per_artist (int): Cap on tracks sharing the same primary artist.
+
+        Returns:
+        A dictionary with the picked track IDs, their total duration and the number of candidates.
+        """
+        targets = targets or {}
+        if not isinstance(targets, dict):
+            raise ValueError("Targets must be an object of (min, max) ranges keyed by feature.")
+        unknown_features = set(targets) - set(TARGET_FEATURES)
+        if unknown_features:
+            raise ValueError(f"Unsupported target features: {', '.join(sorted(unknown_features))}")
+        for feature, target in targets.items():
+            if (not isinstance(target, (list, tuple)) or len(target) != 2
+                    or not all(_is_number(bound) for bound in target)):
+                raise ValueError(f"Target for {feature} must be a [min, max] pair of numbers.")
+        for name, value in (('count', count), ('target_duration_ms', target_duration_ms),
+                            ('max_tracks_per_artist', max_tracks_per_artist)):
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                raise ValueError(f"{name} must be a non-negative integer.")
+        if count is None and target_duration_ms is None:
+            raise ValueError("Either a track count or a target duration is required.")
+
+        with self._lock:
+            track_ids, features, durations = self.track_ids, self.features, self.durations
+            primary_artist_rows = self.primary_artist_rows
+            artist_rows, genre_rows = self.artist_rows, self.genre_rows
+
+        num_tracks = len(track_ids)
+        mask = np.ones(num_tracks, dtype=bool)
+        centre = features.mean(axis=0) if num_tracks else np.zeros(len(TARGET_FEATURES), dtype=np.float32)
+        for column, feature in enumerate(TARGET_FEATURES):
+            if feature not in targets:
+                continue
+            low, high = targets[feature]
+            mask &= (features[:, column] >= low) & (features[:, column] <= high)
+            centre[column] = (low + high) / 2
+        if genres:
+            mask &= self._rows_mask(genre_rows, genres, num_tracks)
+        if artists:
+            mask &= self._rows_mask(artist_rows, artists, num_tracks)
+        if exclude_artists:
+            mask &= ~self._rows_mask(artist_rows, exclude_artists, num_tracks)
+
+        candidate_rows = np.flatnonzero(mask)
+        # Closest to the middle of the requested ranges first, only the constrained features count
+        weights = np.array([feature in targets for feature in TARGET_FEATURES], dtype=np.float32)
+        if not weights.any():
+            weights[:] = 1
+        distances = (np.abs(features[candidate_rows] - centre) / FEATURE_SCALES * weights).sum(axis=1)
+        candidate_rows = candidate_rows[np.argsort(distances, kind='stable')]
+
+        picked_rows = []
+        total_duration_ms = 0
+        tracks_per_artist = defaultdict(int)
+        for row in candidate_rows:
+            if count is not None and len(picked_rows) >= count:
+                break
+            if target_duration_ms is not None and total_duration_ms >= target_duration_ms - DURATION_TOLERANCE_MS:
+                break
+            duration_ms = int(durations[row])
+            if target_duration_ms is not None and total_duration_ms + duration_ms > target_duration_ms + DURATION_TOLERANCE_MS:
+                continue
+            if max_tracks_per_artist is not None:
+                primary_artist_row = primary_artist_rows[row]
+                if tracks_per_artist[primary_artist_row] >= max_tracks_per_artist:
+                    continue
+                tracks_per_artist[primary_artist_row] += 1
+            picked_rows.append(row)
+            total_duration_ms += duration_ms
+
+        return {
+            'track_ids': track_ids[picked_rows].tolist() if picked_rows else [],
+            'duration_ms': total_duration_ms,
+            'num_candidates': len(candidate_rows)
+        }
@@ -0,0 +1,390 @@
+import logging
+import math
+import sqlite3
+import struct
+import threading
+
+# A playlist's full state is checkpointed after this many deltas, bounding the replay of any query
+CHECKPOINT_INTERVAL = 32
+
+# Metric values are stored as float32 next to a one-byte metric key
+METRIC_VALUE = struct.Struct('<Bf')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_keys (
+    key INTEGER PRIMARY KEY,
+    track_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS metric_keys (
+    key INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS deltas (
+    playlist_id TEXT NOT NULL,
+    recorded_at INTEGER NOT NULL,
+    present INTEGER NOT NULL,
+    added BLOB NOT NULL,
+    removed BLOB NOT NULL,
+    metrics BLOB NOT NULL,
+    PRIMARY KEY (playlist_id, recorded_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checkpoints (
+    playlist_id TEXT NOT NULL,
+    recorded_at INTEGER NOT NULL,
+    present INTEGER NOT NULL,
+    track_keys BLOB NOT NULL,
+    metrics BLOB NOT NULL,
+    PRIMARY KEY (playlist_id, recorded_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    latest_recorded_at INTEGER NOT NULL
+);
+"""
+
+# Stores created before keys were assigned in SQL keyed track_keys by track ID, without a rowid
+MIGRATE_TRACK_KEYS = """
+CREATE TABLE track_keys_by_key (
+    key INTEGER PRIMARY KEY,
+    track_id TEXT NOT NULL UNIQUE
+);
+INSERT INTO track_keys_by_key (key, track_id) SELECT key, track_id FROM track_keys;
+DROP TABLE track_keys;
+ALTER TABLE track_keys_by_key RENAME TO track_keys;
+"""
+
+
+def encode_keys(keys):
+    """
+    Packs integer keys as zigzag varints of the difference to the previous key. Keys are assigned in
+    the order tracks are first seen, so the keys of a playlist are nearly ascending and mostly take
+    a single byte each.
+    """
+    encoded = bytearray()
+    previous = 0
+    for key in keys:
+        delta = key - previous
+        previous = key
+        value = (delta << 1) ^ (delta >> 63)
+        while value >= 0x80:
+            encoded.append((value & 0x7F) | 0x80)
+            value >>= 7
+        encoded.append(value)
+    return bytes(encoded)
+
+
+def decode_keys(encoded):
+    """Unpacks the keys packed by encode_keys."""
+    keys = []
+    previous = 0
+    value = shift = 0
+    for byte in encoded:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += (value >> 1) ^ -(value & 1)
+        keys.append(previous)
+        value = shift = 0
+    return keys
+
+
+def numeric_metrics(metrics):
+    """Keeps the numeric metrics of a playlist, the ones a trend can be drawn for."""
+    return {
+        name: float(value) for name, value in (metrics or {}).items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+class PlaylistHistoryStore:
+    """
+    Append-only history of the playlists, as per-refresh deltas: the tracks added to and removed from
+    each playlist and the metrics that changed. Unchanged playlists cost nothing, and every
+    CHECKPOINT_INTERVAL deltas a playlist's full state is checkpointed, so any point in time is
+    rebuilt by replaying at most that many deltas from the nearest checkpoint.
+
+    Track IDs are interned as small integer keys and packed as varints, and metrics as float32, so
+    years of daily refreshes fit in a few MB.
+
+    Playlists are tracked as ordered sets: added tracks are appended in playlist order, removed ones
+    dropped, and repeated entries of a track are kept once.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        track_keys_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(track_keys)")]
+        if track_keys_columns == ['track_id', 'key']:
+            self._conn.executescript(MIGRATE_TRACK_KEYS)
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO state (id, latest_recorded_at) "
+            "SELECT 1, COALESCE(MAX(recorded_at), 0) FROM deltas")
+        self._conn.commit()
+        self._forget()
+
+    def _load_track_keys(self):
+        # Keys are rowids, only ever appended, so the ones not loaded yet are above the last loaded
+        for key, track_id in self._conn.execute(
+                "SELECT key, track_id FROM track_keys WHERE key > ? ORDER BY key", (self._loaded_track_key,)):
+            self._track_keys[track_id] = key
+            self._track_ids[key] = track_id
+            self._loaded_track_key = key
+
+    def _load_metric_keys(self):
+        self._metric_keys = dict(self._conn.execute("SELECT name, key FROM metric_keys"))
+        self._metric_names = {key: name for name, key in self._metric_keys.items()}
+
+    def _track_key(self, track_id):
+        key = self._track_keys.get(track_id)
+        if key is None:
+            self._conn.execute(
+                "INSERT INTO track_keys (track_id) VALUES (?) ON CONFLICT (track_id) DO NOTHING", (track_id,))
+            key = self._conn.execute("SELECT key FROM track_keys WHERE track_id = ?", (track_id,)).fetchone()[0]
+            self._track_keys[track_id] = key
+            self._track_ids[key] = track_id
+        return key
+
+    def _track_ids_for(self, keys):
+        if any(key not in self._track_ids for key in keys):
+            self._load_track_keys()
+        return [self._track_ids[key] for key in keys]
+
+    def _metric_key(self, name):
+        key = self._metric_keys.get(name)
+        if key is None:
+            self._conn.execute("INSERT INTO metric_keys (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (name,))
+            key = self._conn.execute("SELECT key FROM metric_keys WHERE name = ?", (name,)).fetchone()[0]
+            if key > 0xFF:
+                raise ValueError(f"Too many distinct playlist metrics to record {name!r}.")
+            self._metric_keys[name] = key
+            self._metric_names[key] = name
+        return key
+
+    def _forget(self):
+        # Keys are assigned in SQL, so processes sharing the file agree on them. These only memoize
+        # the keys already resolved, and are reloaded when a key assigned elsewhere is missing
+        self._track_keys = {}
+        self._track_ids = {}
+        self._loaded_track_key = 0
+        self._metric_keys = {}
+        self._metric_names = {}
+        # Latest state of each playlist, reused while no other process recorded a newer delta
+        self._heads = {}
+
+    def _metric_names_for(self, keys):
+        if any(key not in self._metric_names for key in keys):
+            self._load_metric_keys()
+        return self._metric_names
+
+    @staticmethod
+    def _pack_metrics(metrics):
+        return b''.join(METRIC_VALUE.pack(key, value) for key, value in sorted(metrics.items()))
+
+    def _replay(self, playlist_id, until, decode_tracks=True):
+        """
+        Rebuilds a playlist's state at `until` (the latest if None) from the nearest checkpoint.
+
+        Returns:
+        A (recorded_at, present, track keys, metrics by metric key, deltas replayed after the
+        checkpoint) tuple, or None if nothing was recorded for the playlist by then.
+        """
+        until = until if until is not None else math.inf
+        checkpoint = self._conn.execute(
+            "SELECT recorded_at, present, track_keys, metrics FROM checkpoints "
+            "WHERE playlist_id = ? AND recorded_at <= ? ORDER BY recorded_at DESC LIMIT 1",
+            (playlist_id, until)).fetchone()
+        if checkpoint is None:
+            recorded_at, present, track_keys, metrics = None, False, [], {}
+        else:
+            recorded_at, present = checkpoint[0], bool(checkpoint[1])
+            track_keys = decode_keys(checkpoint[2]) if decode_tracks else []
+            metrics = dict(METRIC_VALUE.iter_unpack(checkpoint[3]))
+
+        deltas = self._conn.execute(
+            "SELECT recorded_at, present, added, removed, metrics FROM deltas "
+            "WHERE playlist_id = ? AND recorded_at > ? AND recorded_at <= ? ORDER BY recorded_at",
+            (playlist_id, recorded_at if recorded_at is not None else -1, until)).fetchall()
+        for recorded_at, present, added, removed, changed_metrics in deltas:
+            present = bool(present)
+            if decode_tracks:
+                removed_keys = set(decode_keys(removed))
+                if removed_keys:
+                    track_keys = [key for key in track_keys if key not in removed_keys]
+                track_keys.extend(decode_keys(added))
+            metrics = {**metrics, **dict(METRIC_VALUE.iter_unpack(changed_metrics))} if present else {}
+
+        if recorded_at is None:
+            return None
+        return recorded_at, present, track_keys, metrics, len(deltas)
+
+    def _head(self, playlist_id):
+        latest = self._conn.execute(
+            "SELECT MAX(recorded_at) FROM deltas WHERE playlist_id = ?", (playlist_id,)).fetchone()[0]
+        head = self._heads.get(playlist_id)
+        if head is None or head['recorded_at'] != latest:
+            replayed = self._replay(playlist_id, None)
+            if replayed is None:
+                head = {'recorded_at': None, 'present': False, 'track_keys': [], 'metrics': {}, 'since_checkpoint': 0}
+            else:
+                recorded_at, present, track_keys, metrics, replayed_deltas = replayed
+                # The checkpoint is written along with a delta, which counts too
+                head = {'recorded_at': recorded_at, 'present': present, 'track_keys': track_keys,
+                        'metrics': metrics, 'since_checkpoint': replayed_deltas + 1}
+            self._heads[playlist_id] = head
+        return head
+
+    def record(self, recorded_at, playlists, complete=True):
+        """
+        Records the deltas of the playlists that changed since their last recorded state.
+
+        Args:
+        - recorded_at (int): Timestamp of the refresh, in epoch seconds.
+        - playlists (dict): Playlist details keyed by ID, with 'track_ids' and 'metrics'.
+        - complete (bool): The playlists are the whole library, so recorded playlists missing from
+          them were deleted. False when recording a few edited playlists.
+
+        Returns:
+        The number of playlists with a new delta.
+        """
+        with self._lock:
+            try:
+                with self._conn:
+                    # Take the write lock up front, so heads read below cannot be outdated by another process
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    recorded_at, changed = self._record(recorded_at, playlists, complete)
+            except Exception:
+                # Keys and heads resolved in the rolled back transaction may not exist in the file
+                self._forget()
+                raise
+        logging.info(f"Playlist history: {changed} playlists changed at {recorded_at}.")
+        return changed
+
+    def _record(self, recorded_at, playlists, complete):
+        latest_recorded_at = self._conn.execute("SELECT latest_recorded_at FROM state").fetchone()[0]
+        # Keep the deltas of each playlist strictly ordered, even if the clock went backwards
+        recorded_at = max(int(recorded_at), latest_recorded_at + 1)
+        playlist_ids = set(playlists)
+        if complete:
+            playlist_ids.update(row[0] for row in self._conn.execute(
+                "SELECT DISTINCT playlist_id FROM checkpoints"))
+
+        changed = 0
+        for playlist_id in playlist_ids:
+            head = self._head(playlist_id)
+            playlist = playlists.get(playlist_id)
+            present = playlist is not None
+            track_keys = list(dict.fromkeys(
+                self._track_key(track_id) for track_id in playlist.get('track_ids', []))) if present else []
+            metrics = {self._metric_key(name): value
+                       for name, value in numeric_metrics(playlist.get('metrics')).items()} if present else {}
+
+            current_keys = set(track_keys)
+            previous_keys = set(head['track_keys'])
+            added = [key for key in track_keys if key not in previous_keys]
+            removed = sorted(previous_keys - current_keys)
+            # Compare at the stored float32 precision, so unchanged metrics are not recorded again
+            changed_metrics = {
+                key: value for key, value in metrics.items()
+                if key not in head['metrics'] or struct.pack('<f', value) != struct.pack('<f', head['metrics'][key])}
+            if present == head['present'] and not added and not removed and not changed_metrics:
+                continue
+
+            changed += 1
+            if head['since_checkpoint'] == 0 or head['since_checkpoint'] >= CHECKPOINT_INTERVAL:
+                self._conn.execute(
+                    "INSERT INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+                    (playlist_id, recorded_at, int(present), encode_keys(track_keys),
+                     self._pack_metrics(metrics)))
+                since_checkpoint = 1
+            else:
+                since_checkpoint = head['since_checkpoint'] + 1
+            self._conn.execute(
+                "INSERT INTO deltas VALUES (?, ?, ?, ?, ?, ?)",
+                (playlist_id, recorded_at, int(present), encode_keys(added), encode_keys(removed),
+                 self._pack_metrics(changed_metrics)))
+
+            kept_keys = [key for key in head['track_keys'] if key in current_keys] if removed else head['track_keys']
+            head.update(recorded_at=recorded_at, present=present, track_keys=kept_keys + added,
+                        since_checkpoint=since_checkpoint,
+                        metrics={**head['metrics'], **changed_metrics} if present else {})
+
+        if changed:
+            self._conn.execute("UPDATE state SET latest_recorded_at = ?", (recorded_at,))
+        return recorded_at, changed
+
+    def playlist_at(self, playlist_id, timestamp=None):
+        """
+        Rebuilds a playlist as it was at a point in time.
+
+        Args:
+        - playlist_id (str): The Spotify ID of the playlist.
+        - timestamp (int): Epoch seconds, the latest recorded state if None.
+
+        Returns:
+        A dictionary with the track IDs and metrics of the playlist, and 'as_of', the timestamp of
+        the refresh that produced that state. None if the playlist did not exist at that time.
+        """
+        with self._lock:
+            replayed = self._replay(playlist_id, timestamp)
+            if replayed is None or not replayed[1]:
+                return None
+            recorded_at, _, track_keys, metrics, _ = replayed
+            track_ids = self._track_ids_for(track_keys)
+            metric_names = self._metric_names_for(metrics)
+        return {
+            'playlist_id': playlist_id,
+            'as_of': recorded_at,
+            'track_ids': track_ids,
+            'metrics': {metric_names[key]: value for key, value in metrics.items()}
+        }
+
+    def metric_trend(self, playlist_id, metric_names=None, start=None, end=None):
+        """
+        Returns how a playlist's metrics changed over time, one point per refresh that changed them.
+
+        Args:
+        - playlist_id (str): The Spotify ID of the playlist.
+        - metric_names (list): Metrics to include, every numeric metric if None.
+        - start, end (int): Optional epoch seconds bounding the trend.
+
+        Returns:
+        A list of dictionaries with 'recorded_at' and the value of each metric at that time.
+        """
+        with self._lock:
+            self._load_metric_keys()
+            names_by_key = dict(self._metric_names)
+            wanted = set(metric_names) if metric_names else set(names_by_key.values())
+
+            # Start from the state just before the range, then walk the deltas within it
+            metrics = {}
+            if start is not None:
+                replayed = self._replay(playlist_id, start - 1, decode_tracks=False)
+                if replayed is not None and replayed[1]:
+                    metrics = replayed[3]
+            rows = self._conn.execute(
+                "SELECT recorded_at, present, metrics FROM deltas "
+                "WHERE playlist_id = ? AND recorded_at >= ? AND recorded_at <= ? ORDER BY recorded_at",
+                (playlist_id, start if start is not None else 0, end if end is not None else math.inf)).fetchall()
+
+        trend = []
+        if metrics and start is not None:
+            trend.append(dict({'recorded_at': start}, **{
+                names_by_key[key]: value for key, value in metrics.items() if names_by_key[key] in wanted}))
+        for recorded_at, present, changed_metrics in rows:
+            if not present:
+                metrics = {}
+                continue
+            changed = dict(METRIC_VALUE.iter_unpack(changed_metrics))
+            metrics.update(changed)
+            if not any(names_by_key[key] in wanted for key in changed):
+                continue
+            trend.append(dict({'recorded_at': recorded_at}, **{
+                names_by_key[key]: value for key, value in metrics.items() if names_by_key[key] in wanted}))
+        return trend
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
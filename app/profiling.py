@@ -0,0 +1,173 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+
+from flask import g, request
+
+# Header or query parameter carrying the admin token to profile a single request, the header is the
+# one the other admin routes take
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+PROFILE_QUERY_PARAMETER = '__profile'
+
+RECENT_PROFILES_LIMIT = 50
+TOP_ALLOCATIONS_LIMIT = 15
+TRACEMALLOC_FRAMES = 5
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling: cProfile for CPU time and tracemalloc for allocations.
+
+    A request is profiled when it carries the admin token in the X-Admin-Token header (or the __profile
+    query parameter), or when it falls in the sampled fraction of traffic. Each profile is dumped as a
+    pstats file, with the top allocations next to it as JSON. Only the most recent profiles are kept,
+    the files of older ones are deleted. The hooks are only registered when profiling is configured,
+    so an unconfigured app pays nothing.
+
+    One request is profiled at a time: profilers and tracemalloc are process-wide, so concurrent
+    candidates are served unprofiled rather than skewing each other's results.
+    """
+
+    def __init__(self, directory, admin_token=None, sample_rate=0.0):
+        self.directory = directory
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.recent_profiles = deque(maxlen=RECENT_PROFILES_LIMIT)
+        self._active = threading.Lock()
+        self._recent_profiles_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def register(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        logging.info(f"Request profiling enabled (sample rate {self.sample_rate}), profiles written to {self.directory}.")
+
+    def is_admin(self):
+        """Checks the admin token carried by the current request."""
+        token = request.headers.get(ADMIN_TOKEN_HEADER) or request.args.get(PROFILE_QUERY_PARAMETER)
+        return bool(self.admin_token and token and hmac.compare_digest(token, self.admin_token))
+
+    def _should_profile(self):
+        if request.endpoint == 'get_profiles':
+            # Reading the profiles must not add to them
+            return False
+        return self.is_admin() or (self.sample_rate and random.random() < self.sample_rate)
+
+    def _start(self):
+        if not self._should_profile() or not self._active.acquire(blocking=False):
+            return
+        g.profile_id = uuid.uuid4().hex[:12]
+        g.profile_started_at = time.perf_counter()
+        g.profile_stopped_tracemalloc = not tracemalloc.is_tracing()
+        if g.profile_stopped_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        g.profile_allocations_before = tracemalloc.take_snapshot()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    def _stop(self):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return None
+        profiler.disable()
+        try:
+            allocations_after = tracemalloc.take_snapshot()
+            allocations_before = g.pop('profile_allocations_before')
+            if g.pop('profile_stopped_tracemalloc'):
+                tracemalloc.stop()
+            return profiler, allocations_before, allocations_after
+        finally:
+            self._active.release()
+
+    def _finish(self, response):
+        stopped = self._stop()
+        if stopped is None:
+            return response
+        profiler, allocations_before, allocations_after = stopped
+
+        profile_id = g.profile_id
+        duration_ms = (time.perf_counter() - g.profile_started_at) * 1000
+        pstats_path, allocations_path = self._profile_paths(profile_id)
+        profiler.dump_stats(pstats_path)
+
+        top_allocations = [
+            {'location': str(stat.traceback[0]), 'size_diff_kb': round(stat.size_diff / 1024, 1), 'count_diff': stat.count_diff}
+            for stat in allocations_after.compare_to(allocations_before, 'lineno')[:TOP_ALLOCATIONS_LIMIT]]
+        with open(allocations_path, 'w') as f:
+            json.dump(top_allocations, f, indent=2)
+
+        self._add_recent_profile({
+            'id': profile_id,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'profiled_at': time.time(),
+            'pstats_file': pstats_path,
+            'top_allocations': top_allocations[:5]
+        })
+        response.headers['X-Profile-Id'] = profile_id
+        logging.info(f"Profiled {request.method} {request.path} in {duration_ms:.1f} ms, written to {pstats_path}.")
+        return response
+
+    def _profile_paths(self, profile_id):
+        return (os.path.join(self.directory, f'{profile_id}.prof'),
+                os.path.join(self.directory, f'{profile_id}.allocations.json'))
+
+    def _add_recent_profile(self, profile):
+        with self._recent_profiles_lock:
+            evicted = self.recent_profiles[0] if len(self.recent_profiles) == self.recent_profiles.maxlen else None
+            self.recent_profiles.append(profile)
+        if evicted is None:
+            return
+        # The deque bounds the listed profiles, their files must not outlive them
+        for path in self._profile_paths(evicted['id']):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _teardown(self, exception):
+        # The request failed before after_request ran, release the profiler without dumping it
+        self._stop()
+
+    def hot_spots(self, limit=25):
+        """
+        Aggregates the recent profiles and returns the functions with the highest cumulative time.
+
+        Returns:
+        A list of dictionaries with the function, its call count, total and cumulative time.
+        """
+        stats = None
+        for profile in list(self.recent_profiles):
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile['pstats_file'])
+                else:
+                    stats.add(profile['pstats_file'])
+            except FileNotFoundError:
+                # Evicted by a concurrent request
+                continue
+        if stats is None:
+            return []
+
+        hot_spots = []
+        for (filename, line_number, function_name), (_, num_calls, total_time, cumulative_time, _) in stats.stats.items():
+            hot_spots.append({
+                'function': f'{filename}:{line_number}({function_name})',
+                'calls': num_calls,
+                'total_time_ms': round(total_time * 1000, 3),
+                'cumulative_time_ms': round(cumulative_time * 1000, 3)
+            })
+        hot_spots.sort(key=lambda hot_spot: hot_spot['cumulative_time_ms'], reverse=True)
+        return hot_spots[:limit]
@@ -0,0 +1,145 @@
+import logging
+import threading
+from array import array
+
+# Posting lists hold unsigned 32-bit keys
+POSTING_TYPECODE = 'I'
+
+
+class _Interner:
+    """Assigns sequential integer keys to string IDs, and maps them back."""
+
+    def __init__(self):
+        self.keys = {}
+        self.ids = []
+
+    def key(self, entity_id):
+        key = self.keys.get(entity_id)
+        if key is None:
+            key = len(self.ids)
+            self.keys[entity_id] = key
+            self.ids.append(entity_id)
+        return key
+
+
+class ReverseIndex:
+    """
+    Track -> playlists and artist -> tracks lookups over the cached library, so neither needs a scan
+    of every playlist or of the whole tracks cache.
+
+    Playlist, track and artist IDs are interned as integer keys, and each posting list is an
+    array('I') of keys, a few bytes per entry instead of a Python object each. The forward lists
+    (playlist -> tracks, track -> artists) are kept too, so a changed playlist or track is reindexed
+    in place by diffing its old and new lists.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._playlists = _Interner()
+        self._tracks = _Interner()
+        self._artists = _Interner()
+        self._playlist_tracks = {}
+        self._track_playlists = {}
+        self._track_artists = {}
+        self._artist_tracks = {}
+
+    @staticmethod
+    def _reindex(forward, backward, source_key, target_keys):
+        # Replaces the posting lists of one source, touching only the targets that changed
+        old_targets = set(forward.pop(source_key, ()))
+        new_targets = list(dict.fromkeys(target_keys))
+        if new_targets:
+            forward[source_key] = array(POSTING_TYPECODE, new_targets)
+        for target_key in old_targets.difference(new_targets):
+            postings = backward[target_key]
+            postings.remove(source_key)
+            if not postings:
+                del backward[target_key]
+        for target_key in new_targets:
+            if target_key not in old_targets:
+                backward.setdefault(target_key, array(POSTING_TYPECODE)).append(source_key)
+
+    def _update_playlist(self, playlist_id, track_ids):
+        self._reindex(self._playlist_tracks, self._track_playlists, self._playlists.key(playlist_id),
+                      [self._tracks.key(track_id) for track_id in track_ids])
+
+    def _update_track(self, track_id, artist_ids):
+        self._reindex(self._track_artists, self._artist_tracks, self._tracks.key(track_id),
+                      [self._artists.key(artist_id) for artist_id in artist_ids])
+
+    @staticmethod
+    def _bulk_index(forward, backward, sources, source_interner, target_interner):
+        # No previous postings to diff against, append straight to the lists
+        for source_id, target_ids in sources:
+            source_key = source_interner.key(source_id)
+            target_keys = array(POSTING_TYPECODE, dict.fromkeys(map(target_interner.key, target_ids)))
+            if not target_keys:
+                continue
+            forward[source_key] = target_keys
+            for target_key in target_keys:
+                postings = backward.get(target_key)
+                if postings is None:
+                    backward[target_key] = array(POSTING_TYPECODE, (source_key,))
+                else:
+                    postings.append(source_key)
+
+    def rebuild(self, playlists_details, tracks_details):
+        """Indexes the whole library from scratch."""
+        with self._lock:
+            self._clear()
+            self._bulk_index(
+                self._playlist_tracks, self._track_playlists,
+                ((playlist_id, playlist.get('track_ids', [])) for playlist_id, playlist in playlists_details.items()),
+                self._playlists, self._tracks)
+            self._bulk_index(
+                self._track_artists, self._artist_tracks,
+                ((track_id, track.get('artists', [])) for track_id, track in tracks_details.items()),
+                self._tracks, self._artists)
+        logging.info(f"Reverse index rebuilt: {len(self._track_playlists)} tracks in playlists, "
+                     f"{len(self._artist_tracks)} artists.")
+
+    def apply_changes(self, playlists_details, tracks_details, changes):
+        """
+        Updates the index in place from the changes of a refresh, as computed by diff_entities.
+
+        Args:
+        - playlists_details, tracks_details: The refreshed playlists and tracks keyed by ID.
+        - changes (dict): Lists of (action, ID) tuples keyed by 'playlists' and 'tracks'.
+        """
+        with self._lock:
+            for _, playlist_id in changes.get('playlists', []):
+                playlist = playlists_details.get(playlist_id)
+                self._update_playlist(playlist_id, playlist.get('track_ids', []) if playlist else [])
+            for _, track_id in changes.get('tracks', []):
+                track = tracks_details.get(track_id)
+                self._update_track(track_id, track.get('artists', []) if track else [])
+
+    def update_playlist(self, playlist_id, track_ids):
+        """Reindexes one playlist after an in-place edit."""
+        with self._lock:
+            self._update_playlist(playlist_id, track_ids)
+
+    def playlists_for_track(self, track_id):
+        """Returns the IDs of the playlists containing a track."""
+        with self._lock:
+            key = self._tracks.keys.get(track_id)
+            postings = self._track_playlists.get(key, ())
+            return [self._playlists.ids[playlist_key] for playlist_key in postings]
+
+    def playlists_for_tracks(self, track_ids):
+        """Returns the IDs of the playlists containing any of the tracks."""
+        with self._lock:
+            playlist_keys = set()
+            for track_id in track_ids:
+                playlist_keys.update(self._track_playlists.get(self._tracks.keys.get(track_id), ()))
+            return [self._playlists.ids[playlist_key] for playlist_key in playlist_keys]
+
+    def tracks_for_artist(self, artist_id):
+        """Returns the IDs of the cached tracks by an artist."""
+        with self._lock:
+            key = self._artists.keys.get(artist_id)
+            postings = self._artist_tracks.get(key, ())
+            return [self._tracks.ids[track_key] for track_key in postings]
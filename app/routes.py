@@ -1,12 +1,16 @@
-from flask import request, redirect, session, url_for, render_template, jsonify
-from app import app, auth_manager, utils
+from flask import request, redirect, session, url_for, render_template, jsonify, Response, stream_with_context
+from app import app, auth_manager, token_manager, utils, services, request_profiler, SPOTIFY_API_PREFIX, ADMIN_TOKEN
+from app.http_cache import cached_json_response, cached_json_batch_response
+from app.export import EXPORT_FORMATS
+from app.artwork import DEFAULT_ARTWORK_SIZE, artwork_response
 import spotipy
 import uuid
+import hmac
 import logging
 from werkzeug.exceptions import HTTPException
 import os
 import json
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -15,10 +19,28 @@ logging.basicConfig(level=logging.INFO,
 # Setup base directory and paths
 basedir = os.path.abspath(os.path.dirname(__file__))
 project_basedir = os.path.join(basedir, os.pardir)
-token_info_path = os.path.join(project_basedir, 'token_info.json')
 json_file_path = os.path.join(project_basedir, 'user_data.json')
 
 sp = spotipy.Spotify(auth_manager=auth_manager)
+sp.prefix = SPOTIFY_API_PREFIX
+
+# IDs accepted by a single call to the batch endpoints
+MAX_BATCH_IDS = 100
+
+
+def parse_batch_ids():
+    """
+    Parses the comma separated `ids` query parameter of the batch endpoints, dropping duplicates.
+
+    Raises:
+    ValueError if no ID or more than MAX_BATCH_IDS IDs are given.
+    """
+    ids = list(dict.fromkeys(part.strip() for part in request.args.get('ids', '').split(',') if part.strip()))
+    if not ids:
+        raise ValueError("Query parameter 'ids' is required.")
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} IDs are accepted per request.")
+    return ids
 
 @app.before_request
 def ensure_session_uuid():
@@ -37,16 +59,17 @@ def signin():
 @app.route('/')
 def home():
     logging.info("Accessing home page.")
-    token_info = auth_manager.get_cached_token()
+    token_info = token_manager.get_token()
     if token_info:
         logging.info("Token found, rendering home page.")
-        user_details_response, response_code_user_details = get_user_account_details()  
-        user_stats_response, response_code_user_stats = get_user_stats()  
-
-        if response_code_user_details == 200 and response_code_user_stats == 200:
-            user_details = user_details_response.get_json()  # Extract JSON data from the response
-            user_stats = user_stats_response.get_json()  # Extract JSON data from the response
-            return render_template('index.html', user_info=user_details, user_stats=user_stats)
+        try:
+            bootstrap = services.get_dashboard_bootstrap(sp)
+        except Exception as e:
+            logging.error(f"Failed to fetch user details: {e}")
+            bootstrap = None
+
+        if bootstrap and bootstrap['user_stats'] is not None:
+            return render_template('index.html', user_info=bootstrap['user_info'], user_stats=bootstrap['user_stats'])
         else:
             logging.error("Failed to fetch user details or stats.")
             return redirect(url_for('error'))  # Redirect to an error handling route
@@ -67,7 +90,7 @@ def content(page):
 def login():
     """Handles the login process by checking for a cached token or redirecting to Spotify for authentication."""
     logging.info("Attempting login.")
-    if not auth_manager.get_cached_token():
+    if not token_manager.get_token():
         auth_url = auth_manager.get_authorize_url(state=session['uuid'])
         logging.info(
             "No cached token, redirecting to Spotify for authentication.")
@@ -84,6 +107,7 @@ def callback():
     code = request.args.get('code')
     logging.info("Authorization code received: %s", code)
     auth_manager.get_access_token(code)
+    token_manager.schedule_refresh()
     logging.info("Access token retrieved and cached successfully.")
     return redirect(url_for('home'))
 
@@ -98,13 +122,15 @@ def logout():
             session.pop('token_info', None)
             logging.info("Token info cleared from session.")
 
-        # Remove the token info file
-        if os.path.exists(token_info_path):
-            os.remove(token_info_path)
-            logging.info("Token info file successfully removed.")
+        # Forget the in-memory token and remove the token info file
+        token_manager.clear()
+        logging.info("Token info successfully removed.")
     except Exception as e:
         logging.error(f"Error during logout: {e}")
 
+    # Forget the cached profile of the logged out user
+    services.invalidate_user_profile()
+
     # Clear the entire session
     session.clear()
     logging.info("Session cleared.")
@@ -118,17 +144,8 @@ def get_user_account_details():
     Endpoint to get Spotify user details.
     """
     try:
-        # Call the current_user() method to fetch the user's details
-        user_info = sp.current_user()
-        
-        # Assuming you want to return some basic information about the user
-        user_details = {
-            'display_name': user_info.get('display_name'),
-            'email': user_info.get('email'),
-            'id': user_info.get('id'),
-            'country': user_info.get('country'),
-            'followers': user_info.get('followers', {}).get('total', 0)
-        }
+        # Served from the profile cache, fetched from Spotify once per TTL
+        user_details = services.get_user_profile(sp)
 
         logging.info("Successfully fetched user details.")
         return jsonify(user_details), 200
@@ -150,6 +167,322 @@ def get_user_stats():
     # If calculation is successful, return the stats
     return jsonify(stats), 200
 
+@app.route('/bootstrap', methods=['GET'])
+def bootstrap():
+    """
+    Returns the user profile, user stats and playlist summaries needed by the dashboard in one payload.
+    """
+    def build_bootstrap():
+        bootstrap_data = services.get_dashboard_bootstrap(sp)
+        # Without stats there is nothing to memoize, the request fails instead
+        return bootstrap_data if bootstrap_data['user_stats'] is not None else None
+
+    try:
+        # Refetches the profile once its TTL expired, so the version below covers the profile in use
+        services.get_user_profile(sp)
+        # The profile is cached per process, memoize locally even in shared-cache workers
+        response = cached_json_response(
+            'bootstrap', (utils.get_cache_version(), services.get_user_profile_version()), build_bootstrap, local=True)
+    except Exception as e:
+        logging.error(f"Failed to build dashboard bootstrap: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    if response is None:
+        return jsonify({'error': 'Unable to calculate user stats'}), 500
+    return response
+
+@app.route('/library-analytics', methods=['GET'])
+def get_library_analytics():
+    """
+    Route to fetch library-wide analytics, precomputed at refresh time.
+    """
+    analytics = utils.get_library_analytics()
+    if analytics is None:
+        return jsonify({'error': 'Unable to compute library analytics'}), 500
+
+    return jsonify(analytics), 200
+
+@app.route('/artwork/<entity_id>')
+def get_artwork(entity_id):
+    """
+    Route serving the artwork of a playlist, track or artist, resized to ?size= pixels and cached on disk.
+    """
+    size = request.args.get('size', DEFAULT_ARTWORK_SIZE, type=int)
+    try:
+        artwork = utils.get_artwork(entity_id, size)
+    except Exception as e:
+        logging.error(f"Failed to fetch artwork for {entity_id}: {e}")
+        return jsonify({'error': 'Unable to fetch artwork'}), 502
+    if artwork is None:
+        return jsonify({'error': 'Artwork not found'}), 404
+
+    return artwork_response(artwork)
+
+@app.route('/changes', methods=['GET'])
+def get_changes():
+    """
+    Route returning what changed in the cache after a given version, for clients syncing deltas.
+    Query parameters: since=<version> (required) and data=0 to return IDs only.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'since must be a cache version'}), 400
+    try:
+        changes = utils.get_changes(since, include_data=request.args.get('data', '1') != '0')
+        if changes is None:
+            return jsonify({'error': 'Change log not available'}), 500
+        return jsonify(changes), 200
+    except Exception as e:
+        logging.error(f"Failed to fetch changes since version {since}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/duplicates', methods=['GET'])
+def get_duplicates():
+    """
+    Route to find duplicate tracks within and across playlists.
+    Pass audio=1 to also require near-duplicates to have close audio features.
+    """
+    try:
+        check_audio_features = request.args.get('audio', '0') == '1'
+        response = cached_json_response(
+            'duplicates:audio' if check_audio_features else 'duplicates', utils.get_cache_version(),
+            lambda: utils.find_library_duplicates(check_audio_features))
+
+        if response is None:
+            return jsonify({'error': 'Unable to find duplicates - Cache is empty'}), 500
+        return response
+    except Exception as e:
+        logging.error(f"Failed to find duplicates: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/clusters', methods=['GET'])
+def get_clusters():
+    """
+    Route to fetch the mood clusters of the library and the genre groups.
+    Pass cluster=<n> to fetch one cluster along with the IDs of its tracks.
+    """
+    try:
+        cluster = request.args.get('cluster', type=int)
+        response = cached_json_response(
+            'clusters' if cluster is None else f'cluster:{cluster}', utils.get_cache_version(),
+            lambda: utils.get_library_clusters(cluster))
+
+        if response is None:
+            return jsonify({'error': 'Clusters not available'}), 404
+        return response
+    except Exception as e:
+        logging.error(f"Failed to fetch clusters: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export', methods=['GET'])
+def export_library():
+    """
+    Route to download the cached library as a streamed file.
+    Query parameters: format=csv|ndjson|parquet and entity=tracks|artists|playlist_tracks.
+    """
+    export_format = request.args.get('format', 'csv')
+    entity = request.args.get('entity', 'tracks')
+    try:
+        chunks = utils.export_library(entity, export_format)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'error': str(e)}), 400
+    if chunks is None:
+        return jsonify({'error': 'Unable to export - Cache is empty'}), 500
+
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename={entity}.{export_format}'})
+
+@app.route('/generate-playlist', methods=['POST'])
+def generate_playlist():
+    """
+    Route to build a playlist from the library by audio feature targets, genre and artist
+    constraints, a track count and/or a target duration. Pass save=true to create it on Spotify.
+    """
+    try:
+        criteria = request.get_json() or {}
+        generated = utils.generate_playlist(sp, criteria)
+        if generated is None:
+            return jsonify({'error': 'Unable to generate playlist - Cache is empty'}), 500
+        return jsonify(generated), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Failed to generate playlist: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history/sync', methods=['POST'])
+def sync_listening_history():
+    """
+    Ingests recently played tracks and top tracks into the listening history store.
+    """
+    try:
+        ingestion_stats = utils.sync_listening_history(sp)
+    except Exception as e:
+        logging.error(f"Failed to sync listening history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    if ingestion_stats is None:
+        return jsonify({'error': 'Listening history is not available'}), 500
+    logging.info("Listening history synced successfully.")
+    return jsonify(ingestion_stats), 200
+
+@app.route('/history/rollups', methods=['GET'])
+def listening_history_rollups():
+    """
+    Returns daily or weekly listening rollups. Accepts `period` (day|week) and optional
+    `start`/`end` dates (YYYY-MM-DD) as query parameters.
+    """
+    try:
+        period = request.args.get('period', 'day')
+        start, end = (datetime.strptime(request.args[bound], '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+                      if request.args.get(bound) else None for bound in ('start', 'end'))
+        rollups = utils.get_listening_rollups(period=period, start=start, end=end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if rollups is None:
+        return jsonify({'error': 'Listening history is not available'}), 500
+    return jsonify(rollups), 200
+
+@app.route('/history/top-tracks', methods=['GET'])
+def listening_history_top_tracks():
+    """
+    Returns the daily snapshots of the user's top tracks. Accepts `time_range`
+    (short_term|medium_term|long_term) and optional `start`/`end` dates (YYYY-MM-DD) as query parameters.
+    """
+    try:
+        time_range = request.args.get('time_range', 'medium_term')
+        if time_range not in ('short_term', 'medium_term', 'long_term'):
+            raise ValueError(f"Unsupported time range: {time_range}")
+        start, end = (datetime.strptime(request.args[bound], '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+                      if request.args.get(bound) else None for bound in ('start', 'end'))
+        snapshots = utils.get_top_tracks_history(time_range, start=start, end=end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if snapshots is None:
+        return jsonify({'error': 'Listening history is not available'}), 500
+    return jsonify({'time_range': time_range, 'snapshots': snapshots}), 200
+
+@app.route('/track/<track_id>/playlists', methods=['GET'])
+def get_track_playlists(track_id):
+    """
+    Returns the playlists containing a track.
+    """
+    try:
+        playlists = utils.get_playlists_containing_track(track_id)
+    except Exception as e:
+        logging.error(f"Failed to look up playlists for track {track_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+    if playlists is None:
+        return jsonify({'error': 'Library cache is not available'}), 500
+    return jsonify({'track_id': track_id, 'playlists': playlists}), 200
+
+@app.route('/artist/<artist_id>/tracks', methods=['GET'])
+def get_artist_tracks(artist_id):
+    """
+    Returns the tracks by an artist across the library.
+    """
+    try:
+        tracks = utils.get_tracks_by_artist(artist_id)
+    except Exception as e:
+        logging.error(f"Failed to look up tracks for artist {artist_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+    if tracks is None:
+        return jsonify({'error': 'Library cache is not available'}), 500
+    return jsonify({'artist_id': artist_id, 'tracks': tracks}), 200
+
+@app.route('/playlist-history/<playlist_id>', methods=['GET'])
+def playlist_history_at(playlist_id):
+    """
+    Returns a playlist as it was at the end of the `at` date (YYYY-MM-DD), or its latest recorded
+    version without it.
+    """
+    try:
+        at = request.args.get('at')
+        timestamp = (datetime.strptime(at, '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)).timestamp() - 1 if at else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        playlist = utils.get_playlist_at(playlist_id, timestamp)
+    except Exception as e:
+        logging.error(f"Failed to rebuild history of playlist {playlist_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+    if playlist is None:
+        return jsonify({'error': f'No history for playlist ID {playlist_id} at that date'}), 404
+    return jsonify(playlist), 200
+
+@app.route('/playlist-history/<playlist_id>/trend', methods=['GET'])
+def playlist_metric_trend(playlist_id):
+    """
+    Returns the trend of a playlist's metrics. Accepts repeated `metric` names and optional
+    `start`/`end` dates (YYYY-MM-DD) as query parameters.
+    """
+    try:
+        start, end = (datetime.strptime(request.args[bound], '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+                      if request.args.get(bound) else None for bound in ('start', 'end'))
+        trend = utils.get_playlist_metric_trend(
+            playlist_id, metric_names=request.args.getlist('metric') or None, start=start, end=end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if trend is None:
+        return jsonify({'error': 'Playlist history is not available'}), 500
+    return jsonify(trend), 200
+
+@app.route('/admin/profiles', methods=['GET'])
+def get_profiles():
+    """
+    Admin route listing the recently profiled requests and the top cumulative hot spots across them.
+    Requires the admin token in the X-Admin-Token header.
+    """
+    if request_profiler is None or not request_profiler.is_admin():
+        return jsonify({'error': 'Not found'}), 404
+
+    limit = request.args.get('limit', 25, type=int)
+    return jsonify({
+        'profiles': list(request_profiler.recent_profiles),
+        'hot_spots': request_profiler.hot_spots(limit=limit)
+    }), 200
+
+@app.route('/admin/jobs', methods=['GET'])
+def get_job_queue_stats():
+    """
+    Admin route showing the job queue depth, the throughput of the last hour, the workers and the
+    latest jobs. Requires the admin token in the X-Admin-Token header.
+    """
+    token = request.headers.get('X-Admin-Token')
+    if not ADMIN_TOKEN or not token or not hmac.compare_digest(token, ADMIN_TOKEN) or utils.job_queue is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(utils.job_queue.stats(recent_limit=limit)), 200
+
+@app.route('/refresh', methods=['POST'])
+def refresh_cache():
+    """
+    Starts refreshing the cache in the background, unless it is still valid. Pass force=true to
+    refresh regardless. Progress is streamed by /refresh/events.
+    """
+    try:
+        force = request.args.get('force', 'false').lower() == 'true'
+        refreshing = utils.start_background_refresh(sp, force=force)
+        return jsonify({'refreshing': refreshing}), 202 if refreshing else 200
+    except Exception as e:
+        logging.error(f"Failed to start cache refresh: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/refresh/events')
+def refresh_events_stream():
+    """
+    Server-Sent Events stream of cache refresh progress: playlists fetched, tracks collected, artist
+    and audio feature batches, metrics done, and completion or failure.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(stream_with_context(utils.refresh_events.stream(last_event_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/get-all-playlists')
 def get_all_playlist_data():
     """
@@ -160,16 +493,13 @@ def get_all_playlist_data():
         ## Refresh Cache 
         utils.ensure_cache_data_freshness(sp)
 
-        # Attempt to retrieve playlist data from the cache first
-        playlists_data = utils.get_all_playlist_data_from_cache()
+        # Serve the memoized body for this cache version, or build it from the cache
+        response = cached_json_response(
+            'playlists', utils.get_cache_version(), lambda: utils.get_all_playlist_data_from_cache() or None)
 
-        # If the cache was empty or outdated, fetch from Spotify and update the cache
-        if not playlists_data:
-            logging.info("Cache is empty or outdated, fetching playlists data from Spotify.")
-
-        if playlists_data:
+        if response is not None:
             logging.info("Playlists data retrieved successfully.")
-            return jsonify(playlists_data)
+            return response
         else:
             logging.error("Playlists data is empty after attempting to fetch and cache.")
             return jsonify({'error': 'Failed to fetch playlists - Data is empty after update'}), 500
@@ -185,19 +515,23 @@ def get_playlist_by_id(playlist_id):
     """
     try:
         # Attempt to retrieve specific playlist data from the cache first
-        playlist_data = utils.get_playlist_data_by_id_from_cache(playlist_id)
+        response = cached_json_response(
+            f'playlist:{playlist_id}', utils.get_cache_version(),
+            lambda: utils.get_playlist_data_by_id_from_cache(playlist_id))
 
         # If the cache was empty or outdated, fetch from Spotify and update the cache
-        if not playlist_data:
+        if response is None:
             logging.info(f"Cache is empty or outdated for playlist ID {playlist_id}, fetching data from Spotify.")
             utils.ensure_cache_data_freshness(sp)
 
             # After fetching and caching, retrieve the updated data from the cache
-            playlist_data = utils.get_playlist_data_by_id_from_cache(playlist_id)
+            response = cached_json_response(
+                f'playlist:{playlist_id}', utils.get_cache_version(),
+                lambda: utils.get_playlist_data_by_id_from_cache(playlist_id))
 
-        if playlist_data:
+        if response is not None:
             logging.info(f"Playlist data for ID {playlist_id} retrieved successfully.")
-            return jsonify(playlist_data)
+            return response
         else:
             logging.error(f"Playlist data is empty for ID {playlist_id} after attempting to fetch and cache.")
             return jsonify({'error': f'Failed to fetch playlist for ID {playlist_id} - Data is empty after update'}), 500
@@ -205,16 +539,56 @@ def get_playlist_by_id(playlist_id):
         logging.error(f"Failed to fetch playlist for ID {playlist_id}: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/playlists', methods=['GET'])
+def get_playlists_by_ids():
+    """
+    Endpoint to retrieve several playlists in one call, by their comma separated `ids`.
+    IDs not in the cache are listed under `missing`.
+    """
+    try:
+        playlist_ids = parse_batch_ids()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        utils.ensure_cache_data_freshness(sp)
+        return cached_json_batch_response(
+            'playlists', 'playlist', playlist_ids, utils.get_cache_version(), utils.get_playlist_data_by_id_from_cache)
+    except Exception as e:
+        logging.error(f"Failed to fetch playlists {playlist_ids}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/playlist-metrics', methods=['GET'])
+def get_playlist_metrics_by_ids():
+    """
+    Endpoint to retrieve the metrics of several playlists in one call, by their comma separated `ids`,
+    as {'playlist-metrics': [...], 'missing': [...]}.
+    """
+    try:
+        playlist_ids = parse_batch_ids()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        utils.ensure_cache_data_freshness(sp)
+        return cached_json_batch_response(
+            'playlist-metrics', 'playlist-metrics', playlist_ids, utils.get_cache_version(), utils.get_playlist_metric_by_id)
+    except Exception as e:
+        logging.error(f"Failed to fetch metrics for playlists {playlist_ids}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/playlist-metrics/<playlist_id>', methods=['GET'])
 def playlist_metrics(playlist_id):
     """
     Endpoint to retrieve metrics for a specific playlist by its ID.
     """
     try:
-        metrics = utils.get_playlist_metric_by_id(playlist_id)
-        if metrics:
+        response = cached_json_response(
+            f'playlist-metrics:{playlist_id}', utils.get_cache_version(),
+            lambda: utils.get_playlist_metric_by_id(playlist_id))
+        if response is not None:
             logging.info(f"Metrics for playlist ID {playlist_id} retrieved successfully.")
-            return jsonify(metrics)
+            return response
         else:
             return jsonify({'error': f'Failed to calculate metrics for playlist ID {playlist_id}'}), 500
     except Exception as e:
@@ -228,16 +602,18 @@ def get_all_tracks_for_palylist(playlist_id):
     """
     try:
         # Attempt to get tracks data from the cache
-        simplified_tracks = utils.get_playlist_wise_tracks_information_from_cache(playlist_id)
+        response = cached_json_response(
+            f'playlist-tracks:{playlist_id}', utils.get_cache_version(),
+            lambda: utils.get_playlist_wise_tracks_information_from_cache(playlist_id))
         
         # If cache miss, refresh cache data and attempt to fetch again
-        if simplified_tracks is None:
+        if response is None:
             logging.info(f"Cache miss for playlist ID {playlist_id}. Refreshing cache.")
             return jsonify({'error': 'Failed to fetch tracks for the playlist'}), 500
 
         # Successfully retrieved data
         logging.info(f"Tracks for playlist ID {playlist_id} retrieved successfully.")
-        return jsonify(simplified_tracks)
+        return response
     except Exception as e:
         logging.error(f"Failed to fetch tracks for playlist {playlist_id}: {e}")
         return jsonify({'error': str(e)}), 500
@@ -249,20 +625,22 @@ def get_all_tracks_data():
     If cache is empty or outdated, fetches from Spotify and updates the cache.
     """
     try:
-        # Attempt to retrieve playlist data from the cache first
-        tracks_data = utils.get_all_tracks_data_from_cache()
+        # Attempt to retrieve the memoized tracks body for this cache version first
+        response = cached_json_response(
+            'tracks', utils.get_cache_version(), lambda: utils.get_all_tracks_data_from_cache() or None)
 
         # If the cache was empty or outdated, fetch from Spotify and update the cache
-        if not tracks_data:
+        if response is None:
             logging.info("Cache is empty or outdated, fetching Tracks data from Spotify.")
-            tracks_data = utils.ensure_cache_data_freshness(sp, auth_manager, json_file_path)
+            utils.ensure_cache_data_freshness(sp)
 
             # After fetching and caching, retrieve the updated data from the cache
-            tracks_data = utils.get_all_tracks_data_from_cache()
+            response = cached_json_response(
+                'tracks', utils.get_cache_version(), lambda: utils.get_all_tracks_data_from_cache() or None)
 
-        if tracks_data:
+        if response is not None:
             logging.info("Tracks data retrieved successfully.")
-            return jsonify(tracks_data)
+            return response
         else:
             logging.error("Tracks data is empty after attempting to fetch and cache.")
             return jsonify({'error': 'Failed to fetch Tracks - Data is empty after update'}), 500
@@ -270,6 +648,24 @@ def get_all_tracks_data():
         logging.error(f"Failed to fetch Tracks: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/tracks', methods=['GET'])
+def get_tracks_by_ids():
+    """
+    Endpoint to retrieve several tracks in one call, by their comma separated `ids`. Tracks not in the
+    cache are fetched from Spotify in batches, IDs Spotify does not know are listed under `missing`.
+    """
+    try:
+        track_ids = parse_batch_ids()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        tracks, missing = utils.fetch_tracks_information(sp, track_ids)
+        return jsonify({'tracks': tracks, 'missing': missing}), 200
+    except Exception as e:
+        logging.error(f"Failed to fetch tracks {track_ids}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/get-track/<track_id>', methods=['GET'])
 def get_track_by_id(track_id):
     """
@@ -282,7 +678,7 @@ def get_track_by_id(track_id):
         # If cache miss, refresh cache data and attempt to fetch again
         if track_info is None:
             logging.info(f"Cache miss for track ID {track_id}. Checking Spotify.")
-            track_info = utils.fetch_track_by_id_from_spotify(track_id)
+            track_info = utils.fetch_track_by_id_from_spotify(sp, track_id)
 
             if track_info is None:
                 logging.error(f"Unable to retrieve track for ID {track_id} from spotify.")
@@ -295,38 +691,47 @@ def get_track_by_id(track_id):
         return jsonify({'error': str(e)}), 500
 
 
-def delete_tracks_by_id(track_ids):
-    # Placeholder for your deletion logic
-    # This could involve removing the tracks from a database
-    print(f"Deleting tracks: {track_ids}")
-    # Here you would implement the actual deletion
-    # For now, we'll just pretend it succeeded
-    return True
-
 @app.route('/playlist/delete-tracks', methods=['POST'])
 def delete_tracks():
-    data = request.json
-    track_ids = data.get('trackIds')
-    playlist_id = data.get('playlistID')
-    
-    if not track_ids:
-        return jsonify({'error': 'No track IDs provided'}), 400
-    
-    # Call the function to delete tracks
-    success = delete_tracks_by_id(track_ids)
-    
-    if success:
-        return jsonify({'message': f'{len(track_ids)} tracks deleted successfully.'})
-    else:
+    """
+    Removes tracks from playlists. Accepts either `trackIds` with a single `playlistId`, or
+    `removals` mapping playlist IDs to the track IDs to remove from each of them.
+    """
+    data = request.json or {}
+    removals = data.get('removals')
+    if not removals:
+        track_ids = data.get('trackIds')
+        playlist_id = data.get('playlistId') or data.get('playlistID')
+
+        if not track_ids:
+            return jsonify({'error': 'No track IDs provided'}), 400
+        if not playlist_id:
+            return jsonify({'error': 'No playlist ID provided'}), 400
+        removals = {playlist_id: track_ids}
+
+    if not isinstance(removals, dict) or not all(
+            isinstance(playlist_id, str) and isinstance(track_ids, list)
+            and all(isinstance(track_id, str) for track_id in track_ids)
+            for playlist_id, track_ids in removals.items()):
+        return jsonify({'error': 'Removals must map playlist IDs to lists of track IDs'}), 400
+
+    try:
+        results = utils.remove_tracks_from_playlists(sp, removals)
+    except Exception as e:
+        logging.error(f"Failed to delete tracks: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    if results is None:
         return jsonify({'error': 'An error occurred while deleting tracks'}), 500
 
+    removed_count = sum(result['removed'] for result in results.values())
+    return jsonify({'message': f'{removed_count} tracks deleted successfully.', 'playlists': results})
+
 @app.route('/refresh_token')
 def refresh_token():
     try:
-        token_info = auth_manager.refresh_access_token(
-            session.get('token_info').get('refresh_token'))
-        session['token_info'] = token_info  # Update session with new token
-        return jsonify(success=True)
+        token_info = token_manager.refresh(force=True)
+        return jsonify(success=token_info is not None)
     except Exception as e:
         logging.error(f"Error refreshing token: {e}")
         return jsonify(success=False), 401
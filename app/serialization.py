@@ -0,0 +1,92 @@
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Brotli responses are optional, gzip is always available
+    brotli = None
+
+# Bodies smaller than this are served uncompressed, the saving would not cover the overhead
+MIN_COMPRESSED_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Encodings in order of preference when the client accepts several
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _default(value):
+    # NumPy scalars and arrays (from the clustering and generator modules) and sets
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload, sort_keys=False):
+    """
+    Serializes a payload to compact UTF-8 JSON, with orjson when it is installed.
+
+    Args:
+    - payload: JSON-serializable payload, NumPy values and sets included.
+    - sort_keys (bool): Sort object keys, so equal payloads always give identical bytes.
+
+    Returns:
+    The JSON body as bytes.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(payload, default=_default, option=option)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys,
+                      default=_default).encode('utf-8')
+
+
+def loads(body):
+    """Deserializes a JSON body given as bytes, bytearray, memoryview or str."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(bytes(body) if isinstance(body, memoryview) else body)
+
+
+def compress(body, encoding):
+    """Compresses a body with the given content encoding ('gzip' or 'br')."""
+    if encoding == 'br':
+        return brotli.compress(bytes(body), quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output deterministic for identical bodies
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Picks the preferred supported encoding allowed by an Accept-Encoding header.
+
+    Returns:
+    'br', 'gzip' or None for an identity response.
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
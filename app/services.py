@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spotipy import Spotify
+
+from app import utils
+
+# How long the Spotify user profile is served from memory before being fetched again
+USER_PROFILE_TTL_SECONDS = 300
+
+# Shared pool for independent lookups made while serving a single request
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='service')
+
+_user_profile_lock = threading.Lock()
+_user_profile = None
+_user_profile_fetched_at = 0
+
+
+def _get_cached_user_profile():
+    if _user_profile is not None and time.time() - _user_profile_fetched_at < USER_PROFILE_TTL_SECONDS:
+        return _user_profile
+    return None
+
+
+def _store_user_profile(user_info):
+    global _user_profile, _user_profile_fetched_at
+    _user_profile = {
+        'display_name': user_info.get('display_name'),
+        'email': user_info.get('email'),
+        'id': user_info.get('id'),
+        'country': user_info.get('country'),
+        'followers': user_info.get('followers', {}).get('total', 0)
+    }
+    _user_profile_fetched_at = time.time()
+    logging.info("User profile fetched from Spotify.")
+    return _user_profile
+
+
+def get_user_profile(sp: Spotify):
+    """
+    Returns the Spotify user profile, fetched at most once per USER_PROFILE_TTL_SECONDS.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+
+    Returns:
+    A dictionary with the user's display name, email, ID, country and follower count.
+    """
+    with _user_profile_lock:
+        return _get_cached_user_profile() or _store_user_profile(sp.current_user())
+
+
+def get_user_profile_version():
+    """Returns when the cached user profile was fetched, it changes every time the profile is refetched."""
+    return _user_profile_fetched_at
+
+
+async def get_user_profile_async(client):
+    """
+    Async variant of get_user_profile, sharing the same cached profile.
+
+    Args:
+    - client: An AsyncSpotifyClient.
+    """
+    user_profile = _get_cached_user_profile()
+    if user_profile is not None:
+        return user_profile
+    user_info = await client.current_user()
+    with _user_profile_lock:
+        return _store_user_profile(user_info)
+
+
+def invalidate_user_profile():
+    """Forgets the cached user profile, e.g. on logout."""
+    global _user_profile, _user_profile_fetched_at
+    with _user_profile_lock:
+        _user_profile = None
+        _user_profile_fetched_at = 0
+
+
+def get_playlist_summaries():
+    """
+    Returns a lightweight summary (ID, name, image and track count) of every cached playlist.
+    """
+    if utils.shared_cache_reader is not None:
+        return utils.shared_cache_reader.get_json('playlist-summaries') or []
+
+    spotify_cache = utils.get_spotify_cache_instance()
+    if not spotify_cache:
+        return []
+    return [
+        {
+            'id': playlist_id,
+            'name': playlist.get('name'),
+            'image_url': playlist.get('image_url'),
+            'track_count': len(playlist.get('track_ids', []))
+        }
+        for playlist_id, playlist in spotify_cache.playlist_cache.items()
+    ]
+
+
+def get_dashboard_bootstrap(sp: Spotify):
+    """
+    Gathers everything the home page needs in one payload. The user profile, the stats and the
+    playlist summaries are looked up concurrently.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+
+    Returns:
+    A dictionary with 'user_info', 'user_stats' and 'playlists'.
+    """
+    user_info_future = executor.submit(get_user_profile, sp)
+    user_stats_future = executor.submit(utils.calculate_user_stats)
+    playlists_future = executor.submit(get_playlist_summaries)
+
+    return {
+        'user_info': user_info_future.result(),
+        'user_stats': user_stats_future.result(),
+        'playlists': playlists_future.result()
+    }
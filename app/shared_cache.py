@@ -0,0 +1,192 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from app.serialization import dumps, loads
+
+# Generation file layout:
+#   header | index records sorted by key | serialized bodies
+# Every record points at a pre-serialized JSON body, so readers serve slices of the mapping as-is.
+MAGIC = b'SUSC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIQI')  # magic, format version, generation, number of entries
+KEY_WIDTH = 64
+INDEX_RECORD = struct.Struct(f'<{KEY_WIDTH}sQI20s')  # key, body offset, body length, sha1 of body
+
+# Control file: current generation and a counter workers bump to ask the loader for a refresh.
+# The loader only writes the generation and workers only the counter, each field on its own
+CONTROL = struct.Struct('<QQ')
+CONTROL_FIELD = struct.Struct('<Q')
+GENERATION_OFFSET = 0
+REFRESH_REQUESTS_OFFSET = 8
+CONTROL_FILE_NAME = 'control.bin'
+# Held while publishing, job worker processes may publish concurrently
+PUBLISH_LOCK_FILE_NAME = 'publish.lock'
+
+
+def _generation_file_name(generation):
+    return f'cache-{generation}.bin'
+
+
+def _open_control(directory):
+    path = os.path.join(directory, CONTROL_FILE_NAME)
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(CONTROL.pack(0, 0))
+    with open(path, 'r+b') as f:
+        return mmap.mmap(f.fileno(), CONTROL.size)
+
+
+class SharedCacheWriter:
+    """
+    Publishes pre-serialized resources into an immutable, memory-mapped generation file that every
+    worker process maps read-only. A new generation is written next to the current one and swapped
+    in by updating the control file, so workers switch atomically on their next lookup. Publishes
+    from several processes, such as job workers, are serialized with a lock file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._control = _open_control(directory)
+
+    @property
+    def generation(self):
+        return CONTROL_FIELD.unpack_from(self._control, GENERATION_OFFSET)[0]
+
+    @property
+    def refresh_requests(self):
+        return CONTROL_FIELD.unpack_from(self._control, REFRESH_REQUESTS_OFFSET)[0]
+
+    def publish(self, resources):
+        """
+        Writes a new generation holding the given resources and makes it current.
+
+        Args:
+        - resources (dict): JSON-serializable payloads keyed by resource name (at most 64 bytes).
+
+        Returns:
+        The number of the published generation.
+        """
+        with open(os.path.join(self.directory, PUBLISH_LOCK_FILE_NAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            return self._publish(resources)
+
+    def _publish(self, resources):
+        generation = self.generation + 1
+
+        entries = sorted(
+            (key.encode('utf-8'), dumps(payload, sort_keys=True))
+            for key, payload in resources.items())
+        data_offset = HEADER.size + INDEX_RECORD.size * len(entries)
+
+        path = os.path.join(self.directory, _generation_file_name(generation))
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, generation, len(entries)))
+            offset = data_offset
+            for key, body in entries:
+                if len(key) > KEY_WIDTH:
+                    raise ValueError(f"Shared cache key too long: {key!r}")
+                f.write(INDEX_RECORD.pack(key, offset, len(body), hashlib.sha1(body).digest()))
+                offset += len(body)
+            for _, body in entries:
+                f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        # Readers pick up the new generation from here on
+        CONTROL_FIELD.pack_into(self._control, GENERATION_OFFSET, generation)
+        self._control.flush()
+
+        # Keep the previous generation for readers still switching over, drop the older ones
+        stale_path = os.path.join(self.directory, _generation_file_name(generation - 2))
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+        logging.info(f"Shared cache generation {generation} published with {len(entries)} resources.")
+        return generation
+
+
+class SharedCacheReader:
+    """
+    Attaches to the generation files published by a SharedCacheWriter. Lookups binary-search the
+    mapped index and return a zero-copy view of the serialized body, so each worker only maps the
+    shared pages instead of holding its own copy of the cache.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._control = _open_control(directory)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._mapping = None
+        self._num_entries = 0
+
+    @property
+    def generation(self):
+        return CONTROL_FIELD.unpack_from(self._control, GENERATION_OFFSET)[0]
+
+    def request_refresh(self):
+        """Asks the loader process to refresh the cache and publish a new generation."""
+        # Two workers asking at once may bump the counter once, the loader only looks for a change
+        refresh_requests = CONTROL_FIELD.unpack_from(self._control, REFRESH_REQUESTS_OFFSET)[0]
+        CONTROL_FIELD.pack_into(self._control, REFRESH_REQUESTS_OFFSET, refresh_requests + 1)
+
+    def _current_mapping(self):
+        generation = self.generation
+        if generation == self._generation:
+            return self._mapping, self._num_entries
+
+        with self._lock:
+            if generation != self._generation:
+                path = os.path.join(self.directory, _generation_file_name(generation))
+                try:
+                    with open(path, 'rb') as f:
+                        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except FileNotFoundError:
+                    # Superseded while switching, the next lookup picks up the newer generation
+                    return self._mapping, self._num_entries
+                magic, format_version, _, num_entries = HEADER.unpack_from(mapping)
+                if magic != MAGIC or format_version != FORMAT_VERSION:
+                    raise ValueError(f"{path} is not a shared cache generation file.")
+                self._mapping, self._num_entries, self._generation = mapping, num_entries, generation
+                logging.info(f"Attached to shared cache generation {generation}.")
+            return self._mapping, self._num_entries
+
+    def get(self, key):
+        """
+        Looks up a resource in the current generation.
+
+        Returns:
+        A (memoryview of the serialized JSON body, hex ETag) tuple, or None if the resource is absent.
+        """
+        mapping, num_entries = self._current_mapping()
+        if mapping is None:
+            return None
+
+        encoded_key = key.encode('utf-8').ljust(KEY_WIDTH, b'\0')
+        low, high = 0, num_entries
+        while low < high:
+            middle = (low + high) // 2
+            record_offset = HEADER.size + middle * INDEX_RECORD.size
+            record_key = mapping[record_offset:record_offset + KEY_WIDTH]
+            if record_key < encoded_key:
+                low = middle + 1
+            elif record_key > encoded_key:
+                high = middle
+            else:
+                _, offset, length, digest = INDEX_RECORD.unpack_from(mapping, record_offset)
+                return memoryview(mapping)[offset:offset + length], digest.hex()
+        return None
+
+    def get_json(self, key):
+        """Looks up a resource and returns its decoded payload, or None if it is absent."""
+        entry = self.get(key)
+        return loads(entry[0]) if entry else None
@@ -1,9 +1,27 @@
 import logging
 import os
 from spotipy import Spotify
-from app import auth_manager
+from app import token_manager, USE_SQLITE_LIBRARY_STORE
+from app import http_cache
 import numpy as np
 from app.models import SpotifyCache
+from app.feature_store import AudioFeaturesStore, AUDIO_FEATURE_FIELDS
+from app.library_store import LibraryStore
+from app.analytics import LibraryAnalytics
+from app.duplicates import find_duplicates
+from app.playlist_generator import PlaylistGenerator
+from app.clustering import LibraryClusters
+from app.export import stream_export
+from app.events import EventBroker
+from app.change_log import ChangeLog, diff_entities, ADDED, UPDATED
+from app.artwork import ArtworkCache
+from app.playlist_history import PlaylistHistoryStore
+from app.reverse_index import ReverseIndex
+from app.crawl_checkpoint import CrawlCheckpoint
+from app.job_queue import JobQueue, REFRESH, HYDRATE_ARTISTS, AUDIO_FEATURES, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, DONE, FAILED, RUNNING
+import threading
+from app.shared_cache import SharedCacheReader
+from app.listening_history import ListeningHistoryStore, plays_from_recently_played, plays_from_streaming_history
 import time
 import json
 
@@ -13,11 +31,84 @@ import json
 basedir = os.path.abspath(os.path.dirname(__file__))
 project_basedir = os.path.join(basedir, os.pardir)
 json_file_path = os.path.join(project_basedir, 'user_data.json')
+audio_features_db_path = os.path.join(project_basedir, 'audio_features.db')
+library_db_path = os.path.join(project_basedir, 'library.db')
+listening_history_db_path = os.path.join(project_basedir, 'listening_history.db')
+change_log_db_path = os.path.join(project_basedir, 'change_log.db')
+artwork_cache_dir = os.path.join(project_basedir, 'artwork_cache')
+playlist_history_db_path = os.path.join(project_basedir, 'playlist_history.db')
+crawl_checkpoint_db_path = os.path.join(project_basedir, 'crawl_checkpoint.db')
+
+# Artists left out of playlist metrics, they feature on nearly every playlist
+METRICS_EXCLUDED_ARTIST_IDS = {'1wRPtKGflJrBx9BmLsSwlU'}  # Pritam
 
 # Initialize the global cache object
 global spotify_cache
 spotify_cache = None
 
+# Persistent audio features store, outlives the playlist cache
+global audio_features_store
+audio_features_store = None
+
+# Optional SQLite-backed query engine, None unless enabled in settings
+global library_store
+library_store = None
+
+# Library-wide aggregates, kept up to date on every refresh
+global library_analytics
+library_analytics = LibraryAnalytics()
+
+# Feature matrix used to generate playlists, rebuilt on every refresh
+global playlist_generator
+playlist_generator = PlaylistGenerator()
+
+# Mood clusters and genre groups, re-clustered on every refresh
+global library_clusters
+library_clusters = LibraryClusters()
+
+# Track -> playlists and artist -> tracks lookups, kept up to date on every refresh and edit
+global reverse_index
+reverse_index = ReverseIndex()
+
+# Listening history and its daily rollups
+global listening_history_store
+listening_history_store = None
+
+# Entities added, removed and updated by each cache generation
+global change_log
+change_log = None
+
+# Per-refresh deltas of every playlist, to rebuild past versions and metric trends
+global playlist_history
+playlist_history = None
+
+# Progress of the library crawl in flight, so a failed or interrupted refresh resumes where it stopped
+global crawl_checkpoint
+crawl_checkpoint = None
+
+# Resized artwork served locally instead of hotlinking full-size images
+global artwork_cache
+artwork_cache = None
+
+# Progress of cache refreshes, streamed to the browser, and the lock keeping refreshes single-flight
+global refresh_events
+refresh_events = EventBroker()
+refresh_lock = threading.Lock()
+
+# Durable queue refreshes are handed to when job workers run them, None to refresh in-process
+global job_queue
+job_queue = None
+
+# Read-only view of the cache published by the loader process, set in multi-worker mode
+global shared_cache_reader
+shared_cache_reader = None
+
+# Cache generation the derived structures (clusters, analytics, reverse index, library store) were last
+# brought up to. Memoized responses are keyed on it, so none is memoized under a generation whose
+# derived structures are still being rebuilt
+global derived_state_generation
+derived_state_generation = None
+
 ## ----------------- Application Specific -------------------##
 
 
@@ -28,7 +119,8 @@ def is_current_token_valid():
     Returns:
     bool: True if the token is valid, False otherwise.
     """
-    if not auth_manager.validate_token(auth_manager.get_cached_token()):
+    # Answered from the in-memory token state, no disk I/O
+    if not token_manager.is_valid():
         logging.warning("Spotify user not authenticated.")
         return False
     return True
@@ -36,14 +128,188 @@ def is_current_token_valid():
 
 def initialize_global_cache():
     global spotify_cache  # Access the global cache object
+    global audio_features_store
+    global library_store
+    global listening_history_store
+    global change_log
+    global artwork_cache
+    global playlist_history
+    global crawl_checkpoint
+    audio_features_store = AudioFeaturesStore(db_path=audio_features_db_path)
+    change_log = ChangeLog(db_path=change_log_db_path)
+    crawl_checkpoint = CrawlCheckpoint(db_path=crawl_checkpoint_db_path)
+    artwork_cache = ArtworkCache(directory=artwork_cache_dir)
+    playlist_history = PlaylistHistoryStore(db_path=playlist_history_db_path)
+    listening_history_store = ListeningHistoryStore(
+        db_path=listening_history_db_path, audio_features_lookup=audio_features_store.get_many)
     if is_current_token_valid():
         spotify_cache = SpotifyCache(json_file_path=json_file_path)
         logging.info("Global Spotify cache initialized.")
+        rebuild_derived_state()
+        # Baseline for the history, a no-op if the loaded cache was already recorded
+        if spotify_cache.playlist_cache:
+            playlist_history.record(spotify_cache.last_updated, spotify_cache.playlist_cache)
+
+        if USE_SQLITE_LIBRARY_STORE:
+            library_store = LibraryStore(db_path=library_db_path, excluded_metric_artist_ids=METRICS_EXCLUDED_ARTIST_IDS)
+            if library_store.generation != spotify_cache.generation:
+                sync_library_store()
+            logging.info("SQLite library store initialized.")
     else:
         logging.error(
             "Failed to initialize global Spotify cache due to authentication issues.")
 
 
+def rebuild_derived_state():
+    """
+    Rebuilds every structure derived from the cache content, after the cache was loaded from file.
+    """
+    library_analytics.rebuild(spotify_cache.tracks_cache, spotify_cache.artists_cache)
+    playlist_generator.rebuild(spotify_cache.tracks_cache, spotify_cache.artists_cache)
+    library_clusters.rebuild(spotify_cache.tracks_cache, spotify_cache.artists_cache)
+    reverse_index.rebuild(spotify_cache.playlist_cache, spotify_cache.tracks_cache)
+    register_artwork_sources(spotify_cache.playlist_cache, spotify_cache.tracks_cache, spotify_cache.artists_cache)
+    if library_store is not None and library_store.generation != spotify_cache.generation:
+        sync_library_store()
+    mark_derived_state_current()
+
+
+def mark_derived_state_current():
+    """Publishes the cache generation as the version of memoized responses, once its derived state is up to date."""
+    global derived_state_generation
+    derived_state_generation = spotify_cache.generation
+
+
+def reload_cache_if_changed():
+    """
+    Reloads the cache if another process, such as a job worker, saved a newer cache file.
+
+    Returns:
+    True if the cache was reloaded.
+    """
+    if spotify_cache is None or not spotify_cache.reload_if_changed():
+        return False
+    logging.info(f"Cache file changed, reloaded generation {spotify_cache.generation}.")
+    rebuild_derived_state()
+    return True
+
+
+def attach_job_queue(db_path):
+    """
+    Hands refreshes to the job queue in `db_path`, run by `flask job-workers`, instead of running
+    them inline in the request that notices the cache is outdated.
+    """
+    global job_queue
+    job_queue = JobQueue(db_path)
+    logging.info(f"Refreshes are queued to the job queue in {db_path}.")
+
+
+def detach_job_queue():
+    """Runs refreshes inline again, e.g. in the job workers which run them."""
+    global job_queue
+    job_queue = None
+
+
+def attach_shared_cache(directory):
+    """
+    Attaches this worker process to the cache published by the loader process in `directory`,
+    instead of loading its own copy of the cache.
+    """
+    global shared_cache_reader
+    global change_log
+    global artwork_cache
+    global playlist_history
+    shared_cache_reader = SharedCacheReader(directory)
+    # The loader process records the change log, the artwork sources and the playlist history, workers read them
+    change_log = ChangeLog(db_path=change_log_db_path)
+    artwork_cache = ArtworkCache(directory=artwork_cache_dir)
+    playlist_history = PlaylistHistoryStore(db_path=playlist_history_db_path)
+    http_cache.response_cache.shared_reader = shared_cache_reader
+    logging.info(f"Worker attached to shared cache in {directory}.")
+
+
+def detach_shared_cache():
+    """Detaches from the shared cache, e.g. in the loader process which owns the cache."""
+    global shared_cache_reader
+    shared_cache_reader = None
+    http_cache.response_cache.shared_reader = None
+
+
+def build_shared_resources():
+    """
+    Builds every cache-backed resource served by the workers, keyed like the memoized responses.
+
+    Returns:
+    A dictionary of JSON-serializable payloads keyed by resource name.
+    """
+    resources = {
+        'playlists': get_all_playlist_data_from_cache(),
+        'tracks': get_all_tracks_data_from_cache(),
+        'stats': calculate_user_stats(),
+        'library-analytics': get_library_analytics(),
+        'duplicates': find_library_duplicates(),
+        'duplicates:audio': find_library_duplicates(check_audio_features=True),
+        'clusters': get_library_clusters(),
+        'playlist-summaries': [
+            {'id': playlist_id, 'name': playlist.get('name'), 'image_url': playlist.get('image_url'),
+             'track_count': len(playlist.get('track_ids', []))}
+            for playlist_id, playlist in spotify_cache.playlist_cache.items()],
+    }
+    for playlist_id in spotify_cache.playlist_cache:
+        resources[f'playlist:{playlist_id}'] = get_playlist_data_by_id_from_cache(playlist_id)
+        resources[f'playlist-metrics:{playlist_id}'] = get_playlist_metric_by_id(playlist_id)
+        resources[f'playlist-tracks:{playlist_id}'] = get_playlist_wise_tracks_information_from_cache(playlist_id)
+    for cluster in (resources['clusters'] or {}).get('clusters', []):
+        resources[f"cluster:{cluster['cluster']}"] = get_library_clusters(cluster['cluster'])
+    # Single tracks too, so track lookups in the workers do not go to Spotify for cached tracks
+    for track_id, track_details in spotify_cache.tracks_cache.items():
+        resources[f'track:{track_id}'] = format_cached_track(track_id, track_details, spotify_cache.artists_cache)
+    return resources
+
+
+def sync_library_store():
+    """
+    Bulk loads the current cache content into the SQLite library store, if the store is enabled.
+    """
+    if library_store is None or spotify_cache is None:
+        return
+    library_store.load(spotify_cache.playlist_cache, spotify_cache.tracks_cache,
+                       spotify_cache.artists_cache, spotify_cache.generation)
+
+
+def register_artwork_sources(playlists_details, tracks_details, artists_details):
+    """Records the image URL of every playlist, track and artist with the artwork cache."""
+    if artwork_cache is None:
+        return
+    for entities in (playlists_details, tracks_details, artists_details):
+        artwork_cache.register_sources({entity_id: entity.get('image_url') for entity_id, entity in entities.items()})
+
+
+def get_artwork(entity_id, size):
+    """
+    Returns the resized artwork of a playlist, track or artist from the artwork cache.
+
+    Returns:
+    A (file path, mimetype, digest) tuple, or None if the entity has no known artwork.
+    """
+    if artwork_cache is None:
+        logging.error("Artwork cache is not available.")
+        return None
+    return artwork_cache.get(entity_id, size)
+
+
+def get_cache_version():
+    """
+    Returns the version of the cached data, used to key memoized responses.
+    Changes every time the cache is updated.
+    """
+    if shared_cache_reader is not None:
+        return shared_cache_reader.generation
+    if spotify_cache is None:
+        return None
+    return derived_state_generation
+
+
 def get_spotify_cache_instance():
     """
     Returns the global instance of the SpotifyCache.
@@ -67,14 +333,23 @@ def fetch_user_playlists_with_tracks_from_spotify(sp):
     """
     Fetches playlists and their tracks for the current user from Spotify,
     and organizes the data into three structures: playlists, tracks, and artists.
+
+    Progress is checkpointed page by page, so a crawl interrupted by a failed Spotify call or a
+    restart resumes from the last recorded page and artist batch instead of starting over. Playlists
+    whose snapshot ID changed since their progress was recorded are crawled again from the start.
+    The caller must hold the checkpoint, see crawl_checkpoint.acquire().
     """
-    playlists_details = {}
-    tracks_details = {}
-    artists_details = {}
-    unique_artist_ids = set()  # To store unique artist IDs
+    playlist_items = sp.current_user_playlists(limit=50)['items']
+    if crawl_checkpoint.resume(committed_at=spotify_cache.last_updated) is None:
+        crawl_checkpoint.start(playlist_items)
+    else:
+        restarted = crawl_checkpoint.restart_changed_playlists(playlist_items)
+        logging.info(f"Resuming the crawl of {len(playlist_items)} playlists from its checkpoint, "
+                     f"{len(restarted)} changed since they were recorded.")
+        refresh_events.publish('crawl-resumed', {'total': len(playlist_items)})
 
-    playlists = sp.current_user_playlists(limit=50)
-    for playlist in playlists['items']:
+    playlists_details = {}
+    for playlist_index, playlist in enumerate(playlist_items):
         playlist_id = playlist.get('id')
         playlist_name = playlist.get('name')
         playlist_images = playlist.get('images', [])
@@ -83,10 +358,19 @@ def fetch_user_playlists_with_tracks_from_spotify(sp):
         playlist_description = playlist.get('description', '')
         playlist_followers = playlist.get('followers', 0)
 
-        playlist_track_ids = []
-        tracks_response = sp.playlist_tracks(
-            playlist_id, fields="items.track(id,name,artists,album,duration_ms,external_urls,images),next", limit=100)
+        progress = crawl_checkpoint.playlist_progress(playlist_id)
+        if progress is None:
+            tracks_response = sp.playlist_tracks(
+                playlist_id, fields="items.track(id,name,artists,album,duration_ms,external_urls,images),next", limit=100)
+        elif not progress['complete']:
+            # Continue from the page after the last recorded one
+            tracks_response = sp.next({'next': progress['next_url']})
+        else:
+            tracks_response = None
+
         while tracks_response:
+            page_track_ids = []
+            page_tracks_details = {}
             for item in tracks_response['items']:
                 track = item['track']
                 if track:  # Ensure track is not None
@@ -94,8 +378,8 @@ def fetch_user_playlists_with_tracks_from_spotify(sp):
 
                     if len(track['name'])>0:
                         # Populate track details if not already done
-                        if track_id not in tracks_details:
-                            tracks_details[track_id] = {
+                        if track_id not in page_tracks_details:
+                            page_tracks_details[track_id] = {
                                 'name': track['name'],
                                 'artists': [artist['id'] for artist in track['artists']],
                                 'album': track['album']['name'],
@@ -106,17 +390,15 @@ def fetch_user_playlists_with_tracks_from_spotify(sp):
                                 "release_date_precision": track['album']['release_date_precision'],
                             }
 
-                            # Add artist IDs to the set of unique artist IDs
-                            unique_artist_ids.update(
-                                artist['id'] for artist in track['artists'])
-                        
-                        playlist_track_ids.append(track_id)
+                        page_track_ids.append(track_id)
 
+            crawl_checkpoint.record_tracks_page(playlist_id, page_track_ids, page_tracks_details, tracks_response['next'])
 
             # Fetch next batch of tracks if available
             tracks_response = sp.next(
                 tracks_response) if tracks_response['next'] else None
 
+        playlist_track_ids = crawl_checkpoint.playlist_track_ids(playlist_id)
         playlists_details[playlist_id] = {
             'id': playlist_id,
             'name': playlist_name,
@@ -124,16 +406,35 @@ def fetch_user_playlists_with_tracks_from_spotify(sp):
             'track_ids': playlist_track_ids,
             'description': playlist_description,
             'followers': playlist_followers,
-            'owner': playlist_owner
+            'owner': playlist_owner,
+            'snapshot_id': playlist.get('snapshot_id')
         }
-
-    # After collecting unique artist IDs, fetch artist details in bulk
-    # Assuming a `chunker` utility function
-    for artist_id_chunk in chunker(list(unique_artist_ids), 50):
+        refresh_events.publish('playlist-fetched', {
+            'id': playlist_id,
+            'name': playlist_name,
+            'image_url': playlist_image_url,
+            'track_count': len(playlist_track_ids),
+            'index': playlist_index + 1,
+            'total': len(playlist_items)
+        })
+
+    tracks_details = crawl_checkpoint.tracks()
+    # Unique artist IDs of the collected tracks
+    unique_artist_ids = {artist_id for track in tracks_details.values() for artist_id in track['artists']}
+    refresh_events.publish('tracks-collected', {'num_tracks': len(tracks_details), 'num_artists': len(unique_artist_ids)})
+
+    # After collecting unique artist IDs, fetch the artists not fetched yet in bulk
+    fetched_artists = crawl_checkpoint.artists()
+    missing_artist_ids = sorted(unique_artist_ids - fetched_artists.keys())
+    for chunk_index, artist_id_chunk in enumerate(chunker(missing_artist_ids, 50)):
         artists = sp.artists(artist_id_chunk)['artists']
+        refresh_events.publish('artists-batch', {
+            'fetched': len(unique_artist_ids) - len(missing_artist_ids) + min((chunk_index + 1) * 50, len(missing_artist_ids)),
+            'total': len(unique_artist_ids)})
+        artists_batch = dict.fromkeys(artist_id_chunk)
         for artist in artists:
             if artist:  # Ensure artist is not None
-                artists_details[artist['id']] = {
+                artists_batch[artist['id']] = {
                     'name': artist['name'],
                     'spotify_url': artist['external_urls']['spotify'],
                     'popularity': artist['popularity'],
@@ -141,7 +442,10 @@ def fetch_user_playlists_with_tracks_from_spotify(sp):
                     # Some artists may not have images
                     'image_url': artist['images'][0]['url'] if artist.get('images') else None
                 }
+        crawl_checkpoint.record_artists(artists_batch)
+        fetched_artists.update(artists_batch)
 
+    artists_details = {artist_id: artist for artist_id, artist in fetched_artists.items() if artist}
     return playlists_details, tracks_details, artists_details
 
 
@@ -174,47 +478,288 @@ def ensure_cache_data_freshness(sp: Spotify):
     # Attempt to load from cache first
     global spotify_cache
 
+    if shared_cache_reader is not None:
+        # The loader process owns refreshing, workers only read what it publishes
+        return None, None, None
+
+    if job_queue is not None:
+        # Job workers refresh and save the cache file, pick up what they saved last
+        reload_cache_if_changed()
+        if not spotify_cache.is_cache_valid():
+            logging.info("Cache is outdated or incomplete. Queueing a refresh.")
+            job_queue.enqueue(get_job_user_id(sp), REFRESH, priority=PRIORITY_INTERACTIVE)
+        return
+
     if spotify_cache.is_cache_valid():
         logging.info("Cache is valid. Using cached data.")
-    else:
+        return
+
+    # Single flight: concurrent callers wait for the refresh in progress instead of starting another crawl
+    with refresh_lock:
+        # Another web process may have refreshed and saved the cache file meanwhile
+        reload_cache_if_changed()
+        if spotify_cache.is_cache_valid():
+            logging.info("Cache refreshed by a concurrent request. Using cached data.")
+            return
+
+        if not crawl_checkpoint.acquire():
+            logging.info("Another process is crawling the library, leaving the refresh to it.")
+            refresh_events.publish('refresh-failed', {'error': 'Another process is refreshing the library.'})
+            return
+
         logging.info("Cache is outdated or incomplete. Fetching new data...")
+        refresh_events.publish('refresh-started', reset_history=True)
         try:
             # Fetch new data from Spotify
             playlists_details, tracks_details, artists_details = fetch_user_playlists_with_tracks_from_spotify(
                 sp)
 
-            # Update track details with track wise metrics
-            update_tracks_cache_with_audio_features_in_bulk(sp, tracks_details)
+            # Update track details with track wise metrics, only unseen tracks hit Spotify
+            audio_features_lookup_stats = update_tracks_cache_with_audio_features_in_bulk(sp, tracks_details)
 
             # Update playlist details with metrics
             update_playlist_metrics_cache_in_bulk(playlists_details, tracks_details, artists_details)
+            refresh_events.publish('metrics-done', {'num_playlists': len(playlists_details)})
 
-            # Update the cache with the new data
+            # Log what changed since the previous generation, for clients syncing deltas
+            changes = {
+                'playlists': diff_entities(spotify_cache.playlist_cache, playlists_details),
+                'tracks': diff_entities(spotify_cache.tracks_cache, tracks_details),
+                'artists': diff_entities(spotify_cache.artists_cache, artists_details)
+            }
+            previous_tracks, previous_artists = spotify_cache.tracks_cache, spotify_cache.artists_cache
+
+            # Update the cache with the new data, the crawl is committed and its checkpoint no longer needed
             spotify_cache.update_cache(
                 playlists_details, tracks_details, artists_details)
-            logging.info("Data successfully fetched and cached.")
-
-            # log time
-            end_time = time.time()
-            duration = end_time - start_time
-
-            logging.info(
-                f"Cache check and update completed in {duration:.4f} seconds.")
+            crawl_checkpoint.clear()
 
         except Exception as e:
+            # Pages and batches fetched so far stay in the crawl checkpoint, the next attempt resumes from there
             logging.error(f"Error while fetching or caching data: {e}")
+            refresh_events.publish('refresh-failed', {'error': str(e)})
             return None, None, None
+        finally:
+            crawl_checkpoint.release()
+
+        apply_refresh_to_derived_state(previous_tracks, previous_artists, changes)
+        logging.info("Data successfully fetched and cached.")
+
+        # log time
+        end_time = time.time()
+        duration = end_time - start_time
+
+        logging.info(
+            f"Cache check and update completed in {duration:.4f} seconds "
+            f"(audio features: {audio_features_lookup_stats['hits']} hits, {audio_features_lookup_stats['misses']} misses).")
+        refresh_events.publish('refresh-completed', {'duration_seconds': round(duration, 3)})
+
+
+def apply_refresh_to_derived_state(previous_tracks, previous_artists, changes):
+    """
+    Brings every structure derived from the cache up to date with a refresh already saved to the cache.
+    The refresh is committed by then, so a failing update is logged instead of failing it, and the
+    in-memory structures are rebuilt from the cache.
+
+    Args:
+    - previous_tracks, previous_artists: The tracks and artists caches replaced by the refresh.
+    - changes (dict): Lists of (action, ID) tuples keyed by entity, as computed by diff_entities.
+    """
+    playlists_details = spotify_cache.playlist_cache
+    tracks_details = spotify_cache.tracks_cache
+    artists_details = spotify_cache.artists_cache
+    updates = (
+        ('library analytics', lambda: library_analytics.apply_refresh(
+            previous_tracks, previous_artists, tracks_details, artists_details)),
+        ('change log', lambda: change_log.record(spotify_cache.generation, changes)),
+        ('reverse index', lambda: reverse_index.apply_changes(playlists_details, tracks_details, changes)),
+        ('playlist history', lambda: playlist_history.record(spotify_cache.last_updated, playlists_details)),
+        ('playlist generator', lambda: playlist_generator.rebuild(tracks_details, artists_details)),
+        ('clusters', lambda: library_clusters.rebuild(tracks_details, artists_details)),
+        ('artwork sources', lambda: register_artwork_sources(playlists_details, tracks_details, artists_details)),
+        ('library store', sync_library_store),
+    )
+    failed = []
+    for name, update in updates:
+        try:
+            update()
+        except Exception as e:
+            logging.error(f"Failed to update the {name} after the refresh: {e}")
+            failed.append(name)
+
+    if failed:
+        try:
+            rebuild_derived_state()
+        except Exception as e:
+            logging.error(f"Failed to rebuild the derived state from the cache: {e}")
+    mark_derived_state_current()
+
+
+def start_background_refresh(sp: Spotify, force=False):
+    """
+    Refreshes the cache on a background thread, publishing progress to refresh_events.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+    - force (bool): Refresh even if the cache is still valid.
+
+    Returns:
+    True if a refresh is running (started now or already in progress), False if the cache is valid.
+    """
+    if shared_cache_reader is not None or spotify_cache is None:
+        return False
+    if job_queue is not None:
+        reload_cache_if_changed()
+        if not force and spotify_cache.is_cache_valid():
+            return False
+        job_id, _ = job_queue.enqueue(get_job_user_id(sp), REFRESH, {'force': force}, priority=PRIORITY_INTERACTIVE)
+        refresh_events.publish('refresh-queued', {'job_id': job_id}, reset_history=True)
+        threading.Thread(target=watch_refresh_job, args=(job_id,), name='refresh-job-watch', daemon=True).start()
+        return True
+    if refresh_lock.locked():
+        return True
+    if force:
+        spotify_cache.invalidate()
+    elif spotify_cache.is_cache_valid():
+        return False
+
+    # Subscribers connecting before the refresh starts must not replay the previous refresh's events
+    refresh_events.publish('refresh-queued', reset_history=True)
+    threading.Thread(target=ensure_cache_data_freshness, args=(sp,), name='cache-refresh', daemon=True).start()
+    return True
+
+
+def watch_refresh_job(job_id, poll_seconds=1):
+    """
+    Follows a queued refresh job, relaying its progress to refresh_events and reloading the cache
+    file once the job workers saved it.
+    """
+    started = False
+    while True:
+        job = job_queue.get(job_id) if job_queue is not None else None
+        if job is None:
+            return
+        if job['state'] == RUNNING and not started:
+            started = True
+            refresh_events.publish('refresh-started', {'job_id': job_id})
+        elif job['state'] == DONE:
+            reload_cache_if_changed()
+            refresh_events.publish('refresh-completed', {'job_id': job_id, 'duration_seconds': round(
+                job['finished_at'] - job['started_at'], 3)})
+            return
+        elif job['state'] == FAILED:
+            refresh_events.publish('refresh-failed', {'job_id': job_id, 'error': job['error']})
+            return
+        time.sleep(poll_seconds)
+
+
+def get_job_user_id(sp: Spotify):
+    """Returns the Spotify user ID jobs are deduplicated by."""
+    # Imported here, services depends on this module
+    from app.services import get_user_profile
+    return get_user_profile(sp)['id']
+
+
+def run_refresh_job(sp: Spotify, payload):
+    """
+    Job handler refreshing the cache in a job worker.
+
+    Returns:
+    The follow-up jobs, as (kind, payload, priority) tuples, hydrating what the refresh could not fetch.
+    """
+    reload_cache_if_changed()
+    if payload.get('force'):
+        spotify_cache.invalidate()
+    ensure_cache_data_freshness(sp)
+    if not spotify_cache.is_cache_valid():
+        raise RuntimeError("Refresh did not produce a valid cache.")
+
+    followups = []
+    if find_missing_artist_ids():
+        followups.append((HYDRATE_ARTISTS, None, PRIORITY_BACKGROUND))
+    if find_tracks_missing_audio_features():
+        followups.append((AUDIO_FEATURES, None, PRIORITY_BACKGROUND))
+    return followups
+
+
+def find_missing_artist_ids():
+    """Returns the IDs of the artists credited on cached tracks but missing from the artists cache."""
+    artist_ids = {artist_id for track in spotify_cache.tracks_cache.values() for artist_id in track.get('artists', [])}
+    return sorted(artist_ids - spotify_cache.artists_cache.keys())
+
+
+def find_tracks_missing_audio_features():
+    """Returns the IDs of the cached tracks whose audio features were never looked up."""
+    track_ids = [track_id for track_id, track in spotify_cache.tracks_cache.items() if 'audio_features' not in track]
+    known_features = audio_features_store.get_many(track_ids)
+    return [track_id for track_id in track_ids if track_id not in known_features]
+
+
+def save_hydrated_cache(changes, track_ids):
+    """
+    Commits an in-place hydration of the cache: recomputes the metrics of the playlists holding the
+    changed tracks, logs the changes under a new generation and saves the cache file.
+    """
+    update_playlist_metrics_cache_in_bulk(
+        spotify_cache.playlist_cache, spotify_cache.tracks_cache, spotify_cache.artists_cache,
+        playlist_ids=reverse_index.playlists_for_tracks(track_ids))
+    spotify_cache.generation += 1
+    change_log.record(spotify_cache.generation, changes)
+    spotify_cache.save_cache_to_file()
+    rebuild_derived_state()
+
+
+def run_hydrate_artists_job(sp: Spotify, payload):
+    """Job handler fetching the artists missing from the cache, in batches of 50."""
+    reload_cache_if_changed()
+    missing_artist_ids = find_missing_artist_ids()
+    hydrated = {}
+    for artist_id_chunk in chunker(missing_artist_ids, 50):
+        for artist in sp.artists(artist_id_chunk)['artists']:
+            if artist:
+                hydrated[artist['id']] = {
+                    'name': artist['name'],
+                    'spotify_url': artist['external_urls']['spotify'],
+                    'popularity': artist['popularity'],
+                    'genre': artist['genres'],
+                    'image_url': artist['images'][0]['url'] if artist.get('images') else None
+                }
+    logging.info(f"Hydrated {len(hydrated)} of {len(missing_artist_ids)} missing artists.")
+    if hydrated:
+        spotify_cache.artists_cache.update(hydrated)
+        track_ids = [track_id for artist_id in hydrated for track_id in reverse_index.tracks_for_artist(artist_id)]
+        save_hydrated_cache({'artists': [(ADDED, artist_id) for artist_id in hydrated]}, track_ids)
+
+
+def run_audio_features_job(sp: Spotify, payload):
+    """Job handler looking up the audio features never fetched for cached tracks."""
+    reload_cache_if_changed()
+    track_ids = find_tracks_missing_audio_features()
+    if not track_ids:
+        return
+    update_tracks_cache_with_audio_features_in_bulk(
+        sp, {track_id: spotify_cache.tracks_cache[track_id] for track_id in track_ids})
+    hydrated = [track_id for track_id in track_ids if 'audio_features' in spotify_cache.tracks_cache[track_id]]
+    logging.info(f"Hydrated audio features of {len(hydrated)} of {len(track_ids)} tracks.")
+    if hydrated:
+        save_hydrated_cache({'tracks': [(UPDATED, track_id) for track_id in hydrated]}, hydrated)
 
 
 def calculate_user_stats():
     """
     Calculates and returns user statistics based on their playlists, tracks, and artists data from the cache.
     """
+    if shared_cache_reader is not None:
+        return shared_cache_reader.get_json('stats')
+
     spotify_cache = get_spotify_cache_instance()
     if not spotify_cache:
         logging.error("Spotify cache instance is not available.")
         return None
 
+    if library_store is not None:
+        return library_store.user_stats()
+
     playlists_details = spotify_cache.playlist_cache
     tracks_details = spotify_cache.tracks_cache
     artists_details = spotify_cache.artists_cache
@@ -228,27 +773,378 @@ def calculate_user_stats():
             'num_unique_artists': 0
         }
 
-    num_playlists = len(playlists_details)
-    # Using keys directly as they represent unique track IDs
-    unique_tracks = set(tracks_details)
-    # Using keys directly as they represent unique artist IDs
-    unique_artists = set(artists_details)
-
+    # Cache keys are unique track and artist IDs, no need to copy them into sets
     return {
-        'num_playlists': num_playlists,
-        'num_unique_tracks': len(unique_tracks),
-        'num_unique_artists': len(unique_artists)
+        'num_playlists': len(playlists_details),
+        'num_unique_tracks': len(tracks_details),
+        'num_unique_artists': len(artists_details)
     }
 
+
+def get_library_analytics():
+    """
+    Returns the precomputed library-wide analytics: genre distribution, release-decade histogram,
+    artist frequency ranking and audio feature distributions.
+    """
+    if shared_cache_reader is not None:
+        return shared_cache_reader.get_json('library-analytics')
+    if get_spotify_cache_instance() is None:
+        return None
+    return library_analytics.snapshot()
+
+
+def find_library_duplicates(check_audio_features=False):
+    """
+    Finds exact duplicates within and across playlists, and near-duplicate releases of the same song.
+
+    Args:
+    - check_audio_features (bool): Also require near-duplicates to have close audio features.
+    """
+    if shared_cache_reader is not None:
+        return shared_cache_reader.get_json('duplicates:audio' if check_audio_features else 'duplicates')
+    spotify_cache = get_spotify_cache_instance()
+    if spotify_cache is None:
+        return None
+    return find_duplicates(spotify_cache.playlist_cache, spotify_cache.tracks_cache, check_audio_features)
+
+
+
+def get_library_clusters(cluster=None):
+    """
+    Returns the mood clusters of the library and the genre groups, computed at refresh time.
+
+    Args:
+    - cluster (int): If given, returns the cluster's summary with the IDs of its tracks instead.
+    """
+    key = 'clusters' if cluster is None else f'cluster:{cluster}'
+    if shared_cache_reader is not None:
+        return shared_cache_reader.get_json(key)
+    if get_spotify_cache_instance() is None:
+        return None
+
+    clusters = library_clusters.snapshot()
+    if cluster is None or clusters is None:
+        return clusters
+    if not 0 <= cluster < len(clusters['clusters']):
+        return None
+    return dict(clusters['clusters'][cluster], track_ids=library_clusters.cluster_track_ids(cluster))
+
+
+
+def export_library(entity, export_format):
+    """
+    Streams an entity ('tracks', 'artists' or 'playlist_tracks') of the cached library as CSV,
+    NDJSON or Parquet, row by row.
+
+    Returns:
+    A generator of byte chunks, or None if the cache is not available.
+    """
+    if shared_cache_reader is not None:
+        logging.error("Exports are not available to workers attached to the shared cache.")
+        return None
+    spotify_cache = get_spotify_cache_instance()
+    if spotify_cache is None:
+        logging.error("Spotify cache instance is not available.")
+        return None
+    # Refreshes swap in new dictionaries, the export keeps reading the ones it started with
+    return stream_export(entity, export_format, spotify_cache.playlist_cache, spotify_cache.tracks_cache,
+                         spotify_cache.artists_cache)
+
+
+
+def get_changes(since, include_data=True):
+    """
+    Returns the playlists, tracks and artists added, removed or updated after cache generation `since`.
+
+    Args:
+    - since (int): The generation the client last synced to.
+    - include_data (bool): Also return the current content of the added and updated entities.
+
+    Returns:
+    A dictionary with the latest 'version', 'full_resync' (True if `since` is too old to sync
+    incrementally), the 'changes' per entity and, if requested, their 'data'.
+    """
+    if change_log is None:
+        logging.error("Change log is not available.")
+        return None
+
+    result = change_log.changes_since(since)
+    if include_data and not result['full_resync'] and shared_cache_reader is None:
+        spotify_cache = get_spotify_cache_instance()
+        caches = {'playlists': spotify_cache.playlist_cache, 'tracks': spotify_cache.tracks_cache,
+                  'artists': spotify_cache.artists_cache}
+        result['data'] = {
+            entity: {
+                entity_id: caches[entity][entity_id]
+                for entity_id in entity_changes['added'] + entity_changes['updated'] if entity_id in caches[entity]
+            }
+            for entity, entity_changes in result['changes'].items()
+        }
+    return result
+
+## ----------------- Listening History Specific -------------------##
+
+
+def sync_listening_history(sp: Spotify):
+    """
+    Ingests the plays made since the last sync from the recently-played endpoint, and records today's
+    top tracks snapshot for each time range.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+
+    Returns:
+    A dictionary with the number of plays received and added, or None if the listening history store
+    is not available.
+    """
+    if listening_history_store is None:
+        logging.error("Listening history store is not available.")
+        return None
+    after = listening_history_store.get_meta('recently_played_after')
+    response = sp.current_user_recently_played(limit=50, after=int(after) if after else None)
+    ingestion_stats = listening_history_store.add_plays(plays_from_recently_played(response.get('items', [])))
+
+    cursors = response.get('cursors') or {}
+    if cursors.get('after'):
+        listening_history_store.set_meta('recently_played_after', cursors['after'])
+
+    for time_range in ('short_term', 'medium_term', 'long_term'):
+        top_tracks = sp.current_user_top_tracks(limit=50, time_range=time_range)
+        listening_history_store.record_top_tracks(
+            time_range, [track['id'] for track in top_tracks.get('items', []) if track], time.time())
+
+    return ingestion_stats
+
+
+def ingest_streaming_history_export(path):
+    """
+    Streams a Spotify streaming history export (a JSON file or a directory of them) into the
+    listening history store.
+
+    Returns:
+    A dictionary with the number of plays received and added.
+    """
+    return listening_history_store.add_plays(plays_from_streaming_history(path))
+
+
+def get_playlist_at(playlist_id, timestamp=None):
+    """
+    Rebuilds a playlist as it was at a point in time from the playlist history.
+
+    Args:
+    - playlist_id: The Spotify ID of the playlist.
+    - timestamp: Epoch seconds, the latest recorded version if None.
+
+    Returns:
+    A dictionary with the playlist's track IDs and metrics at that time, or None if it did not exist.
+    """
+    if playlist_history is None:
+        logging.error("Playlist history is not available.")
+        return None
+    return playlist_history.playlist_at(playlist_id, timestamp)
+
+
+def get_playlist_metric_trend(playlist_id, metric_names=None, start=None, end=None):
+    """
+    Returns the values of a playlist's metrics at every refresh that changed them, from the playlist history.
+    """
+    if playlist_history is None:
+        logging.error("Playlist history is not available.")
+        return None
+    return playlist_history.metric_trend(playlist_id, metric_names=metric_names, start=start, end=end)
+
+
+def get_playlists_containing_track(track_id):
+    """
+    Returns the cached playlists containing a track, from the reverse index.
+
+    Returns:
+    A list of dictionaries with the ID and name of each playlist, or None if the cache is not available.
+    """
+    if shared_cache_reader is not None:
+        logging.error("Reverse lookups are not available to workers attached to the shared cache.")
+        return None
+    spotify_cache = get_spotify_cache_instance()
+    if spotify_cache is None:
+        logging.error("Spotify cache instance is not available.")
+        return None
+    return [
+        {'id': playlist_id, 'name': spotify_cache.playlist_cache.get(playlist_id, {}).get('name')}
+        for playlist_id in reverse_index.playlists_for_track(track_id)]
+
+
+def get_tracks_by_artist(artist_id):
+    """
+    Returns the cached tracks by an artist, from the reverse index.
+
+    Returns:
+    A list of dictionaries with the ID and name of each track, or None if the cache is not available.
+    """
+    if shared_cache_reader is not None:
+        logging.error("Reverse lookups are not available to workers attached to the shared cache.")
+        return None
+    spotify_cache = get_spotify_cache_instance()
+    if spotify_cache is None:
+        logging.error("Spotify cache instance is not available.")
+        return None
+    return [
+        {'id': track_id, 'name': spotify_cache.tracks_cache.get(track_id, {}).get('name')}
+        for track_id in reverse_index.tracks_for_artist(artist_id)]
+
+
+def get_listening_rollups(period='day', start=None, end=None):
+    """
+    Returns daily or weekly rollups of minutes listened, top artists and audio feature drift.
+    """
+    if listening_history_store is None:
+        logging.error("Listening history store is not available.")
+        return None
+    return listening_history_store.rollups(period=period, start=start, end=end)
+
+
+def get_top_tracks_history(time_range, start=None, end=None):
+    """
+    Returns the daily top tracks snapshots recorded by sync_listening_history for a time range.
+    """
+    if listening_history_store is None:
+        logging.error("Listening history store is not available.")
+        return None
+    return listening_history_store.top_tracks(time_range, start=start, end=end)
+
+## ----------------- Playlist Editing Specific -------------------##
+
+
+def remove_tracks_from_playlists(sp: Spotify, removals):
+    """
+    Removes tracks from playlists on Spotify in batches of 100, then patches the cached playlists and
+    recomputes the metrics of the edited playlists only, without refetching anything. If a batch fails,
+    the batches Spotify already applied are still patched into the cache before the error is raised.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+    - removals (dict): Track IDs to remove, keyed by playlist ID.
+
+    Returns:
+    A dictionary mapping each edited playlist ID to its new snapshot ID and the number of removed tracks.
+    """
+    spotify_cache = get_spotify_cache_instance()
+    if not spotify_cache and shared_cache_reader is None:
+        logging.error("Spotify cache instance is not available.")
+        return None
+
+    results = {}
+    edited_playlist_ids = []
+    try:
+        for playlist_id, track_ids in removals.items():
+            track_ids = list(dict.fromkeys(track_ids))
+            removed_track_ids = []
+            snapshot_id = None
+            try:
+                for batch in chunker(track_ids, 100):
+                    # Chain the snapshot so each batch applies to the playlist version the previous one produced
+                    response = sp.playlist_remove_all_occurrences_of_items(playlist_id, batch, snapshot_id=snapshot_id)
+                    snapshot_id = response.get('snapshot_id')
+                    removed_track_ids.extend(batch)
+            finally:
+                if removed_track_ids:
+                    result = patch_playlist_removal(spotify_cache, playlist_id, removed_track_ids, snapshot_id)
+                    if result is not None:
+                        results[playlist_id] = result
+                        edited_playlist_ids.append(playlist_id)
+    finally:
+        if shared_cache_reader is not None:
+            shared_cache_reader.request_refresh()
+        else:
+            if edited_playlist_ids:
+                # Bumped only once the playlists and their metrics are patched, so no response is memoized
+                # under the new generation with the data of the previous one
+                spotify_cache.generation += 1
+                change_log.record(spotify_cache.generation,
+                                  {'playlists': [(UPDATED, playlist_id) for playlist_id in edited_playlist_ids]})
+                mark_derived_state_current()
+                spotify_cache.save_cache_to_file()
+    return results
+
+
+def patch_playlist_removal(spotify_cache, playlist_id, track_ids, snapshot_id):
+    """
+    Patches tracks removed on Spotify out of a cached playlist, and recomputes its metrics.
+
+    Returns:
+    The playlist's new snapshot ID and number of removed tracks, or None if the playlist is not cached.
+    """
+    if shared_cache_reader is not None:
+        # Workers hold no cache to patch, the loader refreshes and publishes a new generation
+        return {'snapshot_id': snapshot_id, 'removed': len(track_ids)}
+
+    removed_count = spotify_cache.remove_playlist_tracks(playlist_id, track_ids, snapshot_id)
+    if removed_count is None:
+        logging.warning(f"Playlist ID {playlist_id} edited on Spotify but not found in cache.")
+        return None
+    reverse_index.update_playlist(playlist_id, spotify_cache.playlist_cache[playlist_id]['track_ids'])
+
+    update_playlist_metrics_cache_in_bulk(
+        spotify_cache.playlist_cache, spotify_cache.tracks_cache, spotify_cache.artists_cache,
+        playlist_ids=[playlist_id])
+    playlist_history.record(time.time(), {playlist_id: spotify_cache.playlist_cache[playlist_id]}, complete=False)
+    if library_store is not None:
+        library_store.replace_playlist_tracks(playlist_id, spotify_cache.playlist_cache[playlist_id]['track_ids'])
+
+    logging.info(f"Removed {removed_count} track entries from playlist ID {playlist_id}.")
+    return {'snapshot_id': snapshot_id, 'removed': removed_count}
+
+
+
+def generate_playlist(sp: Spotify, criteria):
+    """
+    Generates a playlist from the library by audio feature targets and constraints, and optionally
+    creates it on Spotify.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+    - criteria (dict): 'targets' ((min, max) ranges keyed by feature), 'genres', 'artists',
+      'exclude_artists', 'count', 'target_duration_ms' and 'max_tracks_per_artist', plus 'save'
+      and 'name' to create the playlist on Spotify.
+
+    Returns:
+    A dictionary with the picked track IDs, their total duration, the number of candidates and,
+    if saved, the ID of the created playlist.
+    """
+    if shared_cache_reader is not None:
+        logging.error("Playlist generation is not available to workers attached to the shared cache.")
+        return None
+    if get_spotify_cache_instance() is None:
+        logging.error("Spotify cache instance is not available.")
+        return None
+
+    generated = playlist_generator.generate(
+        targets=criteria.get('targets'),
+        genres=criteria.get('genres'),
+        artists=criteria.get('artists'),
+        exclude_artists=criteria.get('exclude_artists'),
+        count=criteria.get('count'),
+        target_duration_ms=criteria.get('target_duration_ms'),
+        max_tracks_per_artist=criteria.get('max_tracks_per_artist'))
+
+    if criteria.get('save') and generated['track_ids']:
+        user_id = sp.current_user()['id']
+        created = sp.user_playlist_create(user_id, criteria.get('name') or 'Generated Playlist', public=False)
+        for batch in chunker(generated['track_ids'], 100):
+            sp.playlist_add_items(created['id'], batch)
+        generated['playlist_id'] = created['id']
+        logging.info(f"Generated playlist saved to Spotify as {created['id']} with {len(generated['track_ids'])} tracks.")
+
+    return generated
+
 ## ----------------- Track Specific -------------------##
 
 
 def fetch_track_by_id_from_spotify(sp: Spotify, track_id):
     """
     Fetches a track by its ID directly from Spotify if not available in the cache.
-    Updates the cache with the fetched track data.
 
     Args:
+    - sp: An authenticated spotipy.Spotify client.
     - track_id: The Spotify ID of the track.
 
     Returns:
@@ -267,7 +1163,7 @@ def fetch_track_by_id_from_spotify(sp: Spotify, track_id):
             fetched_track = sp.track(track_id)  # Fetch the track using Spotipy
 
             if fetched_track:
-                return fetched_track
+                return format_spotify_track(fetched_track)
             else:
                 logging.warning(
                     f"No data returned for track ID {track_id} from Spotify.")
@@ -277,6 +1173,76 @@ def fetch_track_by_id_from_spotify(sp: Spotify, track_id):
         return None
 
 
+def fetch_tracks_information(sp: Spotify, track_ids):
+    """
+    Retrieves several tracks in one pass over the cache, fetching the tracks missing from the cache
+    from Spotify in batches of 50, the most its several tracks endpoint accepts.
+
+    Args:
+    - sp: An authenticated spotipy.Spotify client.
+    - track_ids: A list of Spotify track IDs.
+
+    Returns:
+    A (tracks, missing) tuple: the found tracks in the order of `track_ids`, shaped as by
+    get_track_information_from_cache, and the IDs neither the cache nor Spotify know.
+    """
+    found = {}
+    spotify_cache = get_spotify_cache_instance() if shared_cache_reader is None else None
+    if shared_cache_reader is not None:
+        for track_id in track_ids:
+            track = shared_cache_reader.get_json(f'track:{track_id}')
+            if track:
+                found[track_id] = track
+    elif spotify_cache is not None:
+        for track_id in track_ids:
+            track_details = spotify_cache.tracks_cache.get(track_id)
+            if track_details:
+                found[track_id] = format_cached_track(track_id, track_details, spotify_cache.artists_cache)
+
+    uncached_track_ids = [track_id for track_id in track_ids if track_id not in found]
+    for track_id_chunk in chunker(uncached_track_ids, 50):
+        logging.info(f"Fetching {len(track_id_chunk)} tracks missing from the cache from Spotify.")
+        for track in sp.tracks(track_id_chunk)['tracks']:
+            if track:  # Unknown IDs come back as None
+                found[track['id']] = format_spotify_track(track)
+
+    return ([found[track_id] for track_id in track_ids if track_id in found],
+            [track_id for track_id in track_ids if track_id not in found])
+
+
+def format_cached_track(track_id, track_details, artists_details):
+    """Shapes the cached details of a track for the track endpoints, with artist names resolved."""
+    return {
+        'id': track_id,
+        'name': track_details['name'],
+        'album': track_details.get('album', 'Unknown Album'),
+
+        # Tracks hold artist IDs, resolved to names through the artists cache
+        'artists': [artists_details.get(artist_id, {}).get('name') for artist_id in track_details.get('artists', [])],
+        'duration_ms': track_details.get('duration_ms', 0),
+        'spotify_url': track_details.get('spotify_url', '#'),
+
+        # Providing default values
+        'image_url': track_details.get('image_url', 'https://example.com/default_image.png'),
+        'audio_features': track_details.get('audio_features', None)
+    }
+
+
+def format_spotify_track(track):
+    """Shapes a track object returned by Spotify like a cached track, for the track endpoints."""
+    album_images = track['album'].get('images', [])
+    return {
+        'id': track['id'],
+        'name': track['name'],
+        'album': track['album']['name'],
+        'artists': [artist['name'] for artist in track['artists']],
+        'duration_ms': track['duration_ms'],
+        'spotify_url': track['external_urls'].get('spotify', '#'),
+        'image_url': album_images[0]['url'] if album_images else 'https://example.com/default_image.png',
+        'audio_features': None
+    }
+
+
 def get_track_information_from_cache(track_id):
     """
     Retrieves detailed information for a specific track by its Spotify ID from the in-memory cache.
@@ -287,6 +1253,9 @@ def get_track_information_from_cache(track_id):
     Returns:
     A dictionary containing detailed information about the track, or None if the track is not found.
     """
+    if shared_cache_reader is not None:
+        return shared_cache_reader.get_json(f'track:{track_id}')
+
     spotify_cache = get_spotify_cache_instance()
 
     if spotify_cache is None:
@@ -294,22 +1263,7 @@ def get_track_information_from_cache(track_id):
         return None
 
     if track_id in spotify_cache.tracks_cache:
-        track_details = spotify_cache.tracks_cache[track_id]
-        track_info = {
-            'id': track_id,
-            'name': track_details['name'],
-            'album': track_details.get('album', 'Unknown Album'),
-
-            # Adjusted to list artist names
-            'artists': [artist['name'] for artist in track_details.get('artists', [])],
-            'duration_ms': track_details.get('duration_ms', 0),
-            'spotify_url': track_details.get('spotify_url', '#'),
-
-            # Providing default values
-            'image_url': track_details.get('image_url', 'https://example.com/default_image.png'),
-            'audio_features': track_details.get('audio_features', None)
-        }
-        return track_info
+        return format_cached_track(track_id, spotify_cache.tracks_cache[track_id], spotify_cache.artists_cache)
     else:
         print(f"Track ID {track_id} not found in cache.")
         return None
@@ -329,7 +1283,10 @@ def get_all_tracks_data_from_cache():
             logging.error("Spotify cache instance is not available.")
             return []
 
-        all_tracks = list(spotify_cache.tracks_cache.values())
+        if library_store is not None:
+            all_tracks = library_store.all_tracks()
+        else:
+            all_tracks = list(spotify_cache.tracks_cache.values())
         logging.info(
             f"Successfully retrieved {len(all_tracks)} tracks from cache.")
         return all_tracks
@@ -340,7 +1297,9 @@ def get_all_tracks_data_from_cache():
 
 def update_track_cache_with_audio_features(sp: Spotify, track_id):
     """
-    Fetches and updates the tracks cache with audio features for a specified track.
+    Fetches the audio features of a specified track, records them in the audio features store and
+    updates the track in the tracks cache. A track outside the cached library is only recorded in the
+    store, the cache holds no details of it to attach the features to.
 
     Args:
     - sp: An authenticated spotipy.Spotify client.
@@ -354,47 +1313,55 @@ def update_track_cache_with_audio_features(sp: Spotify, track_id):
     # Fetch audio features for the given track_id
     audio_features = sp.audio_features([track_id])[0]
     if audio_features:
-        # Simplify assignment with a dictionary comprehension for relevant audio features
-        audio_features_data = {k: audio_features[k] for k in (
-            'acousticness', 'danceability', 'energy', 'instrumentalness',
-            'liveness', 'loudness', 'speechiness', 'tempo', 'valence')}
+        # Same fields as the bulk path, playlist metrics read duration_ms from them
+        audio_features_data = {k: audio_features[k] for k in AUDIO_FEATURE_FIELDS}
+        audio_features_store.put_many({track_id: audio_features_data})
 
-        # Update the cache with newly fetched audio features
         if track_id in spotify_cache.tracks_cache:
             spotify_cache.tracks_cache[track_id]["audio_features"] = audio_features_data
-        else:
-            # If the track isn't in the cache, add it with the audio features
-            spotify_cache.tracks_cache[track_id] = {
-                "audio_features": audio_features_data}
+            # Only the playlists holding the track have their metrics recomputed, under a new generation
+            save_hydrated_cache({'tracks': [(UPDATED, track_id)]}, [track_id])
 
 
 def update_tracks_cache_with_audio_features_in_bulk(sp: Spotify, tracks_details_dict: dict):
     """
-    Fetches and updates the global tracks cache with audio features for each track specified in track_details.
+    Updates track_details with audio features for each track. Features are looked up in the persistent
+    audio features store first, only tracks never seen before are fetched from Spotify.
 
     Args:
     - sp: An authenticated spotipy.Spotify client.
     - track_details: Dict of unique tracks.
+
+    Returns:
+    A dictionary with the number of store 'hits' and 'misses' for this update.
     """
+    known_features = audio_features_store.get_many(tracks_details_dict.keys())
+    missing_track_ids = [track_id for track_id in tracks_details_dict if track_id not in known_features]
 
-    # Iterate over track_ids in batches of 100
-    for batch in chunker(list(tracks_details_dict.keys()), 100):
+    # Iterate over missing track_ids in batches of 100
+    for batch_index, batch in enumerate(chunker(missing_track_ids, 100)):
         audio_features_list = sp.audio_features(batch)
+        refresh_events.publish('audio-features-batch', {
+            'fetched': min((batch_index + 1) * 100, len(missing_track_ids)), 'total': len(missing_track_ids)})
 
+        fetched_features = dict.fromkeys(batch)
         for features in audio_features_list:
             if features:
-                track_id = features['id']
-                track_details = tracks_details_dict.get(
-                    track_id, {})
-
                 # Simplify assignment with a dictionary comprehension
-                audio_features = {k: features[k] for k in (
-                    'acousticness', 'analysis_url', 'danceability', 'duration_ms', 'energy', 
-                    'instrumentalness', 'key', 'liveness', 'loudness', 'mode', 'speechiness', 
-                    'tempo', 'time_signature', 'valence')}
+                fetched_features[features['id']] = {k: features[k] for k in AUDIO_FEATURE_FIELDS}
+
+        audio_features_store.put_many(fetched_features)
+        known_features.update(fetched_features)
+
+    for track_id, audio_features in known_features.items():
+        if audio_features:
+            # Update the cache with stored or newly fetched audio features
+            tracks_details_dict[track_id]["audio_features"] = audio_features
 
-                # Update the cache with newly fetched audio features
-                track_details["audio_features"] = audio_features
+    lookup_stats = {'hits': len(tracks_details_dict) - len(missing_track_ids), 'misses': len(missing_track_ids)}
+    logging.info(
+        f"Audio features store lookups: {lookup_stats['hits']} hits, {lookup_stats['misses']} misses.")
+    return lookup_stats
 
 
 def get_tracks_audio_features_in_bulk(sp, track_ids):
@@ -424,15 +1391,16 @@ def get_tracks_audio_features_in_bulk(sp, track_ids):
         else:
             tracks_with_no_data_in_cache.append(track_id)
 
-    # Update cache for tracks missing audio features
+    # Look up the missing features into a local dict, tracks outside the library must not end up in the cache
     if tracks_with_no_data_in_cache:
         logging.info("Fetching missing audio features from Spotify.")
-        update_tracks_cache_with_audio_features_in_bulk(
-            sp, tracks_with_no_data_in_cache)
-        # Retrieve newly updated features
-        for track_id in tracks_with_no_data_in_cache:
-            if "audio_features" in spotify_cache.tracks_cache.get(track_id, {}):
-                tracks_audio_features[track_id] = spotify_cache.tracks_cache[track_id]["audio_features"]
+        fetched_tracks = {track_id: {} for track_id in tracks_with_no_data_in_cache}
+        update_tracks_cache_with_audio_features_in_bulk(sp, fetched_tracks)
+        for track_id, fetched_track in fetched_tracks.items():
+            if "audio_features" in fetched_track:
+                tracks_audio_features[track_id] = fetched_track["audio_features"]
+                if track_id in spotify_cache.tracks_cache:
+                    spotify_cache.tracks_cache[track_id]["audio_features"] = fetched_track["audio_features"]
     else:
         logging.info(
             "All requested tracks have audio features available in cache.")
@@ -591,18 +1559,17 @@ def get_playlist_wise_tracks_information_from_cache(playlist_id):
     return all_tracks_info
 
 
-def update_playlist_metrics_cache_in_bulk(playlists_details, tracks_details, artists_details):
+def update_playlist_metrics_cache_in_bulk(playlists_details, tracks_details, artists_details, playlist_ids=None):
     """
-    Calculates metrics for a specific playlist by its ID, using cached track and artist data.
+    Calculates metrics for playlists, using cached track and artist data, and stores them on each playlist.
 
     Args:
-    - playlist_id: The Spotify ID of the playlist.
-
-    Returns:
-    A dictionary containing metrics for the playlist.
+    - playlists_details, tracks_details, artists_details: Playlists, tracks and artists keyed by ID.
+    - playlist_ids: Optional; only recalculate metrics for these playlists. Defaults to all playlists.
+      Use reverse_index.playlists_for_tracks() to get the playlists affected by changed tracks.
     """
 
-    for playlist_id in playlists_details.keys():
+    for playlist_id in (playlist_ids if playlist_ids is not None else playlists_details.keys()):
         # Initialize variables to store data
         genres = {}
         artist_counts = {}
@@ -631,7 +1598,7 @@ def update_playlist_metrics_cache_in_bulk(playlists_details, tracks_details, art
                 for artist_id in track['artists']:
                     # Fetch artist details from artists_cache
                     if artist_id in artists_details:
-                        if artist_id != '1wRPtKGflJrBx9BmLsSwlU': ## Remove pritam, yee har jagah he
+                        if artist_id not in METRICS_EXCLUDED_ARTIST_IDS:
                             artist = artists_details[artist_id]
                             artist_name = artist['name']
                             artist_counts[artist_name] = artist_counts.get(
@@ -697,6 +1664,12 @@ def get_playlist_metric_by_id(playlist_id):
     """
     spotify_cache = get_spotify_cache_instance()
 
+    if library_store is not None:
+        playlist_metric = library_store.playlist(playlist_id)
+        if playlist_metric is None:
+            logging.warning(f"Playlist with ID {playlist_id} not found in library store.")
+        return playlist_metric
+
     try:
         playlist_metric = spotify_cache.playlist_cache[playlist_id]
     except KeyError:
@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import app
+from app.async_routes import AsyncRouter
+
+# Threads running the Flask app for the routes not served natively on the event loop
+WSGI_FALLBACK_THREADS = 32
+
+wsgi_fallback_executor = ThreadPoolExecutor(max_workers=WSGI_FALLBACK_THREADS, thread_name_prefix='wsgi-fallback')
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """
+    Runs each WSGI call on a thread of wsgi_fallback_executor. asgiref runs every WSGI call on one
+    shared thread by default, serializing the Flask routes and failing requests once that thread's
+    executor is torn down under load.
+    """
+
+    async def run_wsgi_app(self, body):
+        await asyncio.get_running_loop().run_in_executor(wsgi_fallback_executor, self.run_wsgi_app_in_thread, body)
+
+    def run_wsgi_app_in_thread(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400, 'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request'})
+            return
+
+        output = self.wsgi_application(environ, self.start_response)
+        try:
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                self.sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(output, 'close'):
+                output.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+# Async serving mode, e.g. `uvicorn asgi:application`
+application = AsyncRouter(fallback=ThreadPoolWsgiToAsgi(app))
@@ -1,63 +1,97 @@
 const apiService = (function() {
     const baseUrl = "http://127.0.0.1:5000";
 
-    // Fetch all playlists
-    const getAllPlaylists = () => {
-        return $.ajax({
-            url: `${baseUrl}/get-all-playlists`,
+    // ETag and body of the last successful response, per URL
+    const responseCache = new Map();
+
+    // GET with If-None-Match, a 304 resolves with the previously received body
+    const conditionalGet = (url) => {
+        const deferred = $.Deferred();
+        const cached = responseCache.get(url);
+
+        $.ajax({
+            url: url,
             type: "GET",
-            dataType: "json"
+            dataType: "json",
+            headers: cached ? { "If-None-Match": cached.etag } : {}
+        })
+        .done((data, textStatus, jqXHR) => {
+            if (jqXHR.status === 304 && cached) {
+                deferred.resolve(cached.data, textStatus, jqXHR);
+                return;
+            }
+            const etag = jqXHR.getResponseHeader("ETag");
+            if (etag) {
+                responseCache.set(url, { etag: etag, data: data });
+            }
+            deferred.resolve(data, textStatus, jqXHR);
+        })
+        .fail((jqXHR, textStatus, errorThrown) => {
+            if (jqXHR.status === 304 && cached) {
+                deferred.resolve(cached.data, textStatus, jqXHR);
+                return;
+            }
+            deferred.reject(jqXHR, textStatus, errorThrown);
         });
+
+        return deferred.promise();
     };
 
-    // Fetch playlist details
-    const getPlaylistDetails = (playlistId) => {
+    // Fetch user profile, stats and playlist summaries in one call
+    const getBootstrap = () => {
+        return conditionalGet(`${baseUrl}/bootstrap`);
+    };
+
+    // Start refreshing the library in the background, resolves with { refreshing: true|false }
+    const startRefresh = (force = false) => {
         return $.ajax({
-            url: `${baseUrl}/get-playlist/${playlistId}`,
-            type: "GET",
+            url: `${baseUrl}/refresh?force=${force}`,
+            type: "POST",
             dataType: "json"
         });
     };
 
+    // Subscribe to refresh progress, handlers are keyed by event name
+    const subscribeToRefreshEvents = (handlers) => {
+        const eventSource = new EventSource(`${baseUrl}/refresh/events`);
+        Object.entries(handlers).forEach(([eventName, handler]) => {
+            eventSource.addEventListener(eventName, (event) => handler(JSON.parse(event.data)));
+        });
+        return eventSource;
+    };
+
+    // Fetch playlist details
+    const getPlaylistDetails = (playlistId) => {
+        return conditionalGet(`${baseUrl}/get-playlist/${playlistId}`);
+    };
+
+    // Fetch several playlists in one call, resolves with { playlists: [...], missing: [...] }
+    const getPlaylistsDetails = (playlistIds) => {
+        return conditionalGet(`${baseUrl}/playlists?ids=${playlistIds.map(encodeURIComponent).join(",")}`);
+    };
+
     // Fetch all tracks for a playlist
     const getAllTracksForPlaylist = (playlistId) => {
-        return $.ajax({
-            url: `${baseUrl}/get-all-tracks-for-playlist/${playlistId}`,
-            type: "GET",
-            dataType: "json"
-        });
+        return conditionalGet(`${baseUrl}/get-all-tracks-for-playlist/${playlistId}`);
     };
 
     const deleteTracksFromPlaylists = (trackIDs, playlistID) => {
-        // Assuming `apiService.baseUrl` is defined elsewhere and accessible
-        fetch(`${baseUrl}/playlist/delete-tracks`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            // Assuming the server expects both trackIds and playlistID in the request body
-            body: JSON.stringify({ trackIds: trackIDs, playlistId: playlistID }),
-        })
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('Network response was not ok');
-            }
-            return response.json();
-        })
-        .then(data => {
-            console.log('Success:', data);
-            // Here you can add code to remove the tracks from the UI or notify the user
-            // For example, reload the track list to reflect the changes
-        })
-        .catch((error) => {
-            console.error('Error:', error);
+        return $.ajax({
+            url: `${baseUrl}/playlist/delete-tracks`,
+            type: "POST",
+            contentType: "application/json",
+            dataType: "json",
+            data: JSON.stringify({ trackIds: trackIDs, playlistId: playlistID })
         });
-    }
+    };
 
     // Public API
     return {
-        getAllPlaylists,
+        getBootstrap,
+        startRefresh,
+        subscribeToRefreshEvents,
         getPlaylistDetails,
+        getPlaylistsDetails,
         getAllTracksForPlaylist,
         deleteTracksFromPlaylists,
         baseUrl
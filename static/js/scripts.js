@@ -1,6 +1,7 @@
 $(document).ready(() => {
     const state = {
         userContentFetched: false,
+        streamedPlaylists: [],
         selectedPlaylistId: null,
         selectedPlaylists: [],
         isComparing: false
@@ -51,10 +52,68 @@ $(document).ready(() => {
     }
 
     function fetchAllPlaylists() {
-        apiService.getAllPlaylists()
-            .done((playlists) => {
-                console.log("Playlists fetched successfully.");
-                templateRenderer.renderPlaylists(playlists);
+        // Stream the playlists in while the library is refreshed, instead of blocking on the whole crawl
+        apiService.startRefresh()
+            .done((status) => {
+                if (status.refreshing) {
+                    streamRefreshProgress();
+                } else {
+                    loadAllPlaylists();
+                }
+            })
+            .fail(() => {
+                console.error("Error starting library refresh.");
+                loadAllPlaylists();
+            });
+    }
+
+    function streamRefreshProgress() {
+        state.streamedPlaylists = [];
+        templateRenderer.renderRefreshProgress("Refreshing your library...");
+
+        const eventSource = apiService.subscribeToRefreshEvents({
+            'playlist-fetched': (playlist) => {
+                state.streamedPlaylists.push(playlist);
+                templateRenderer.renderPlaylists(state.streamedPlaylists);
+                setupPlaylistItemListeners();
+                makePlaylistsDraggable();
+                templateRenderer.renderRefreshProgress(`Fetched playlist ${playlist.index} of ${playlist.total}: ${playlist.name}`);
+            },
+            'tracks-collected': (progress) => {
+                templateRenderer.renderRefreshProgress(`Collected ${progress.num_tracks} tracks by ${progress.num_artists} artists.`);
+            },
+            'artists-batch': (progress) => {
+                templateRenderer.renderRefreshProgress(`Fetching artists: ${progress.fetched} of ${progress.total}`);
+            },
+            'audio-features-batch': (progress) => {
+                templateRenderer.renderRefreshProgress(`Fetching audio features: ${progress.fetched} of ${progress.total}`);
+            },
+            'metrics-done': () => {
+                templateRenderer.renderRefreshProgress("Computing library insights...");
+            },
+            'refresh-completed': () => {
+                console.log("Library refresh completed.");
+                eventSource.close();
+                templateRenderer.hideRefreshProgress();
+                loadAllPlaylists();
+            },
+            'refresh-failed': (failure) => {
+                console.error("Library refresh failed:", failure.error);
+                eventSource.close();
+                templateRenderer.renderRefreshProgress("Refreshing your library failed.");
+                // Replace the partially streamed playlists with the cached library, stale but complete
+                loadAllPlaylists();
+            }
+        });
+    }
+
+    function loadAllPlaylists() {
+        // Playlist summaries and the header stats in one conditional request, unchanged after a no-op refresh
+        apiService.getBootstrap()
+            .done((bootstrap) => {
+                console.log("Dashboard bootstrap fetched successfully.");
+                templateRenderer.renderUserStats(bootstrap.user_stats);
+                templateRenderer.renderPlaylists(bootstrap.playlists);
                 // Playlist related listeners and controls initialization
                 setupPlaylistItemListeners();
                 makePlaylistsDraggable();
@@ -81,7 +140,7 @@ $(document).ready(() => {
     }
 
     function setupPlaylistItemListeners() {
-        $("#playlistsContainer").on("click", ".playlist-item", function () {
+        $("#playlistsContainer").off("click", ".playlist-item").on("click", ".playlist-item", function () {
             const playlistId = $(this).data('playlist-id');
             const playlistName = $(this).data('playlist-name');
 
@@ -109,13 +168,34 @@ $(document).ready(() => {
     
         // Log dropping a new playlist for comparison
         console.log(`Dropped playlist ID: ${playlistId} for comparison.`);
-    
-        // Fetch and display the new playlist details, overwriting any existing content
-        apiService.getPlaylistDetails(playlistId).then(playlistDetails => {
-            templateRenderer.renderPlaylistDetails(playlistDetails, droppable);
+        droppable.data("playlist-id", playlistId);
+
+        // Fetch every playlist on the comparison sides in one call, overwriting any existing content
+        const sides = $(".comparison-side").filter((index, side) => $(side).data("playlist-id"));
+        renderComparisonSides(sides, sides.map((index, side) => $(side).data("playlist-id")).get());
+    }
+
+    function compareSelectedPlaylists(playlistIds) {
+        console.log(`Comparing playlists: ${playlistIds.join(", ")}`);
+        const sides = $(".comparison-side");
+        sides.each((index, side) => $(side).data("playlist-id", playlistIds[index]));
+        renderComparisonSides(sides, playlistIds);
+    }
+
+    function renderComparisonSides(sides, playlistIds) {
+        apiService.getPlaylistsDetails(playlistIds).then(response => {
+            const playlistsById = new Map(response.playlists.map(playlist => [playlist.id, playlist]));
+            sides.each((index, side) => {
+                const playlistDetails = playlistsById.get(playlistIds[index]);
+                if (playlistDetails) {
+                    templateRenderer.renderPlaylistDetails(playlistDetails, side);
+                } else {
+                    $(side).html("<p>Error loading playlist details.</p>");
+                }
+            });
         }).catch(error => {
             console.error("Error fetching playlist details:", error);
-            droppable.html("<p>Error loading playlist details.</p>");
+            sides.html("<p>Error loading playlist details.</p>");
         });
     }
 
@@ -129,6 +209,8 @@ $(document).ready(() => {
             $('#playlistDetails').empty();
             $('#tracks-container').empty();
 
+            $('.comparison-side').empty().removeData('playlist-id');
+
             // Remove selection highlights from any previously selected playlists
             $('.playlist-item').removeClass('selected-playlist');
 
@@ -138,6 +220,7 @@ $(document).ready(() => {
     }
 
     function displayPlaylistDetailsAndTracks(playlistId, playlistName) {
+        state.selectedPlaylistId = playlistId;
         templateRenderer.displayRandomMusicNoteOrPlaylistName(playlistName);
         apiService.getPlaylistDetails(playlistId)
             .done((details) => {
@@ -193,7 +276,7 @@ $(document).ready(() => {
     }
 
     function setupDeleteTrackListener() {
-        $('#deleteTracksBtn').click(function () {
+        $('#deleteTracksBtn').off('click').click(function () {
             let selectedTrackIds = $('#tracks-container .list-group-item.selected').map(function () {
                 return $(this).data('track-id');
             }).get();
@@ -203,7 +286,9 @@ $(document).ready(() => {
                 apiService.deleteTracksFromPlaylists(selectedTrackIds, state.selectedPlaylistId)
                     .done(() => {
                         console.log('Selected tracks deleted successfully.');
-                        // Optionally, refresh the playlist details or tracks here
+                        $('#tracks-container .list-group-item.selected').remove();
+                        apiService.getPlaylistDetails(state.selectedPlaylistId)
+                            .done((details) => templateRenderer.renderPlaylistDetails(details, '#playlistDetails'));
                     })
                     .fail(() => {
                         console.error('Failed to delete selected tracks.');
@@ -215,7 +300,7 @@ $(document).ready(() => {
     }
 
     function setupActionBar() {
-        $('#selectTracksBtn').click(function () {
+        $('#selectTracksBtn').off('click').click(function () {
             const isSelectionMode = $('#tracks-container').toggleClass('selection-mode').hasClass('selection-mode');
             $('#deleteTracksBtn').toggle(isSelectionMode);
 
@@ -14,7 +14,7 @@ const templateRenderer = {
             playlistsHtml += `
                 <div class="col-lg-2 col-md-4 col-sm-6 mb-4">
                     <div class="playlist-item" data-playlist-id="${playlist.id}" data-playlist-name="${playlist.name}">
-                        <img src="${playlist.image_url}" class="img-fluid" alt="${playlist.name}">
+                        <img src="${apiService.baseUrl}/artwork/${playlist.id}?size=300" class="img-fluid" alt="${playlist.name}" loading="lazy">
                     </div>
                 </div>`;
 
@@ -28,6 +28,20 @@ const templateRenderer = {
         $("#playlistsContainer").html(playlistsHtml);
     },
 
+    renderUserStats: function (userStats) {
+        Object.entries(userStats).forEach(([stat, value]) => {
+            $(`.user-stats [data-stat="${stat}"]`).text(value);
+        });
+    },
+
+    renderRefreshProgress: function (message) {
+        $("#refreshProgress").text(message).show();
+    },
+
+    hideRefreshProgress: function () {
+        $("#refreshProgress").empty().hide();
+    },
+
     renderPlaylistDetails: function (playlistDetails, containerName) {
         const mostFeaturedArtists = playlistDetails.metrics['Most Featured Artist(s)'];
         const mostFeaturedArtistsText = Array.isArray(mostFeaturedArtists) ? mostFeaturedArtists.join(', ') : mostFeaturedArtists;
@@ -55,7 +69,7 @@ const templateRenderer = {
                 <a href="${track.spotify_url}" target="_blank" class="list-group-item list-group-item-action" data-track-id="${track.id}">
                     <div class="d-flex justify-content-between align-items-center w-100">
                         <div class="track-info d-flex align-items-center">
-                            <img src="${track.image_url}" alt="${track.name}" class="img-fluid mr-3" style="width: 50px; height: 50px; object-fit: cover;">
+                            <img src="${apiService.baseUrl}/artwork/${track.id}?size=64" alt="${track.name}" class="img-fluid mr-3" style="width: 50px; height: 50px; object-fit: cover;" loading="lazy">
                             <div>
                                 <h5 class="mb-1 text-truncate" style="max-width: 300px;">${track.name}</h5>
                                 <p class="mb-1" style="font-size: 14px;">${track.artists}</p>
@@ -0,0 +1,46 @@
+import os
+import sys
+import types
+
+import pytest
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, PROJECT_DIR)
+
+# Importing the app package sets up the Flask app, the Spotify client and the caches from settings.json.
+# The modules under test need none of it, so the package is registered bare and its modules load on their own.
+if 'app' not in sys.modules:
+    app_package = types.ModuleType('app')
+    app_package.__path__ = [os.path.join(PROJECT_DIR, 'app')]
+    sys.modules['app'] = app_package
+    # Read from the package by app.utils at import, the token manager is only used once the app runs
+    app_package.token_manager = None
+    app_package.USE_SQLITE_LIBRARY_STORE = False
+
+
+@pytest.fixture
+def cache_utils(tmp_path, monkeypatch):
+    """app.utils wired to an empty cache and fresh stores under tmp_path, in place of initialize_global_cache."""
+    from app import utils
+    from app.analytics import LibraryAnalytics
+    from app.change_log import ChangeLog
+    from app.clustering import LibraryClusters
+    from app.crawl_checkpoint import CrawlCheckpoint
+    from app.events import EventBroker
+    from app.feature_store import AudioFeaturesStore
+    from app.models import SpotifyCache
+    from app.playlist_generator import PlaylistGenerator
+    from app.playlist_history import PlaylistHistoryStore
+    from app.reverse_index import ReverseIndex
+
+    monkeypatch.setattr(utils, 'spotify_cache', SpotifyCache(json_file_path=str(tmp_path / 'user_data.json')))
+    monkeypatch.setattr(utils, 'audio_features_store', AudioFeaturesStore(db_path=str(tmp_path / 'audio_features.db')))
+    monkeypatch.setattr(utils, 'change_log', ChangeLog(db_path=str(tmp_path / 'change_log.db')))
+    monkeypatch.setattr(utils, 'crawl_checkpoint', CrawlCheckpoint(db_path=str(tmp_path / 'crawl_checkpoint.db')))
+    monkeypatch.setattr(utils, 'playlist_history', PlaylistHistoryStore(db_path=str(tmp_path / 'playlist_history.db')))
+    monkeypatch.setattr(utils, 'library_analytics', LibraryAnalytics())
+    monkeypatch.setattr(utils, 'playlist_generator', PlaylistGenerator())
+    monkeypatch.setattr(utils, 'library_clusters', LibraryClusters())
+    monkeypatch.setattr(utils, 'reverse_index', ReverseIndex())
+    monkeypatch.setattr(utils, 'refresh_events', EventBroker())
+    return utils
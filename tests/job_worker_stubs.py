@@ -0,0 +1,67 @@
+"""
+Stub job handlers run by spawned worker processes in test_job_queue. Spawned processes import this
+module on their own, so it must not import the app package at module level.
+"""
+import os
+import sqlite3
+import sys
+import time
+import types
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def _register_app_package():
+    # Same as conftest, the worker processes do not run it
+    if 'app' not in sys.modules:
+        sys.path.insert(0, PROJECT_DIR)
+        app_package = types.ModuleType('app')
+        app_package.__path__ = [os.path.join(PROJECT_DIR, 'app')]
+        sys.modules['app'] = app_package
+
+
+def stub_handlers(log_path):
+    """
+    Handlers logging each run to `log_path`, and behaving as their payload says: 'sleep' for a while,
+    'crash' the worker process, 'fail' with an exception, or return 'followups'.
+    """
+    def handle(kind):
+        def handler(user_id, payload):
+            conn = sqlite3.connect(log_path, timeout=30)
+            started_at = time.time()
+            time.sleep(payload.get('sleep', 0))
+            with conn:
+                conn.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                             (user_id, kind, payload.get('tag'), os.getpid(), started_at, time.time()))
+            conn.close()
+            if payload.get('crash'):
+                os._exit(1)
+            if payload.get('fail'):
+                raise RuntimeError('stub failure')
+            return [tuple(followup) for followup in payload.get('followups', [])]
+        return handler
+
+    from app.job_queue import JOB_KINDS
+    return {kind: handle(kind) for kind in JOB_KINDS}
+
+
+def run_stub_worker(db_path, log_path):
+    _register_app_package()
+    from app import job_queue
+    # Keep the test fast: poll often and retry failed jobs right away
+    job_queue.POLL_SECONDS = 0.05
+    job_queue.RETRY_BACKOFF_SECONDS = 0
+    job_queue.run_worker(db_path, lambda: stub_handlers(log_path))
+
+
+def stub_worker_pool(db_path, log_path, num_workers):
+    """A WorkerPool whose workers run the stub handlers."""
+    from app.job_queue import WorkerPool
+
+    class StubWorkerPool(WorkerPool):
+        def _start_worker(self):
+            process = self._context.Process(target=run_stub_worker, args=(db_path, log_path), daemon=True)
+            process.start()
+            return process
+
+    return StubWorkerPool(db_path, None, num_workers=num_workers)
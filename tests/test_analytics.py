@@ -0,0 +1,51 @@
+import copy
+
+from app.analytics import LibraryAnalytics
+
+
+def _track(artists, release_date='1999-01-01', energy=None):
+    track = {'artists': artists, 'release_date': release_date}
+    if energy is not None:
+        track['audio_features'] = {'energy': energy, 'tempo': 120.0}
+    return track
+
+
+def _rebuilt(tracks, artists):
+    analytics = LibraryAnalytics()
+    analytics.rebuild(tracks, artists)
+    return analytics.snapshot()
+
+
+def _assert_incremental_matches_rebuild(old_tracks, old_artists, new_tracks, new_artists):
+    analytics = LibraryAnalytics()
+    analytics.rebuild(old_tracks, old_artists)
+    analytics.apply_refresh(old_tracks, old_artists, new_tracks, new_artists)
+    assert analytics.snapshot() == _rebuilt(new_tracks, new_artists)
+
+
+OLD_ARTISTS = {'a1': {'name': 'One', 'genre': ['rock']}}
+OLD_TRACKS = {
+    't1': _track(['a1', 'a2'], energy=0.25),
+    't2': _track(['a2'], release_date='2011-05-01'),
+    't3': _track(['a1'], energy=0.5),
+}
+
+
+def test_artists_new_to_the_cache_are_applied_to_kept_tracks():
+    new_artists = dict(OLD_ARTISTS, a2={'name': 'Two', 'genre': ['jazz', 'rock']})
+    _assert_incremental_matches_rebuild(OLD_TRACKS, OLD_ARTISTS, OLD_TRACKS, new_artists)
+
+
+def test_artists_dropped_from_the_cache_are_retracted_from_kept_tracks():
+    old_artists = dict(OLD_ARTISTS, a2={'name': 'Two', 'genre': ['jazz']})
+    _assert_incremental_matches_rebuild(OLD_TRACKS, old_artists, OLD_TRACKS, OLD_ARTISTS)
+
+
+def test_kept_tracks_with_new_audio_features_or_release_dates_are_reapplied():
+    new_tracks = copy.deepcopy(OLD_TRACKS)
+    new_tracks['t1']['audio_features'] = {'energy': 0.875, 'tempo': 95.0}
+    new_tracks['t2']['audio_features'] = {'energy': 0.125, 'tempo': 140.0}
+    new_tracks['t3']['release_date'] = '1975-01-01'
+    new_tracks['t4'] = _track(['a1'], energy=0.5)
+    del new_tracks['t2']['audio_features']['tempo']
+    _assert_incremental_matches_rebuild(OLD_TRACKS, OLD_ARTISTS, new_tracks, OLD_ARTISTS)
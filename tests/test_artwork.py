@@ -0,0 +1,144 @@
+import io
+import os
+import socket
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app import artwork
+from app.artwork import ArtworkCache, artwork_response, snap_artwork_size
+from tools.fake_spotify_api import FakeLibrary, FakeSpotifyApi
+
+# Thumbnails are only resized with Pillow installed
+Image = pytest.importorskip('PIL.Image')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _settled_requests(api):
+    # The fake API counts a request once its response is written, give the count a moment to catch up
+    time.sleep(0.05)
+    return api.requests_served
+
+
+@pytest.fixture
+def fake_api():
+    api = FakeSpotifyApi(FakeLibrary(), latency_ms=100, port=_free_port())
+    api.start_in_thread()
+    return api
+
+
+@pytest.fixture
+def make_cache(tmp_path, fake_api):
+    caches = []
+
+    def make(max_bytes=artwork.ARTWORK_CACHE_MAX_BYTES, entities=('pl0', 'pl1', 'pl2', 'pl3')):
+        cache = ArtworkCache(str(tmp_path / f'artwork{len(caches)}'), max_bytes=max_bytes)
+        cache.register_sources({entity_id: f'{fake_api.library.image_base_url}{entity_id}' for entity_id in entities})
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_fetches_once_then_serves_from_cache(fake_api, make_cache):
+    cache = make_cache()
+    path, mimetype, digest = cache.get('pl0', 300)
+    assert _settled_requests(fake_api) == 1
+
+    assert cache.get('pl0', 300) == (path, mimetype, digest)
+    assert _settled_requests(fake_api) == 1
+    assert cache.get('unknown', 300) is None
+
+
+def test_sizes_snap_to_served_thumbnails(fake_api, make_cache):
+    assert [snap_artwork_size(size) for size in (1, 64, 65, 200, 300, 301, 5000)] == [64, 64, 160, 300, 300, 640, 640]
+
+    cache = make_cache()
+    path, _, _ = cache.get('pl0', 100)
+    with Image.open(path) as image:
+        assert image.size == (160, 160)
+    # Any size snapping to the same thumbnail is a cache hit
+    assert cache.get('pl0', 150)[0] == path
+    assert _settled_requests(fake_api) == 1
+    # The full size is served as fetched, nothing to shrink
+    path, _, _ = cache.get('pl0', 640)
+    with Image.open(path) as image:
+        assert image.size == (640, 640)
+    assert _settled_requests(fake_api) == 2
+
+
+def test_revalidation_by_etag_returns_not_modified(make_cache):
+    thumbnail = make_cache().get('pl0', 64)
+    app = Flask(__name__)
+
+    with app.test_request_context('/artwork/pl0?size=64'):
+        response = artwork_response(thumbnail)
+        response.direct_passthrough = False
+        assert response.status_code == 200
+        assert response.get_etag() == (thumbnail[2], False)
+        assert 'max-age' in response.headers['Cache-Control']
+        with Image.open(io.BytesIO(response.get_data())) as image:
+            assert image.size == (64, 64)
+
+    with app.test_request_context('/artwork/pl0?size=64', headers={'If-None-Match': f'"{thumbnail[2]}"'}):
+        assert artwork_response(thumbnail).status_code == 304
+
+    with app.test_request_context('/artwork/pl0?size=64', headers={'If-None-Match': '"stale"'}):
+        assert artwork_response(thumbnail).status_code == 200
+
+
+def test_least_recently_used_thumbnails_are_evicted_past_max_bytes(fake_api, make_cache, monkeypatch):
+    monkeypatch.setattr(artwork, 'ACCESS_TIME_RESOLUTION_SECONDS', 0)
+    probe = make_cache()
+    thumbnail_bytes = max(len(open(probe.get(entity_id, 160)[0], 'rb').read()) for entity_id in ('pl0', 'pl1', 'pl2'))
+
+    # Room for three thumbnails, not four
+    cache = make_cache(max_bytes=int(thumbnail_bytes * 3.5))
+    first, _, _ = cache.get('pl0', 160)
+    time.sleep(0.01)
+    second, _, _ = cache.get('pl1', 160)
+    time.sleep(0.01)
+    cache.get('pl2', 160)
+    time.sleep(0.01)
+    # Touching the first makes the second the least recently used
+    assert cache.get('pl0', 160)[0] == first
+    time.sleep(0.01)
+    cache.get('pl3', 160)
+
+    total_bytes = cache._conn.execute("SELECT SUM(size_bytes) FROM blobs").fetchone()[0]
+    assert total_bytes <= cache.max_bytes
+    assert not cache._lookup(cache.source_url('pl1'), 160)
+    assert not os.path.exists(second)
+    assert cache._lookup(cache.source_url('pl0'), 160)[0] == first
+
+    served = _settled_requests(fake_api)
+    cache.get('pl1', 160)
+    assert _settled_requests(fake_api) == served + 1
+
+
+def test_concurrent_requests_share_a_single_fetch(fake_api, make_cache):
+    cache = make_cache()
+    start = threading.Barrier(8)
+    results = []
+
+    def request_artwork():
+        start.wait()
+        results.append(cache.get('pl0', 300))
+
+    threads = [threading.Thread(target=request_artwork) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8 and len(set(results)) == 1
+    assert _settled_requests(fake_api) == 1
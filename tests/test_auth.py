@@ -0,0 +1,60 @@
+import json
+import threading
+import time
+
+from app.auth import MemoryFirstCacheHandler, TokenManager
+
+
+class FakeAuthManager:
+    def __init__(self, cache_handler):
+        self.cache_handler = cache_handler
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def refresh_access_token(self, refresh_token):
+        with self._lock:
+            self.refreshes += 1
+        token_info = {'access_token': f'access{self.refreshes}', 'refresh_token': refresh_token,
+                      'expires_at': int(time.time()) + 3600}
+        self.cache_handler.save_token_to_cache(token_info)
+        return token_info
+
+
+def _token_manager(tmp_path, expires_in):
+    token_path = tmp_path / 'token_info.json'
+    token_path.write_text(json.dumps({'access_token': 'access0', 'refresh_token': 'refresh',
+                                      'expires_at': int(time.time()) + expires_in}))
+    cache_handler = MemoryFirstCacheHandler(cache_path=str(token_path))
+    auth_manager = FakeAuthManager(cache_handler)
+    return TokenManager(auth_manager, cache_handler), auth_manager
+
+
+def test_superseded_timer_does_not_refresh_again(tmp_path):
+    token_manager, auth_manager = _token_manager(tmp_path, expires_in=3600)
+    token_manager.schedule_refresh()
+    superseded_generation = token_manager._timer_generation
+
+    # A refresh on demand reschedules the timer, the previous one firing late must not refresh again
+    token_manager.refresh(force=True)
+    token_manager._scheduled_refresh(superseded_generation)
+    assert auth_manager.refreshes == 1
+
+    token_manager._scheduled_refresh(token_manager._timer_generation)
+    assert auth_manager.refreshes == 2
+    token_manager.clear()
+
+
+def test_concurrent_refreshes_near_expiry_refresh_once(tmp_path):
+    token_manager, auth_manager = _token_manager(tmp_path, expires_in=30)
+    token_manager.schedule_refresh()
+
+    threads = [threading.Thread(target=token_manager.is_valid) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.2)
+
+    assert auth_manager.refreshes == 1
+    assert token_manager.is_valid()
+    token_manager.clear()
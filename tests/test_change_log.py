@@ -0,0 +1,43 @@
+from app import change_log as change_log_module
+from app.change_log import ADDED, REMOVED, UPDATED, ChangeLog, diff_entities
+
+
+def _net_changes(log, since, entity='tracks'):
+    changes = log.changes_since(since)['changes'][entity]
+    return {action: sorted(entity_ids) for action, entity_ids in changes.items()}
+
+
+def test_changes_since_folds_each_entity_into_its_net_change(tmp_path):
+    log = ChangeLog(str(tmp_path / 'change_log.db'))
+    log.record(1, {'tracks': [(ADDED, 'kept'), (ADDED, 'dropped'), (ADDED, 'edited'), (UPDATED, 'old'),
+                              (REMOVED, 'returning')]})
+    log.record(2, {'tracks': [(UPDATED, 'edited'), (REMOVED, 'dropped'), (UPDATED, 'old'), (ADDED, 'returning')]})
+    log.record(3, {'tracks': [(REMOVED, 'old')], 'playlists': [(UPDATED, 'p1')]})
+
+    # Added then removed is left out, added then updated stays added, updated then removed is removed,
+    # and removed then added again is an update of what the client holds
+    assert _net_changes(log, 0) == {ADDED: ['edited', 'kept'], REMOVED: ['old'], UPDATED: ['returning']}
+    assert _net_changes(log, 1) == {ADDED: ['returning'], REMOVED: ['dropped', 'old'], UPDATED: ['edited']}
+    assert _net_changes(log, 1, 'playlists') == {ADDED: [], REMOVED: [], UPDATED: ['p1']}
+    assert log.changes_since(3) == {
+        'version': 3, 'full_resync': False,
+        'changes': {entity: {ADDED: [], REMOVED: [], UPDATED: []} for entity in ('playlists', 'tracks', 'artists')}}
+
+
+def test_clients_outside_the_retained_generations_resync_in_full(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_log_module, 'RETAINED_GENERATIONS', 3)
+    log = ChangeLog(str(tmp_path / 'change_log.db'))
+    for generation in range(1, 6):
+        log.record(generation, {'tracks': [(UPDATED, f't{generation}')]})
+
+    assert log.oldest_generation == 3
+    assert log.changes_since(1) == {'version': 5, 'full_resync': True, 'changes': None}
+    assert log.changes_since(6)['full_resync']
+    assert _net_changes(log, 2) == {ADDED: [], REMOVED: [], UPDATED: ['t3', 't4', 't5']}
+
+
+def test_diff_entities_reports_added_removed_and_updated_ids():
+    old = {'a': {'name': 'A'}, 'b': {'name': 'B'}, 'c': {'name': 'C'}}
+    new = {'a': {'name': 'A'}, 'c': {'name': 'C2'}, 'd': {'name': 'D'}}
+
+    assert sorted(diff_entities(old, new)) == [(ADDED, 'd'), (REMOVED, 'b'), (UPDATED, 'c')]
@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.clustering import CLUSTER_FEATURES, LibraryClusters, mini_batch_kmeans
+
+
+def _clustered_points(num_points=20000, num_clusters=12, seed=1):
+    rng = np.random.default_rng(seed)
+    centres = rng.random((num_clusters, len(CLUSTER_FEATURES))).astype(np.float32)
+    noise = rng.normal(0, 0.08, (num_points, len(CLUSTER_FEATURES)))
+    return (centres[rng.integers(num_clusters, size=num_points)] + noise).astype(np.float32)
+
+
+def test_warm_start_from_previous_sizes_keeps_converged_centroids():
+    points = _clustered_points()
+    centroids, labels = mini_batch_kmeans(points, 12)
+    sizes = np.bincount(labels, minlength=12)
+
+    unseeded, _ = mini_batch_kmeans(points, 12, initial_centroids=centroids, iterations=1, batch_size=256, seed=5)
+    seeded, seeded_labels = mini_batch_kmeans(
+        points, 12, initial_centroids=centroids, initial_counts=sizes, iterations=1, batch_size=256, seed=5)
+
+    # Without the previous sizes the first small batch drags every centroid onto its own noisy mean
+    assert np.abs(unseeded - centroids).max() > 10 * np.abs(seeded - centroids).max()
+    assert np.abs(seeded - centroids).max() < 0.01
+    assert (seeded_labels == labels).mean() > 0.99
+
+
+def test_rebuild_warm_starts_from_the_previous_cluster_sizes():
+    points = _clustered_points(num_points=3000)
+    feature_ranges = np.array(list(CLUSTER_FEATURES.values()), dtype=np.float32)
+    values = feature_ranges[:, 0] + np.clip(points, 0, 1) * (feature_ranges[:, 1] - feature_ranges[:, 0])
+    tracks = {
+        f'tr{index}': {'artists': [f'ar{index % 40}'], 'audio_features': dict(zip(CLUSTER_FEATURES, map(float, row)))}
+        for index, row in enumerate(values)
+    }
+    artists = {f'ar{index}': {'name': f'Artist {index}', 'genre': [f'genre {index % 7}']} for index in range(40)}
+
+    clusters = LibraryClusters()
+    clusters.rebuild(tracks, artists)
+    labels = clusters.labels.copy()
+    assert clusters.cluster_sizes.sum() == len(tracks)
+
+    clusters.rebuild(tracks, artists)
+    assert (clusters.labels == labels).mean() > 0.99
@@ -0,0 +1,119 @@
+import pytest
+
+from app.crawl_checkpoint import CrawlCheckpoint, CrawlLockedError
+
+PAGE_SIZE = 100
+
+
+def _track(track_id):
+    return {'track': {
+        'id': track_id, 'name': f'Track {track_id}', 'artists': [{'id': f'artist-{track_id[-1]}'}],
+        'album': {'name': 'Album', 'images': [], 'release_date': '2020-01-01', 'release_date_precision': 'day'},
+        'duration_ms': 200000, 'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'}}}
+
+
+class FakeSpotify:
+    """Serves paged playlists, failing once on the pages listed in `fail_on`."""
+
+    def __init__(self, playlists):
+        self.playlists = playlists
+        self.snapshots = {playlist_id: 'snapshot-1' for playlist_id in playlists}
+        self.fail_on = set()
+        self.fetched_pages = []
+
+    def current_user_playlists(self, limit=50):
+        return {'items': [{'id': playlist_id, 'name': playlist_id, 'snapshot_id': self.snapshots[playlist_id]}
+                          for playlist_id in self.playlists]}
+
+    def _page(self, playlist_id, offset):
+        if (playlist_id, offset) in self.fail_on:
+            self.fail_on.discard((playlist_id, offset))
+            raise RuntimeError('Spotify is unavailable')
+        self.fetched_pages.append((playlist_id, offset))
+        track_ids = self.playlists[playlist_id]
+        next_offset = offset + PAGE_SIZE
+        return {'items': [_track(track_id) for track_id in track_ids[offset:next_offset]],
+                'next': f'{playlist_id}:{next_offset}' if next_offset < len(track_ids) else None}
+
+    def playlist_tracks(self, playlist_id, fields=None, limit=100):
+        return self._page(playlist_id, 0)
+
+    def next(self, result):
+        playlist_id, offset = result['next'].split(':')
+        return self._page(playlist_id, int(offset))
+
+    def artists(self, artist_ids):
+        return {'artists': [{'id': artist_id, 'name': artist_id, 'external_urls': {'spotify': ''}, 'popularity': 1,
+                             'genres': [], 'images': []} for artist_id in artist_ids]}
+
+
+def _crawl(utils, sp):
+    assert utils.crawl_checkpoint.acquire()
+    try:
+        return utils.fetch_user_playlists_with_tracks_from_spotify(sp)
+    finally:
+        utils.crawl_checkpoint.release()
+
+
+def test_failed_crawl_resumes_from_the_last_recorded_page(cache_utils):
+    sp = FakeSpotify({'p1': [f'a{index:03d}' for index in range(250)], 'p2': [f'b{index:03d}' for index in range(30)]})
+    sp.fail_on.add(('p1', 200))
+    with pytest.raises(RuntimeError):
+        _crawl(cache_utils, sp)
+    assert sp.fetched_pages == [('p1', 0), ('p1', 100)]
+
+    sp.fetched_pages.clear()
+    playlists, tracks, artists = _crawl(cache_utils, sp)
+
+    assert sp.fetched_pages == [('p1', 200), ('p2', 0)]
+    assert playlists['p1']['track_ids'] == sp.playlists['p1']
+    assert playlists['p2']['track_ids'] == sp.playlists['p2']
+    assert list(tracks) == sp.playlists['p1'] + sp.playlists['p2']
+    assert set(artists) == {f'artist-{digit}' for digit in '0123456789'}
+
+
+def test_resumed_crawl_refetches_playlists_whose_snapshot_changed(cache_utils):
+    sp = FakeSpotify({'p1': [f'a{index:03d}' for index in range(150)], 'p2': [f'b{index:03d}' for index in range(150)]})
+    sp.fail_on.add(('p2', 100))
+    with pytest.raises(RuntimeError):
+        _crawl(cache_utils, sp)
+
+    # p1 was recorded as complete, then edited on Spotify
+    sp.playlists['p1'] = sp.playlists['p1'][50:] + ['c000']
+    sp.snapshots['p1'] = 'snapshot-2'
+    sp.fetched_pages.clear()
+    playlists, tracks, _ = _crawl(cache_utils, sp)
+
+    assert sp.fetched_pages == [('p1', 0), ('p1', 100), ('p2', 100)]
+    assert playlists['p1']['track_ids'] == sp.playlists['p1']
+    assert playlists['p2']['track_ids'] == sp.playlists['p2']
+    # Tracks only the previous version of p1 held are left out
+    assert 'a000' not in tracks and 'c000' in tracks
+
+
+def test_only_one_process_crawls_into_the_checkpoint(tmp_path):
+    db_path = str(tmp_path / 'crawl_checkpoint.db')
+    first, second = CrawlCheckpoint(db_path), CrawlCheckpoint(db_path)
+
+    assert first.acquire()
+    assert not second.acquire()
+    with pytest.raises(CrawlLockedError):
+        second.record_tracks_page('p1', ['t1'], {'t1': {'name': 'Track'}}, None)
+
+    first.record_tracks_page('p1', ['t1'], {'t1': {'name': 'Track'}}, None)
+    first.release()
+    assert second.acquire()
+    with pytest.raises(CrawlLockedError):
+        first.clear()
+    assert first.playlist_track_ids('p1') == ['t1']
+
+
+def test_silent_owner_is_taken_over_after_the_lease(tmp_path):
+    db_path = str(tmp_path / 'crawl_checkpoint.db')
+    first = CrawlCheckpoint(db_path)
+    second = CrawlCheckpoint(db_path, lease_seconds=0)
+
+    assert first.acquire()
+    assert second.acquire()
+    with pytest.raises(CrawlLockedError):
+        first.start([])
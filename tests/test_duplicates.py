@@ -0,0 +1,67 @@
+from app.duplicates import find_duplicates, normalize_track_name
+
+
+def _track(name, artist_id, duration_ms, audio_features=None):
+    return {'name': name, 'artists': [artist_id], 'album': 'Album', 'duration_ms': duration_ms,
+            'audio_features': audio_features}
+
+
+def test_normalized_names_drop_release_variants():
+    assert normalize_track_name('Héroes (2017 Remaster)') == 'heroes'
+    assert normalize_track_name('Heroes - Single Version') == 'heroes'
+    assert normalize_track_name('Heroes [feat. Someone]') == 'heroes'
+    assert normalize_track_name('Heroes, Part II') == 'heroes part ii'
+    assert normalize_track_name(None) == ''
+
+
+def test_exact_duplicates_within_and_across_playlists():
+    tracks = {'t1': _track('One', 'a1', 200000), 't2': _track('Two', 'a1', 180000)}
+    playlists = {
+        'p1': {'name': 'First', 'track_ids': ['t1', 't2', 't1']},
+        'p2': {'name': 'Second', 'track_ids': ['t1']},
+    }
+
+    duplicates = find_duplicates(playlists, tracks)
+
+    assert duplicates['within_playlists'] == [
+        {'playlist_id': 'p1', 'playlist_name': 'First', 'track_id': 't1', 'track_name': 'One', 'occurrences': 2}]
+    assert duplicates['across_playlists'] == [{'track_id': 't1', 'track_name': 'One', 'playlist_ids': ['p1', 'p2']}]
+    assert duplicates['near_duplicates'] == []
+
+
+def test_near_duplicates_are_split_by_duration_and_artist():
+    tracks = {
+        'single': _track('Heroes - Single Version', 'bowie', 210000),
+        'album': _track('Heroes', 'bowie', 211500),
+        'remaster': _track('Heroes (2017 Remaster)', 'bowie', 213000),
+        # Same name, but a much longer recording
+        'live': _track('Heroes', 'bowie', 400000),
+        # Same name and length by another artist
+        'cover': _track('Heroes', 'wallflowers', 211000),
+    }
+    playlists = {'p1': {'name': 'First', 'track_ids': ['single', 'live']}, 'p2': {'name': 'Second', 'track_ids': ['album']}}
+
+    near_duplicates = find_duplicates(playlists, tracks)['near_duplicates']
+
+    assert len(near_duplicates) == 1
+    group = near_duplicates[0]['tracks']
+    assert [track['id'] for track in group] == ['single', 'album', 'remaster']
+    assert [track['playlist_ids'] for track in group] == [['p1'], ['p2'], []]
+
+
+def test_audio_feature_check_keeps_only_tracks_close_to_the_first():
+    features = {'danceability': 0.5, 'energy': 0.5, 'valence': 0.5, 'acousticness': 0.5, 'tempo': 120.0}
+    tracks = {
+        'studio': _track('Heroes', 'bowie', 210000, features),
+        'remaster': _track('Heroes (Remastered)', 'bowie', 210500, dict(features, energy=0.55, tempo=121.0)),
+        'acoustic': _track('Heroes - Mono', 'bowie', 211000, dict(features, acousticness=0.9)),
+        'unanalysed': _track('Heroes - Radio Edit', 'bowie', 211500),
+    }
+
+    def near_duplicate_ids(check_audio_features):
+        groups = find_duplicates({}, tracks, check_audio_features=check_audio_features)['near_duplicates']
+        return [[track['id'] for track in group['tracks']] for group in groups]
+
+    assert near_duplicate_ids(False) == [['studio', 'remaster', 'acoustic', 'unanalysed']]
+    # Tracks without features have nothing contradicting the match
+    assert near_duplicate_ids(True) == [['studio', 'remaster', 'unanalysed']]
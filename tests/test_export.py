@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app import export
+from app.export import EXPORT_COLUMNS, EXPORT_FORMATS, EXPORTED_AUDIO_FEATURES, stream_export
+
+PLAYLISTS = {'p1': {'name': 'Mix, vol. 1', 'track_ids': ['t0', 't2', 't0']}}
+ARTISTS = {
+    'a1': {'name': 'Artist "One"', 'popularity': 40, 'genre': ['pop', 'indie'], 'spotify_url': 'https://a1'},
+    'a2': {'name': 'Artist Two', 'popularity': 60, 'genre': [], 'spotify_url': 'https://a2'},
+}
+
+
+def _tracks(count):
+    return {
+        f't{index}': {
+            'name': f'Track {index}', 'artists': ['a1', 'a2'] if index % 2 else ['a1'], 'album': 'Album',
+            'duration_ms': 200000 + index, 'release_date': '2020-01-01', 'spotify_url': f'https://t{index}',
+            'audio_features': {feature: index / 10 for feature in EXPORTED_AUDIO_FEATURES} if index % 3 else None,
+        }
+        for index in range(count)
+    }
+
+
+def _export(entity, export_format, tracks):
+    return list(stream_export(entity, export_format, PLAYLISTS, tracks, ARTISTS))
+
+
+def test_csv_export_streams_one_chunk_per_batch(monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_BATCH_SIZE', 4)
+    chunks = _export('tracks', 'csv', _tracks(10))
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0] == EXPORT_COLUMNS['tracks']
+    assert [row[0] for row in rows[1:]] == [f't{index}' for index in range(10)]
+    assert rows[2][:4] == ['t1', 'Track 1', 'a1;a2', 'Artist "One";Artist Two']
+    # Tracks without audio features export empty feature columns
+    assert rows[1][len(EXPORT_COLUMNS['tracks']) - len(EXPORTED_AUDIO_FEATURES):] == [''] * len(EXPORTED_AUDIO_FEATURES)
+
+
+def test_ndjson_export_of_playlist_tracks_keeps_positions():
+    lines = b''.join(_export('playlist_tracks', 'ndjson', _tracks(3))).decode('utf-8').splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {'playlist_id': 'p1', 'playlist_name': 'Mix, vol. 1', 'position': position, 'track_id': track_id,
+         'track_name': f'Track {track_id[1:]}', 'artist_names': artist_names}
+        for position, (track_id, artist_names) in enumerate(
+            (('t0', 'Artist "One"'), ('t2', 'Artist "One"'), ('t0', 'Artist "One"')))]
+
+
+def test_parquet_export_writes_one_row_group_per_batch(monkeypatch):
+    pq = pytest.importorskip('pyarrow.parquet')
+    monkeypatch.setattr(export, 'EXPORT_BATCH_SIZE', 4)
+
+    chunks = _export('tracks', 'parquet', _tracks(10))
+
+    # One chunk per row group, then the footer
+    assert len(chunks) == 4
+    parquet_file = pq.ParquetFile(io.BytesIO(b''.join(chunks)))
+    assert parquet_file.metadata.num_row_groups == 3
+    assert [parquet_file.metadata.row_group(index).num_rows for index in range(3)] == [4, 4, 2]
+    table = parquet_file.read()
+    assert table.column_names == EXPORT_COLUMNS['tracks']
+    assert str(table.schema.field('duration_ms').type) == 'int64'
+    assert str(table.schema.field('energy').type) == 'double'
+    assert table.column('track_id').to_pylist() == [f't{index}' for index in range(10)]
+    assert table.column('energy').to_pylist()[:3] == [None, 0.1, 0.2]
+
+
+def test_parquet_export_of_an_empty_entity_is_a_valid_file():
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    table = pq.read_table(io.BytesIO(b''.join(_export('tracks', 'parquet', {}))))
+
+    assert table.num_rows == 0
+    assert table.column_names == EXPORT_COLUMNS['tracks']
+
+
+def test_unsupported_entities_and_formats_are_rejected():
+    assert set(EXPORT_FORMATS) == {'csv', 'ndjson', 'parquet'}
+    with pytest.raises(ValueError):
+        stream_export('albums', 'csv', PLAYLISTS, {}, ARTISTS)
+    with pytest.raises(ValueError):
+        stream_export('tracks', 'xlsx', PLAYLISTS, {}, ARTISTS)
@@ -0,0 +1,41 @@
+import sqlite3
+
+from app import feature_store
+from app.feature_store import AUDIO_FEATURE_FIELDS, AudioFeaturesStore
+
+
+def _features(value):
+    return {field: value for field in AUDIO_FEATURE_FIELDS}
+
+
+def test_missing_features_are_retried_after_the_retry_delay(tmp_path, monkeypatch):
+    store = AudioFeaturesStore(str(tmp_path / 'features.db'), missing_features_retry_seconds=3600)
+    now = 1_000_000.0
+    monkeypatch.setattr(feature_store.time, 'time', lambda: now)
+    store.put_many({'found': _features(0.5), 'missing': None})
+
+    assert store.get_many(['found', 'missing', 'unknown']) == {'found': _features(0.5), 'missing': None}
+
+    now += 3601
+    # The track without features is due for another lookup, the one with features never is
+    assert store.get_many(['found', 'missing']) == {'found': _features(0.5)}
+
+    store.put_many({'missing': _features(0.25), 'found': None})
+    assert store.get_many(['found', 'missing']) == {'found': _features(0.5), 'missing': _features(0.25)}
+
+
+def test_stores_without_lookup_times_are_migrated(tmp_path):
+    db_path = str(tmp_path / 'features.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        f"CREATE TABLE audio_features (track_id TEXT PRIMARY KEY, has_features INTEGER NOT NULL, "
+        f"{', '.join(AUDIO_FEATURE_FIELDS)})")
+    conn.execute(f"INSERT INTO audio_features VALUES ('found', 1, {', '.join('0.5' for _ in AUDIO_FEATURE_FIELDS)})")
+    conn.execute(f"INSERT INTO audio_features VALUES ('missing', 0, {', '.join('NULL' for _ in AUDIO_FEATURE_FIELDS)})")
+    conn.commit()
+    conn.close()
+
+    store = AudioFeaturesStore(db_path)
+    assert store.get_many(['found', 'missing']) == {'found': _features(0.5)}
+    store.put_many({'missing': None})
+    assert store.get_many(['missing']) == {'missing': None}
@@ -0,0 +1,67 @@
+from flask import Flask
+
+from app.http_cache import ResponseCache, cached_json_response, response_cache
+from app.shared_cache import SharedCacheReader, SharedCacheWriter
+
+
+def test_shared_cache_workers_memoize_local_resources_themselves(tmp_path):
+    SharedCacheWriter(str(tmp_path)).publish({'playlists': [1, 2]})
+    cache = ResponseCache()
+    cache.shared_reader = SharedCacheReader(str(tmp_path))
+
+    assert cache.get_or_build('playlists', 1, lambda: [3])[0] == b'[1,2]'
+    assert cache.get_or_build('bootstrap', 1, lambda: {'user': 'a'}) is None
+    body, etag = cache.get_or_build('bootstrap', 1, lambda: {'user': 'a'}, local=True)
+    assert cache.get_or_build('bootstrap', 1, lambda: {'user': 'b'}, local=True) == (body, etag)
+    assert cache.get_or_build('bootstrap', 2, lambda: {'user': 'b'}, local=True)[1] != etag
+
+
+def test_cached_json_response_revalidates_by_etag():
+    app = Flask(__name__)
+    response_cache.invalidate()
+
+    with app.test_request_context('/bootstrap'):
+        response = cached_json_response('bootstrap', 1, lambda: {'user': 'a'}, local=True)
+        assert response.status_code == 200
+        etag, _ = response.get_etag()
+
+    with app.test_request_context('/bootstrap', headers={'If-None-Match': f'"{etag}"'}):
+        assert cached_json_response('bootstrap', 1, lambda: {'user': 'a'}, local=True).status_code == 304
+
+
+def test_bodies_are_bounded_by_total_size():
+    cache = ResponseCache(max_body_bytes=2500)
+    for index in range(4):
+        cache.get_or_build(f'tracks:{index}', 1, lambda: 'x' * 1000)
+
+    # Only the two most recent bodies fit, the older ones are rebuilt
+    rebuilt = []
+    for index in range(4):
+        cache.get_or_build(f'tracks:{index}', 1, lambda: rebuilt.append(index) or 'x' * 1000)
+    assert rebuilt == [0, 1, 2, 3]
+    assert cache.get_or_build('tracks:3', 1, lambda: rebuilt.append(3) or 'x' * 1000)
+    assert rebuilt == [0, 1, 2, 3]
+
+    # Rebuilding an entry for a new version replaces its size rather than adding to it
+    cache.invalidate()
+    cache.get_or_build('tracks:0', 1, lambda: 'x' * 1000)
+    cache.get_or_build('tracks:1', 1, lambda: 'x' * 1000)
+    cache.get_or_build('tracks:1', 2, lambda: 'x' * 1000)
+    cache.get_or_build('tracks:0', 1, lambda: rebuilt.append(0) or 'x' * 1000)
+    assert rebuilt == [0, 1, 2, 3]
+
+
+def test_invalidate_drops_the_compressed_variants():
+    cache = ResponseCache()
+    body, etag = cache.get_or_build('tracks:0', 1, lambda: 'x' * 1000)
+    other_body, other_etag = cache.get_or_build('tracks:1', 1, lambda: 'y' * 1000)
+    cache.get_compressed(body, etag, 'gzip')
+    other_compressed = cache.get_compressed(other_body, other_etag, 'gzip')
+
+    cache.invalidate('tracks:0')
+    assert list(cache._compressed) == [(other_etag, 'gzip')]
+    assert cache._compressed_bytes == len(other_compressed)
+
+    cache.invalidate()
+    assert not cache._compressed
+    assert cache._compressed_bytes == 0
@@ -0,0 +1,117 @@
+import sqlite3
+import time
+
+import pytest
+
+from app import job_queue as job_queue_module
+from app.job_queue import (JobQueue, REFRESH, HYDRATE_ARTISTS, AUDIO_FEATURES, PRIORITY_INTERACTIVE,
+                           PRIORITY_BACKGROUND, QUEUED, RUNNING, DONE, FAILED, MAX_ATTEMPTS)
+from job_worker_stubs import stub_worker_pool
+
+
+@pytest.fixture
+def queue(tmp_path):
+    job_queue = JobQueue(str(tmp_path / 'jobs.db'))
+    yield job_queue
+    job_queue.close()
+
+
+def test_enqueue_merges_into_the_queued_job(queue):
+    job_id, created = queue.enqueue('u1', REFRESH, {'force': False})
+    merged_id, merged = queue.enqueue('u1', REFRESH, {'force': True}, priority=PRIORITY_INTERACTIVE)
+
+    assert created and not merged and merged_id == job_id
+    job = queue.get(job_id)
+    assert job['payload'] == {'force': True}
+    assert job['priority'] == PRIORITY_INTERACTIVE
+    # Another kind or user is a separate job
+    assert queue.enqueue('u1', AUDIO_FEATURES)[1]
+    assert queue.enqueue('u2', REFRESH)[1]
+
+
+def test_claim_order_and_one_job_per_user(queue):
+    background_id, _ = queue.enqueue('u1', HYDRATE_ARTISTS, priority=PRIORITY_BACKGROUND)
+    interactive_id, _ = queue.enqueue('u1', REFRESH, priority=PRIORITY_INTERACTIVE)
+    other_user_id, _ = queue.enqueue('u2', REFRESH, priority=PRIORITY_BACKGROUND)
+
+    assert queue.claim('w1')['id'] == interactive_id
+    # u1 already has a running job, so its other job waits
+    assert queue.claim('w2')['id'] == other_user_id
+    assert queue.claim('w3') is None
+
+    queue.complete(interactive_id, 'w1')
+    assert queue.claim('w3')['id'] == background_id
+
+
+def test_failed_jobs_retry_then_fail(queue, monkeypatch):
+    monkeypatch.setattr(job_queue_module, 'RETRY_BACKOFF_SECONDS', 0)
+    job_id, _ = queue.enqueue('u1', REFRESH)
+    states = []
+    for _ in range(MAX_ATTEMPTS):
+        job = queue.claim('w1')
+        states.append(queue.fail(job['id'], 'w1', RuntimeError('boom')))
+    assert states == [QUEUED] * (MAX_ATTEMPTS - 1) + [FAILED]
+    assert queue.get(job_id)['error'] == 'boom'
+
+
+def test_expired_leases_are_reclaimed(queue):
+    job_id, _ = queue.enqueue('u1', REFRESH)
+    queue.claim('w1', lease_seconds=-1)
+
+    assert queue.reclaim_expired() == 1
+    job = queue.get(job_id)
+    assert job['state'] == QUEUED and job['error'] == 'Worker lost'
+
+
+def wait_for(predicate, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return
+        time.sleep(0.1)
+    raise AssertionError('Timed out waiting for the workers.')
+
+
+def test_spawned_workers(tmp_path, monkeypatch):
+    # Reclaimed jobs of crashed workers are queued again by the supervisor, in this process
+    monkeypatch.setattr(job_queue_module, 'RETRY_BACKOFF_SECONDS', 0)
+    db_path = str(tmp_path / 'jobs.db')
+    log_path = str(tmp_path / 'runs.db')
+    with sqlite3.connect(log_path) as log:
+        log.execute("CREATE TABLE runs (user_id TEXT, kind TEXT, tag TEXT, pid INTEGER, started_at REAL, finished_at REAL)")
+
+    queue = JobQueue(db_path)
+    slow_id, _ = queue.enqueue('u1', REFRESH, {'tag': 'slow', 'sleep': 0.5, 'followups': [
+        [AUDIO_FEATURES, {'tag': 'followup'}, PRIORITY_BACKGROUND]]}, priority=PRIORITY_INTERACTIVE)
+    same_user_id, _ = queue.enqueue('u1', HYDRATE_ARTISTS, {'tag': 'same-user'})
+    crash_id, _ = queue.enqueue('u2', REFRESH, {'tag': 'crash', 'crash': True})
+    fail_id, _ = queue.enqueue('u3', REFRESH, {'tag': 'fail', 'fail': True})
+
+    pool = stub_worker_pool(db_path, log_path, num_workers=3)
+    pool.start()
+    try:
+        def finished():
+            pool.supervise(queue)
+            jobs = [queue.get(job_id) for job_id in (slow_id, same_user_id, crash_id, fail_id)]
+            followups = [job for job in queue.stats()['recent_jobs'] if job['kind'] == AUDIO_FEATURES]
+            return (all(job['state'] in (DONE, FAILED) for job in jobs)
+                    and followups and all(job['state'] == DONE for job in followups))
+        wait_for(finished)
+    finally:
+        pool.stop()
+
+    assert queue.get(slow_id)['state'] == DONE
+    assert queue.get(same_user_id)['state'] == DONE
+    crashed = queue.get(crash_id)
+    assert crashed['state'] == FAILED and crashed['error'] == 'Worker lost' and crashed['attempts'] == MAX_ATTEMPTS
+    failed = queue.get(fail_id)
+    assert failed['state'] == FAILED and failed['error'] == 'stub failure' and failed['attempts'] == MAX_ATTEMPTS
+
+    with sqlite3.connect(log_path) as log:
+        runs = {tag: (started_at, finished_at) for tag, started_at, finished_at in log.execute(
+            "SELECT tag, started_at, finished_at FROM runs WHERE user_id = 'u1'")}
+    # Jobs of one user never overlap, and the follow-up ran after the job that queued it
+    assert runs['same-user'][0] >= runs['slow'][1] or runs['slow'][0] >= runs['same-user'][1]
+    assert runs['followup'][0] >= runs['slow'][1]
+    assert not any(job['state'] == RUNNING for job in queue.stats()['recent_jobs'])
+    queue.close()
@@ -0,0 +1,22 @@
+from app.library_store import LibraryStore
+
+
+def test_genres_follow_playlist_order_past_100_artists_per_track(tmp_path):
+    store = LibraryStore(str(tmp_path / 'library.db'))
+    crowded_artist_ids = [f'artist{index}' for index in range(102)]
+    artists_details = {artist_id: {'name': artist_id, 'genre': []} for artist_id in crowded_artist_ids}
+    artists_details['artist101']['genre'] = ['filler', 'late']
+    artists_details['solo'] = {'name': 'solo', 'genre': ['early']}
+    tracks_details = {
+        'crowded': {'name': 'Crowded', 'artists': crowded_artist_ids},
+        'single': {'name': 'Single', 'artists': ['solo']},
+    }
+    playlists_details = {'playlist': {'name': 'Playlist', 'track_ids': ['crowded', 'single']}}
+    store.load(playlists_details, tracks_details, artists_details, generation=1)
+
+    metrics = store.playlist('playlist')['metrics']
+
+    # The genres of the first track's 102nd artist come before those of the second track
+    assert metrics['Genre Distribution'] == ['filler', 'late', 'early']
+    assert metrics['Artist Diversity'] == 103
+    assert metrics['Most Featured Artist(s)'] == [f'artist{index} (1)' for index in range(5)]
@@ -0,0 +1,176 @@
+import json
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from app import listening_history
+from app.listening_history import (
+    DRIFT_FEATURES, MIN_MS_PLAYED, SECONDS_PER_DAY, ListeningHistoryStore, plays_from_recently_played,
+    plays_from_streaming_history)
+
+ARTISTS = [f'Artist {index}' for index in range(12)]
+TRACK_IDS = [f'track{index:03d}' for index in range(200)]
+
+
+def _features_for(track_id):
+    # Multiples of 1/8 sum exactly in floating point, so the averages do not depend on summation order
+    seed = int(track_id[5:])
+    return {feature: (seed + offset) % 9 / 8 for offset, feature in enumerate(DRIFT_FEATURES)}
+
+
+def _features_lookup(track_ids):
+    return {track_id: _features_for(track_id) for track_id in track_ids if int(track_id[5:]) % 5}
+
+
+def _synthetic_export(seed=7, years=3, plays_per_day=6):
+    """Returns extended streaming history records spanning several years, skips and podcasts included."""
+    rng = random.Random(seed)
+    start = datetime(2021, 3, 1, tzinfo=timezone.utc)
+    records = []
+    for day in range(365 * years):
+        for _ in range(rng.randint(0, plays_per_day)):
+            played_at = start + timedelta(days=day, seconds=rng.randrange(SECONDS_PER_DAY))
+            track_index = rng.randrange(len(TRACK_IDS))
+            is_episode = rng.random() < 0.03
+            records.append({
+                'ts': played_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'ms_played': rng.choice([rng.randrange(MIN_MS_PLAYED), rng.randrange(MIN_MS_PLAYED, 360000)]),
+                'master_metadata_track_name': None if is_episode else f'Track {track_index}',
+                'master_metadata_album_artist_name': None if is_episode else ARTISTS[track_index % len(ARTISTS)],
+                'spotify_track_uri': None if is_episode else f'spotify:track:{TRACK_IDS[track_index]}',
+            })
+    return records
+
+
+def _recompute_rollups(plays, period, top_artists_limit=5):
+    """Rollups computed from scratch over the deduplicated plays, the reference for the incremental ones."""
+    unique_plays = {}
+    for play in plays:
+        unique_plays.setdefault((play['played_at'] // 60, play['artist_name'], play['track_name']), play)
+
+    totals = defaultdict(lambda: [0, 0])
+    artists = defaultdict(lambda: defaultdict(int))
+    features = defaultdict(lambda: defaultdict(float))
+    for play in unique_plays.values():
+        if play['ms_played'] is not None and play['ms_played'] < MIN_MS_PLAYED:
+            continue
+        day = play['played_at'] // SECONDS_PER_DAY
+        bucket = day if period == 'day' else (day + 3) // 7 * 7 - 3
+        totals[bucket][0] += play['ms_played'] or 0
+        totals[bucket][1] += 1
+        artists[bucket][play['artist_name']] += play['ms_played'] or 0
+        track_features = _features_lookup([play['track_id']]).get(play['track_id'])
+        if track_features:
+            features[bucket]['count'] += 1
+            for feature in DRIFT_FEATURES:
+                features[bucket][feature] += track_features[feature]
+
+    rollups = []
+    for bucket in sorted(totals):
+        ms_played, count = totals[bucket]
+        ranked = sorted(artists[bucket].items(), key=lambda item: (-item[1], item[0]))[:top_artists_limit]
+        bucket_features = features.get(bucket)
+        rollups.append({
+            'period_start': datetime.fromtimestamp(bucket * SECONDS_PER_DAY, tz=timezone.utc).date().isoformat(),
+            'minutes_listened': round(ms_played / 60000, 1),
+            'plays': count,
+            'top_artists': [{'name': name, 'minutes_listened': round(ms / 60000, 1)} for name, ms in ranked],
+            'audio_features': {
+                feature: round(bucket_features[feature] / bucket_features['count'], 4) for feature in DRIFT_FEATURES
+            } if bucket_features else None,
+        })
+    return rollups
+
+
+def test_incremental_rollups_match_full_recompute(tmp_path, monkeypatch):
+    monkeypatch.setattr(listening_history, 'INSERT_BATCH_SIZE', 97)
+    records = _synthetic_export()
+    # Overlapping export files, the overlap must not be counted twice
+    export_dir = tmp_path / 'export'
+    export_dir.mkdir()
+    third = len(records) // 3
+    for index, part in enumerate((records[:third + 200], records[third:2 * third + 50], records[2 * third - 10:])):
+        (export_dir / f'Streaming_History_Audio_{index}.json').write_text(json.dumps(part))
+
+    recently_played = [
+        {'played_at': record['ts'],
+         'track': {'id': record['spotify_track_uri'].rsplit(':', 1)[-1], 'name': record['master_metadata_track_name'],
+                   'duration_ms': 240000, 'artists': [{'name': record['master_metadata_album_artist_name']}]}}
+        for record in records[-300:] if record['spotify_track_uri']
+    ]
+    # Recently played also reports plays the export does not hold yet
+    recently_played_new = [
+        dict(item, played_at=(datetime(2024, 6, 1, tzinfo=timezone.utc) + timedelta(hours=offset)).strftime(
+            '%Y-%m-%dT%H:%M:%S.000Z'))
+        for offset, item in enumerate(recently_played[:40])
+    ]
+
+    store = ListeningHistoryStore(str(tmp_path / 'history.db'), audio_features_lookup=_features_lookup)
+    store.add_plays(plays_from_streaming_history(str(export_dir)))
+    store.add_plays(plays_from_recently_played(recently_played + recently_played_new))
+    # Ingesting the same data again adds nothing
+    assert store.add_plays(plays_from_streaming_history(str(export_dir)))['added'] == 0
+
+    all_plays = (list(plays_from_streaming_history(str(export_dir)))
+                 + list(plays_from_recently_played(recently_played + recently_played_new)))
+    years = {play['played_at'] // (365 * SECONDS_PER_DAY) for play in all_plays}
+    assert len(years) >= 3
+
+    for period in ('day', 'week'):
+        assert store.rollups(period=period) == _recompute_rollups(all_plays, period)
+
+
+def test_recently_played_counts_plays_without_minutes(tmp_path):
+    store = ListeningHistoryStore(str(tmp_path / 'history.db'))
+    store.add_plays(plays_from_recently_played([
+        {'played_at': '2024-06-01T10:00:00.000Z',
+         'track': {'id': 'track001', 'name': 'Track 1', 'duration_ms': 240000, 'artists': [{'name': 'Artist 1'}]}},
+    ]))
+
+    rollup, = store.rollups()
+    assert rollup['plays'] == 1
+    assert rollup['minutes_listened'] == 0
+
+
+def test_plays_reported_by_every_source_are_counted_once(tmp_path):
+    export_dir = tmp_path / 'export'
+    export_dir.mkdir()
+    (export_dir / 'StreamingHistory0.json').write_text(json.dumps([
+        {'endTime': '2024-06-01 10:03', 'artistName': 'Artist 1', 'trackName': 'Track 1', 'msPlayed': 240000},
+        {'endTime': '2024-06-01 10:07', 'artistName': 'Artist 2', 'trackName': 'Track 2', 'msPlayed': 180000},
+    ]))
+    (export_dir / 'Streaming_History_Audio_0.json').write_text(json.dumps([
+        {'ts': '2024-06-01T10:03:41Z', 'ms_played': 240000, 'spotify_track_uri': 'spotify:track:track001',
+         'master_metadata_track_name': 'Track 1', 'master_metadata_album_artist_name': 'Artist 1'},
+    ]))
+
+    store = ListeningHistoryStore(str(tmp_path / 'history.db'))
+    assert store.add_plays(plays_from_streaming_history(str(export_dir)))['added'] == 2
+    added = store.add_plays(plays_from_recently_played([
+        {'played_at': '2024-06-01T10:07:12.345Z',
+         'track': {'id': 'track002', 'name': 'Track 2', 'duration_ms': 180000, 'artists': [{'name': 'artist 2'}]}},
+        {'played_at': '2024-06-01T10:12:00.000Z',
+         'track': {'id': 'track003', 'name': 'Track 3', 'duration_ms': 200000, 'artists': [{'name': 'Artist 3'}]}},
+    ]))['added']
+
+    assert added == 1
+    rollup, = store.rollups()
+    assert rollup['plays'] == 3
+    assert rollup['minutes_listened'] == 7
+
+
+def test_top_tracks_snapshots_are_kept_per_day(tmp_path):
+    store = ListeningHistoryStore(str(tmp_path / 'history.db'))
+    first_day = datetime(2024, 6, 1, 8, tzinfo=timezone.utc).timestamp()
+    store.record_top_tracks('short_term', ['track001', 'track002'], first_day)
+    # A later sync the same day replaces that day's snapshot
+    store.record_top_tracks('short_term', ['track002', 'track001'], first_day + 3600)
+    store.record_top_tracks('short_term', ['track003'], first_day + SECONDS_PER_DAY)
+    store.record_top_tracks('long_term', ['track004'], first_day)
+
+    assert store.top_tracks('short_term') == [
+        {'snapshot_date': '2024-06-01', 'track_ids': ['track002', 'track001']},
+        {'snapshot_date': '2024-06-02', 'track_ids': ['track003']},
+    ]
+    assert store.top_tracks('short_term', start=first_day + SECONDS_PER_DAY) == [
+        {'snapshot_date': '2024-06-02', 'track_ids': ['track003']}]
@@ -0,0 +1,37 @@
+import itertools
+import socket
+
+from tools.fake_spotify_api import FakeLibrary, FakeSpotifyApi
+from tools.load_replay import find_saturation, find_saturation_rate, run_step
+
+
+def _step(throughput_rps, p99_ms, concurrency=16, target_rate=None):
+    return {'throughput_rps': throughput_rps, 'p99_ms': p99_ms, 'concurrency': concurrency, 'target_rate': target_rate}
+
+
+def test_closed_loop_saturates_when_concurrency_stops_adding_throughput():
+    steps = [_step(50, 20, 1), _step(190, 25, 4), _step(195, 90, 16), _step(201, 400, 64)]
+    assert find_saturation(steps, slo_ms=None) == 4
+    assert find_saturation(steps[:2], slo_ms=None) is None
+
+
+def test_open_loop_saturates_at_the_first_rate_not_sustained():
+    # Throughput tracks the target rate until the app falls behind, whatever the concurrency
+    steps = [_step(49.8, 30, target_rate=50), _step(99.5, 45, target_rate=100), _step(150, 2500, target_rate=200)]
+    assert find_saturation_rate(steps, slo_ms=None) == 200
+    # The rate was sustained, but with a p99 over the SLO
+    assert find_saturation_rate(steps[:2], slo_ms=40) == 100
+    assert find_saturation_rate(steps[:2], slo_ms=None) is None
+
+
+def test_open_loop_sweep_detects_saturation_against_a_slow_upstream():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    api = FakeSpotifyApi(FakeLibrary(), latency_ms=100, port=port)
+    target = api.start_in_thread().rstrip('/')
+
+    # 4 connections at 100 ms each sustain about 40 requests per second
+    steps = [run_step(target, itertools.repeat('/me'), 4, 1.5, rate, None) for rate in (10, 120)]
+    assert [step['error_rate'] for step in steps] == [0, 0]
+    assert find_saturation_rate(steps, slo_ms=None) == 120
@@ -0,0 +1,27 @@
+import pytest
+
+from app.playlist_generator import PlaylistGenerator
+
+
+@pytest.mark.parametrize('criteria', [
+    {'count': '10'},
+    {'count': -1},
+    {'count': True},
+    {'target_duration_ms': 1.5},
+    {'count': 10, 'max_tracks_per_artist': 'two'},
+    {'count': 10, 'targets': [0.2, 0.8]},
+    {'count': 10, 'targets': {'energy': 0.5}},
+    {'count': 10, 'targets': {'energy': [0.5]}},
+    {'count': 10, 'targets': {'energy': [0.2, 0.5, 0.8]}},
+    {'count': 10, 'targets': {'energy': ['low', 'high']}},
+    {'count': 10, 'targets': {'loudness': [0, 1]}},
+    {},
+])
+def test_generate_rejects_malformed_criteria(criteria):
+    with pytest.raises(ValueError):
+        PlaylistGenerator().generate(**criteria)
+
+
+def test_generate_accepts_well_formed_criteria():
+    generated = PlaylistGenerator().generate(targets={'energy': [0.2, 0.8], 'tempo': (90, 130)}, count=10)
+    assert generated == {'track_ids': [], 'duration_ms': 0, 'num_candidates': 0}
@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from app.playlist_history import PlaylistHistoryStore
+
+
+def playlist(track_ids, **metrics):
+    return {'track_ids': track_ids, 'metrics': metrics}
+
+
+def test_instances_sharing_a_file_see_each_others_records(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    a = PlaylistHistoryStore(db_path)
+    b = PlaylistHistoryStore(db_path)
+
+    a.record(100, {'p1': playlist(['t1', 't2'], **{'Track Count': 2})})
+    assert b.playlist_at('p1')['track_ids'] == ['t1', 't2']
+    assert b.metric_trend('p1') == [{'recorded_at': 100, 'Track Count': 2.0}]
+
+    # b assigns keys and appends deltas on top of what a recorded
+    b.record(200, {'p1': playlist(['t2', 't3'], **{'Track Count': 2, 'Popularity': 50})})
+    assert a.playlist_at('p1')['track_ids'] == ['t2', 't3']
+    a.record(300, {'p1': playlist(['t2', 't3', 't4'], **{'Track Count': 3, 'Popularity': 50})})
+
+    for store in (a, b):
+        assert store.playlist_at('p1')['track_ids'] == ['t2', 't3', 't4']
+        assert store.playlist_at('p1', 250)['track_ids'] == ['t2', 't3']
+        assert [point['Track Count'] for point in store.metric_trend('p1', ['Track Count'])] == [2.0, 3.0]
+
+
+def test_concurrent_baselines_record_once(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    library = {'p1': playlist(['t1']), 'p2': playlist(['t2', 't1'])}
+    stores = [PlaylistHistoryStore(db_path) for _ in range(3)]
+
+    assert [store.record(100, library) for store in stores] == [2, 0, 0]
+
+
+def test_failed_record_does_not_leak_keys(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    a = PlaylistHistoryStore(db_path)
+    b = PlaylistHistoryStore(db_path)
+
+    too_many_metrics = {f'metric {index}': index for index in range(300)}
+    with pytest.raises(ValueError):
+        a.record(100, {'p1': playlist(['t1'], **too_many_metrics)})
+    # Keys a resolved in the rolled back transaction must not shadow the ones b assigns
+    b.record(100, {'p2': playlist(['t9'])})
+    a.record(200, {'p1': playlist(['t1'])}, complete=False)
+    assert a.playlist_at('p2')['track_ids'] == ['t9']
+    assert b.playlist_at('p1')['track_ids'] == ['t1']
+
+
+def test_migrates_track_keys_keyed_by_track_id(tmp_path):
+    db_path = str(tmp_path / 'history.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE track_keys (track_id TEXT PRIMARY KEY, key INTEGER NOT NULL) WITHOUT ROWID")
+    conn.execute("INSERT INTO track_keys VALUES ('t1', 1)")
+    conn.commit()
+    conn.close()
+
+    store = PlaylistHistoryStore(db_path)
+    store.record(100, {'p1': playlist(['t2', 't1'])})
+    assert store.playlist_at('p1')['track_ids'] == ['t2', 't1']
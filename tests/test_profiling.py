@@ -0,0 +1,44 @@
+import os
+
+from flask import Flask
+
+from app import profiling
+from app.profiling import RequestProfiler
+
+
+def _profiled_app(tmp_path, **kwargs):
+    app = Flask(__name__)
+
+    @app.route('/work')
+    def work():
+        return {'total': sum(range(1000))}
+
+    profiler = RequestProfiler(str(tmp_path / 'profiles'), **kwargs)
+    profiler.register(app)
+    return app, profiler
+
+
+def test_admin_token_header_profiles_a_request(tmp_path):
+    app, profiler = _profiled_app(tmp_path, admin_token='secret')
+    client = app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/work').headers
+    assert 'X-Profile-Id' not in client.get('/work', headers={'X-Admin-Token': 'wrong'}).headers
+    response = client.get('/work', headers={'X-Admin-Token': 'secret'})
+
+    profile_id = response.headers['X-Profile-Id']
+    assert [profile['id'] for profile in profiler.recent_profiles] == [profile_id]
+    assert profiler.hot_spots()
+
+
+def test_evicted_profiles_have_their_files_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'RECENT_PROFILES_LIMIT', 3)
+    app, profiler = _profiled_app(tmp_path, sample_rate=1.0)
+    client = app.test_client()
+
+    profile_ids = [client.get('/work').headers['X-Profile-Id'] for _ in range(7)]
+
+    assert [profile['id'] for profile in profiler.recent_profiles] == profile_ids[-3:]
+    assert sorted(os.listdir(tmp_path / 'profiles')) == sorted(
+        f'{profile_id}{suffix}' for profile_id in profile_ids[-3:] for suffix in ('.prof', '.allocations.json'))
+    assert profiler.hot_spots()
@@ -0,0 +1,73 @@
+from app.change_log import diff_entities
+from app.reverse_index import ReverseIndex
+
+PLAYLISTS = {
+    'p1': {'track_ids': ['t1', 't2', 't1']},
+    'p2': {'track_ids': ['t2', 't3']},
+    'p3': {'track_ids': ['t3']},
+}
+TRACKS = {
+    't1': {'artists': ['a1']},
+    't2': {'artists': ['a1', 'a2']},
+    't3': {'artists': ['a2']},
+}
+
+
+def _lookups(index, track_ids, artist_ids):
+    return ({track_id: sorted(index.playlists_for_track(track_id)) for track_id in track_ids},
+            {artist_id: sorted(index.tracks_for_artist(artist_id)) for artist_id in artist_ids})
+
+
+def test_lookups_deduplicate_repeated_entries():
+    index = ReverseIndex()
+    index.rebuild(PLAYLISTS, TRACKS)
+
+    assert index.playlists_for_track('t1') == ['p1']
+    assert sorted(index.playlists_for_tracks(['t1', 't3'])) == ['p1', 'p2', 'p3']
+    assert sorted(index.tracks_for_artist('a1')) == ['t1', 't2']
+    assert index.playlists_for_track('unknown') == []
+
+
+def test_applied_changes_match_a_rebuild():
+    index = ReverseIndex()
+    index.rebuild(PLAYLISTS, TRACKS)
+
+    playlists = {
+        # t2 moves out of p1, t4 is new
+        'p1': {'track_ids': ['t1', 't4']},
+        'p2': {'track_ids': ['t2', 't3']},
+        # p3 is deleted, p4 is new
+        'p4': {'track_ids': ['t2']},
+    }
+    tracks = {
+        't1': {'artists': ['a1']},
+        # t2 loses an artist and gains another
+        't2': {'artists': ['a2', 'a3']},
+        't3': {'artists': ['a2']},
+        't4': {'artists': ['a1']},
+    }
+    index.apply_changes(playlists, tracks, {
+        'playlists': diff_entities(PLAYLISTS, playlists), 'tracks': diff_entities(TRACKS, tracks)})
+
+    rebuilt = ReverseIndex()
+    rebuilt.rebuild(playlists, tracks)
+    track_ids, artist_ids = ['t1', 't2', 't3', 't4'], ['a1', 'a2', 'a3']
+    assert _lookups(index, track_ids, artist_ids) == _lookups(rebuilt, track_ids, artist_ids)
+    assert index.playlists_for_track('t2') == ['p2', 'p4']
+    assert index.tracks_for_artist('a1') == ['t1', 't4']
+    # Emptied posting lists are dropped rather than kept empty
+    assert all(index._track_playlists.values()) and all(index._artist_tracks.values())
+    assert ({index._tracks.ids[key] for key in index._track_playlists}
+            == {rebuilt._tracks.ids[key] for key in rebuilt._track_playlists})
+
+
+def test_in_place_playlist_edits_are_reindexed():
+    index = ReverseIndex()
+    index.rebuild(PLAYLISTS, TRACKS)
+
+    index.update_playlist('p3', [])
+    index.update_playlist('p1', ['t1'])
+
+    assert index.playlists_for_track('t3') == ['p2']
+    assert index.playlists_for_track('t2') == ['p2']
+    assert index.playlists_for_track('t1') == ['p1']
@@ -0,0 +1,58 @@
+import threading
+
+from app import shared_cache
+from app.shared_cache import SharedCacheReader, SharedCacheWriter
+
+
+def test_publish_and_lookup(tmp_path):
+    writer = SharedCacheWriter(str(tmp_path))
+    reader = SharedCacheReader(str(tmp_path))
+
+    assert writer.publish({'playlists': [1, 2], 'stats': {'num_playlists': 2}}) == 1
+    assert reader.generation == 1
+    assert reader.get_json('playlists') == [1, 2]
+    assert reader.get('missing') is None
+
+
+def test_refresh_request_during_publish_is_kept(tmp_path, monkeypatch):
+    writer = SharedCacheWriter(str(tmp_path))
+    reader = SharedCacheReader(str(tmp_path))
+    serialize = shared_cache.dumps
+
+    def dumps_while_a_worker_requests_a_refresh(payload, sort_keys=False):
+        reader.request_refresh()
+        return serialize(payload, sort_keys=sort_keys)
+
+    monkeypatch.setattr(shared_cache, 'dumps', dumps_while_a_worker_requests_a_refresh)
+    writer.publish({'stats': {}})
+    assert writer.refresh_requests == 1
+    assert reader.generation == 1
+
+
+def test_refresh_request_keeps_newer_generation(tmp_path):
+    writer = SharedCacheWriter(str(tmp_path))
+    reader = SharedCacheReader(str(tmp_path))
+    reader.request_refresh()
+    writer.publish({'stats': {}})
+    reader.request_refresh()
+
+    assert writer.generation == 1
+    assert writer.refresh_requests == 2
+
+
+def test_concurrent_publishers_write_distinct_generations(tmp_path):
+    writers = [SharedCacheWriter(str(tmp_path)) for _ in range(4)]
+    published = []
+
+    def publish(writer, index):
+        for round_index in range(10):
+            published.append(writer.publish({'owner': [index, round_index]}))
+
+    threads = [threading.Thread(target=publish, args=(writer, index)) for index, writer in enumerate(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(published) == list(range(1, 41))
+    assert SharedCacheReader(str(tmp_path)).generation == 40
@@ -0,0 +1,157 @@
+import pytest
+
+from app.change_log import ADDED, REMOVED, UPDATED
+from app.feature_store import AUDIO_FEATURE_FIELDS
+
+
+def _features(track_id, duration_ms=200000):
+    features = {field: 0.5 for field in AUDIO_FEATURE_FIELDS}
+    features.update(id=track_id, analysis_url=f'https://example.com/{track_id}', duration_ms=duration_ms,
+                    key=1, mode=1, time_signature=4)
+    return features
+
+
+def _seed_library(utils):
+    """Two playlists sharing a track, three tracks by two artists, the last track without features."""
+    playlists = {
+        'p1': {'name': 'One', 'track_ids': ['t1', 't2'], 'snapshot_id': 's1'},
+        'p2': {'name': 'Two', 'track_ids': ['t2', 't3'], 'snapshot_id': 's1'},
+    }
+    tracks = {
+        track_id: {'id': track_id, 'name': f'Track {track_id}', 'artists': [artist_id], 'release_date': '2020-01-01',
+                   'popularity': 50}
+        for track_id, artist_id in (('t1', 'a1'), ('t2', 'a2'), ('t3', 'a1'))
+    }
+    for track_id in ('t1', 't2'):
+        tracks[track_id]['audio_features'] = {field: _features(track_id)[field] for field in AUDIO_FEATURE_FIELDS}
+    artists = {
+        'a1': {'name': 'Artist 1', 'genre': ['pop']},
+        'a2': {'name': 'Artist 2', 'genre': ['rock']},
+    }
+    utils.spotify_cache.update_cache(playlists, tracks, artists)
+    utils.update_playlist_metrics_cache_in_bulk(
+        utils.spotify_cache.playlist_cache, utils.spotify_cache.tracks_cache, utils.spotify_cache.artists_cache)
+    utils.rebuild_derived_state()
+
+
+class FakeSpotify:
+    def __init__(self):
+        self.audio_features_calls = []
+
+    def audio_features(self, track_ids):
+        self.audio_features_calls.append(list(track_ids))
+        return [_features(track_id, duration_ms=300000) for track_id in track_ids]
+
+
+def test_track_audio_features_update_recomputes_its_playlists(cache_utils):
+    _seed_library(cache_utils)
+    generation = cache_utils.spotify_cache.generation
+
+    cache_utils.update_track_cache_with_audio_features(FakeSpotify(), 't3')
+
+    assert cache_utils.spotify_cache.tracks_cache['t3']['audio_features']['duration_ms'] == 300000
+    assert cache_utils.audio_features_store.get_many(['t3'])['t3']['duration_ms'] == 300000
+    assert cache_utils.spotify_cache.generation == generation + 1
+    changes = cache_utils.change_log.changes_since(generation)['changes']
+    assert changes['tracks'] == {ADDED: [], REMOVED: [], UPDATED: ['t3']}
+    # Only the playlist holding the track has new metrics
+    assert cache_utils.spotify_cache.playlist_cache['p2']['metrics']['Total Duration'] == round(500 / 3600, 2)
+    assert cache_utils.spotify_cache.playlist_cache['p1']['metrics']['Total Duration'] == round(400 / 3600, 2)
+
+
+def test_track_audio_features_of_an_uncached_track_only_reach_the_store(cache_utils):
+    _seed_library(cache_utils)
+    generation = cache_utils.spotify_cache.generation
+
+    cache_utils.update_track_cache_with_audio_features(FakeSpotify(), 'elsewhere')
+
+    assert 'elsewhere' not in cache_utils.spotify_cache.tracks_cache
+    assert cache_utils.audio_features_store.get_many(['elsewhere'])['elsewhere']['duration_ms'] == 300000
+    assert cache_utils.spotify_cache.generation == generation
+
+
+def test_cache_version_moves_only_once_the_derived_state_is_rebuilt(cache_utils, monkeypatch):
+    from app.models import SpotifyCache
+
+    _seed_library(cache_utils)
+    generation = cache_utils.spotify_cache.generation
+    assert cache_utils.get_cache_version() == generation
+
+    # Another process saves a refreshed cache, this one reloads it and rebuilds the clusters
+    other_process_cache = SpotifyCache(json_file_path=cache_utils.spotify_cache.json_file_path)
+    other_process_cache.update_cache(
+        other_process_cache.playlist_cache, other_process_cache.tracks_cache, other_process_cache.artists_cache)
+    versions_during_rebuild = []
+    rebuild = cache_utils.library_clusters.rebuild
+    monkeypatch.setattr(cache_utils.library_clusters, 'rebuild', lambda *args: (
+        versions_during_rebuild.append(cache_utils.get_cache_version()), rebuild(*args)))
+
+    assert cache_utils.reload_cache_if_changed()
+    assert versions_during_rebuild == [generation]
+    assert cache_utils.get_cache_version() == generation + 1
+
+
+def test_library_store_follows_in_place_hydrations(cache_utils, monkeypatch, tmp_path):
+    from app.library_store import LibraryStore
+
+    monkeypatch.setattr(cache_utils, 'library_store', LibraryStore(str(tmp_path / 'library.db')))
+    _seed_library(cache_utils)
+    assert cache_utils.library_store.playlist('p2')['metrics']['Total Duration'] == round(200 / 3600, 2)
+
+    # Hydrations bump the generation without a refresh, the store must still pick them up
+    cache_utils.update_track_cache_with_audio_features(FakeSpotify(), 't3')
+
+    assert cache_utils.library_store.generation == cache_utils.spotify_cache.generation
+    assert cache_utils.library_store.playlist('p2')['metrics']['Total Duration'] == round(500 / 3600, 2)
+
+
+def test_shared_cache_workers_look_tracks_up_in_the_mapping(cache_utils, monkeypatch, tmp_path):
+    from app.shared_cache import SharedCacheReader, SharedCacheWriter
+
+    _seed_library(cache_utils)
+    expected = cache_utils.get_track_information_from_cache('t1')
+    SharedCacheWriter(str(tmp_path / 'shared')).publish(cache_utils.build_shared_resources())
+    monkeypatch.setattr(cache_utils, 'spotify_cache', None)
+    monkeypatch.setattr(cache_utils, 'shared_cache_reader', SharedCacheReader(str(tmp_path / 'shared')))
+
+    class OfflineSpotify:
+        def tracks(self, track_ids):
+            return {'tracks': [None] * len(track_ids)}
+
+    assert cache_utils.get_track_information_from_cache('t1') == expected
+    assert cache_utils.get_track_information_from_cache('elsewhere') is None
+    tracks, missing = cache_utils.fetch_tracks_information(OfflineSpotify(), ['t2', 'elsewhere', 't1'])
+    assert [track['id'] for track in tracks] == ['t2', 't1']
+    assert missing == ['elsewhere']
+
+
+def test_listening_history_sync_without_a_store_reports_it_unavailable(cache_utils, monkeypatch):
+    # Shared-cache workers open no listening history store
+    monkeypatch.setattr(cache_utils, 'listening_history_store', None)
+
+    assert cache_utils.sync_listening_history(FakeSpotify()) is None
+    assert cache_utils.get_top_tracks_history('short_term') is None
+
+
+def test_playlist_removals_save_the_cache_only_when_a_playlist_was_edited(cache_utils, monkeypatch):
+    _seed_library(cache_utils)
+    saves = []
+    monkeypatch.setattr(cache_utils.spotify_cache, 'save_cache_to_file', lambda: saves.append(True))
+
+    class EditingSpotify:
+        def __init__(self, fail):
+            self.fail = fail
+
+        def playlist_remove_all_occurrences_of_items(self, playlist_id, track_ids, snapshot_id=None):
+            if self.fail:
+                raise RuntimeError('Spotify is unavailable')
+            return {'snapshot_id': 's2'}
+
+    with pytest.raises(RuntimeError):
+        cache_utils.remove_tracks_from_playlists(EditingSpotify(fail=True), {'p1': ['t1']})
+    assert saves == []
+
+    assert cache_utils.remove_tracks_from_playlists(EditingSpotify(fail=False), {'p1': ['t1']}) == {
+        'p1': {'snapshot_id': 's2', 'removed': 1}}
+    assert saves == [True]
+    assert cache_utils.spotify_cache.playlist_cache['p1']['track_ids'] == ['t2']
@@ -0,0 +1,145 @@
+"""
+Compares the two ways of serving the app against the local fake Spotify API with injected latency:
+the WSGI app under gunicorn with worker threads (run:app), and the ASGI app under uvicorn
+(asgi:application), which serves the Spotify-bound routes on one event loop.
+
+Both servers run the actual app, from a scratch copy of it so the benchmark library never touches
+the real cache files, and are driven with the same closed-loop load on the same routes:
+
+- /get-track/<id> with track IDs outside the library, a cache miss calling the Spotify API on every request
+- /get-playlist/<id>, served from the cache (through the Flask fallback in the ASGI app)
+
+    python tools/bench_async.py --latency-ms 200 --concurrency 64 --duration 15 --workers 2 --threads 8
+
+Requires gunicorn, uvicorn and httpx (see requirements-optional.txt).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_spotify_api import FakeLibrary, FakeSpotifyApi  # noqa: E402
+from load_replay import run_step, write_fake_token  # noqa: E402
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+STARTUP_TIMEOUT_SECONDS = 120
+
+
+def uncached_track_paths(library, seed=1):
+    # Track IDs past the ones in the library's playlists are never cached by the app
+    first_uncached = library.num_playlists * library.tracks_per_playlist
+    rng = random.Random(seed)
+    while True:
+        yield f'/get-track/tr{first_uncached + rng.randrange(1000000)}'
+
+
+def cached_playlist_paths(library, seed=1):
+    rng = random.Random(seed)
+    while True:
+        yield f'/get-playlist/pl{rng.randrange(library.num_playlists)}'
+
+
+ROUTES = [
+    ('/get-track/<uncached id>', uncached_track_paths),
+    ('/get-playlist/<id>', cached_playlist_paths),
+]
+
+
+def prepare_app_dir(api_prefix):
+    """Copies the app into a scratch directory with settings pointing at the fake API and a fake token."""
+    app_dir = tempfile.mkdtemp(prefix='bench_async_')
+    shutil.copytree(os.path.join(PROJECT_DIR, 'app'), os.path.join(app_dir, 'app'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    for file_name in ('run.py', 'asgi.py'):
+        shutil.copy(os.path.join(PROJECT_DIR, file_name), app_dir)
+    with open(os.path.join(app_dir, 'settings.json'), 'w') as f:
+        json.dump({'CLIENT_ID': 'benchmark', 'CLIENT_SECRET': 'benchmark', 'REDIRECT_URI': 'http://127.0.0.1/callback',
+                   'SPOTIFY_API_PREFIX': api_prefix}, f)
+    write_fake_token(os.path.join(app_dir, 'token_info.json'))
+    return app_dir
+
+
+def server_command(mode, port, workers, threads):
+    if mode == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+                '--threads', str(threads), '--worker-class', 'gthread', '--timeout', '600', 'run:app']
+    return [sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+            '--log-level', 'warning', 'asgi:application']
+
+
+def start_server(mode, app_dir, port, workers, threads):
+    log = open(os.path.join(app_dir, f'{mode}.log'), 'w')
+    process = subprocess.Popen(server_command(mode, port, workers, threads), cwd=app_dir, stdout=log, stderr=log)
+    target = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{mode} server exited during startup, see {log.name}.")
+        try:
+            # Also warms the cache, so the measured steps do not include the initial crawl
+            if requests.get(target + '/get-all-playlists', timeout=600).ok:
+                return process, target
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"{mode} server did not start within {STARTUP_TIMEOUT_SECONDS} s, see {log.name}.")
+
+
+def bench_mode(mode, library, api_prefix, args):
+    app_dir = prepare_app_dir(api_prefix)
+    workers = args.workers if mode == 'wsgi' else args.async_workers
+    process, target = start_server(mode, app_dir, args.port, workers, args.threads)
+    try:
+        results = {}
+        for route, paths in ROUTES:
+            step = run_step(target, paths(library), args.concurrency, args.duration, None, process.pid)
+            step.pop('routes')
+            results[route] = step
+            print(f"{mode} {route}: {step['throughput_rps']} rps, p50 {step['p50_ms']} ms, "
+                  f"p99 {step['p99_ms']} ms, errors {step['error_rate']:.2%}")
+        return {'mode': mode, 'server': ' '.join(server_command(mode, args.port, workers, args.threads)[2:]),
+                'routes': results}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(app_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=200, help='Injected latency of the fake Spotify API.')
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent client connections.')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of load per route.')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker.')
+    parser.add_argument('--async-workers', type=int, default=1, help='Uvicorn worker processes.')
+    parser.add_argument('--port', type=int, default=8902, help='Port the app under test listens on.')
+    parser.add_argument('--api-port', type=int, default=8901)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--output', help='Write the results as JSON to this path.')
+    args = parser.parse_args()
+
+    library = FakeLibrary()
+    api = FakeSpotifyApi(library, latency_ms=args.latency_ms, port=args.api_port)
+    api_prefix = api.start_in_thread()
+
+    results = [bench_mode(mode, library, api_prefix, args) for mode in args.modes.split(',')]
+    report = {'latency_ms': args.latency_ms, 'concurrency': args.concurrency, 'duration_seconds': args.duration,
+              'results': results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
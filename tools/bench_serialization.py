@@ -0,0 +1,105 @@
+"""
+Measures the serialization CPU time and bytes on the wire of the track list responses, for each
+encoder (standard library json, orjson) and content encoding (identity, gzip, Brotli).
+
+Payloads have the shape returned by /get-all-tracks-for-playlist/<id>, built from the fake library:
+
+    python tools/bench_serialization.py --tracks 5000 --repeat 20 --output serialization.json
+
+With the response cache, a body is encoded once and compressed once per encoding per cache
+generation; later hits serve the memoized bytes, so these costs are paid per refresh, not per request.
+"""
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_spotify_api import FakeLibrary  # noqa: E402
+
+
+def load_serialization_module():
+    # Load the module on its own so the Flask app and its caches are not initialized
+    module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'app', 'serialization.py')
+    spec = importlib.util.spec_from_file_location('serialization', module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def playlist_tracks_payload(library, num_tracks):
+    """Track list in the shape of get_playlist_wise_tracks_information_from_cache."""
+    payload = []
+    for index in range(num_tracks):
+        track = library.track(f'tr{index}')
+        payload.append({
+            'id': track['id'],
+            'name': track['name'],
+            'album': track['album']['name'],
+            'artists': [artist['name'] for artist in track['artists']],
+            'duration_ms': track['duration_ms'],
+            'spotify_url': track['external_urls']['spotify'],
+            'image_url': track['album']['images'][0]['url'],
+            'audo_features': library.audio_features(track['id']),
+        })
+    return payload
+
+
+def timed(function, repeat):
+    """Returns the last result of function() and its median duration in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return result, round(statistics.median(durations) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=5000, help='Tracks in the benchmarked playlist.')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per measurement, the median is reported.')
+    parser.add_argument('--output', help='Write the results as JSON to this path.')
+    args = parser.parse_args()
+
+    serialization = load_serialization_module()
+    payload = playlist_tracks_payload(FakeLibrary(), args.tracks)
+
+    encoders = [('json', lambda: json.dumps(payload, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8'))]
+    if serialization.orjson is not None:
+        encoders.append(('orjson', lambda: serialization.dumps(payload, sort_keys=True)))
+    else:
+        print('orjson is not installed, only the standard library encoder is measured.')
+
+    results = []
+    for encoder, encode in encoders:
+        body, encode_ms = timed(encode, args.repeat)
+        results.append({'encoder': encoder, 'encoding': 'identity', 'encode_ms': encode_ms,
+                         'compress_ms': 0, 'bytes': len(body)})
+        # Compression does not depend on the encoder, measure it once on the first body
+        if encoder != encoders[0][0]:
+            continue
+        for encoding in serialization.SUPPORTED_ENCODINGS:
+            compressed, compress_ms = timed(lambda: serialization.compress(body, encoding), args.repeat)
+            results.append({'encoder': encoder, 'encoding': encoding, 'encode_ms': encode_ms,
+                            'compress_ms': compress_ms, 'bytes': len(compressed)})
+        assert gzip.decompress(serialization.compress(body, 'gzip')) == body
+
+    print(f"{args.tracks} tracks, median of {args.repeat} runs")
+    print(f"{'encoder':<8} {'encoding':<9} {'encode ms':>10} {'compress ms':>12} {'bytes':>10}")
+    for result in results:
+        print(f"{result['encoder']:<8} {result['encoding']:<9} {result['encode_ms']:>10} "
+              f"{result['compress_ms']:>12} {result['bytes']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'tracks': args.tracks, 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
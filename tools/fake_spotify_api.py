@@ -0,0 +1,234 @@
+"""
+Local stand-in for the Spotify Web API, used by the load and benchmark tools.
+
+Serves deterministic synthetic data for the endpoints the app calls, with an injected latency per
+request to mimic a slow upstream. Any bearer token is accepted. Artwork URLs point at /image/<key>
+on the same server, which returns a generated 640x640 PNG, standing in for Spotify's image CDN.
+
+    python tools/fake_spotify_api.py --port 8900 --latency-ms 200
+
+Then point the app at it with "SPOTIFY_API_PREFIX": "http://127.0.0.1:8900/v1/" in settings.json.
+"""
+import argparse
+import asyncio
+import json
+import random
+import struct
+import threading
+import zlib
+from urllib.parse import parse_qs, urlsplit
+
+
+IMAGE_SIZE = 640
+
+
+def generated_png(key, size=IMAGE_SIZE, block=4):
+    """Deterministic PNG of random colour blocks derived from the key, about the weight of real cover art."""
+    rng = random.Random(key)
+    rows = []
+    for _ in range(size // block):
+        row = b'\0' + b''.join(bytes(rng.randrange(256) for _ in range(3)) * block for _ in range(size // block))
+        rows.extend([row] * block)
+
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6))
+            + chunk(b'IEND', b''))
+
+
+class FakeLibrary:
+    """Deterministic synthetic library: playlists, tracks and artists derived from their IDs."""
+
+    def __init__(self, num_playlists=20, tracks_per_playlist=200, num_artists=500, seed=7,
+                 image_base_url='https://i.scdn.co/image/'):
+        self.num_playlists = num_playlists
+        self.tracks_per_playlist = tracks_per_playlist
+        self.num_artists = num_artists
+        self.seed = seed
+        self.image_base_url = image_base_url
+
+    def artist(self, artist_id):
+        index = int(artist_id[2:])
+        rng = random.Random(self.seed * 1000003 + index)
+        return {
+            'id': artist_id,
+            'name': f'Artist {index}',
+            'external_urls': {'spotify': f'https://open.spotify.com/artist/{artist_id}'},
+            'popularity': rng.randint(0, 100),
+            'genres': [f'genre {rng.randint(0, 60)}' for _ in range(rng.randint(0, 3))],
+            'images': [{'url': f'{self.image_base_url}{artist_id}'}],
+        }
+
+    def track(self, track_id):
+        index = int(track_id[2:])
+        rng = random.Random(self.seed * 7919 + index)
+        artist_ids = [f'ar{rng.randrange(self.num_artists)}' for _ in range(rng.randint(1, 2))]
+        return {
+            'id': track_id,
+            'name': f'Track {index}',
+            'artists': [{'id': artist_id, 'name': f'Artist {artist_id[2:]}'} for artist_id in artist_ids],
+            'album': {
+                'name': f'Album {index // 10}',
+                'images': [{'url': f'{self.image_base_url}al{index // 10}'}],
+                'release_date': f'{rng.randint(1965, 2024)}-01-01',
+                'release_date_precision': 'day',
+            },
+            'duration_ms': rng.randint(90000, 420000),
+            'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+        }
+
+    def audio_features(self, track_id):
+        rng = random.Random(self.seed * 104729 + int(track_id[2:]))
+        return {
+            'id': track_id, 'acousticness': rng.random(), 'analysis_url': '', 'danceability': rng.random(),
+            'duration_ms': rng.randint(90000, 420000), 'energy': rng.random(), 'instrumentalness': rng.random(),
+            'key': rng.randint(0, 11), 'liveness': rng.random(), 'loudness': -rng.random() * 30, 'mode': rng.randint(0, 1),
+            'speechiness': rng.random(), 'tempo': 60 + rng.random() * 120, 'time_signature': 4, 'valence': rng.random(),
+        }
+
+    def playlist_track_ids(self, playlist_id):
+        index = int(playlist_id[2:])
+        rng = random.Random(self.seed * 31 + index)
+        pool = self.num_playlists * self.tracks_per_playlist // 2
+        return [f'tr{rng.randrange(pool)}' for _ in range(self.tracks_per_playlist)]
+
+    def playlists(self):
+        return [{
+            'id': f'pl{index}',
+            'name': f'Playlist {index}',
+            'images': [{'url': f'{self.image_base_url}pl{index}'}],
+            'owner': {'display_name': 'Load Test'},
+            'description': '',
+            'snapshot_id': 'snapshot-0',
+        } for index in range(self.num_playlists)]
+
+
+class FakeSpotifyApi:
+    """Tiny asyncio HTTP/1.1 server (keep-alive, GET/POST/DELETE) answering like the Spotify Web API."""
+
+    def __init__(self, library, latency_ms=0, host='127.0.0.1', port=8900):
+        self.library = library
+        self.latency = latency_ms / 1000
+        self.host = host
+        self.port = port
+        self.requests_served = 0
+        self._images = {}
+        # Artwork is served by this server too
+        library.image_base_url = f'http://{host}:{port}/image/'
+
+    def image(self, key):
+        if key not in self._images:
+            self._images[key] = generated_png(key)
+        return self._images[key]
+
+    def route(self, method, path, query):
+        ids = query.get('ids', [''])[0].split(',') if 'ids' in query else []
+        if path.startswith('/image/'):
+            return 200, self.image(path[len('/image/'):])
+        parts = path.strip('/').split('/')[1:]  # drop the "v1" prefix
+
+        if parts == ['me']:
+            return 200, {'id': 'loadtest', 'display_name': 'Load Test', 'email': 'load@test', 'country': 'SE',
+                         'followers': {'total': 0}}
+        if parts == ['me', 'playlists']:
+            return 200, {'items': self.library.playlists(), 'next': None}
+        if parts == ['tracks'] and ids:
+            return 200, {'tracks': [self.library.track(track_id) for track_id in ids]}
+        if len(parts) == 2 and parts[0] == 'tracks':
+            return 200, self.library.track(parts[1])
+        if parts == ['artists']:
+            return 200, {'artists': [self.library.artist(artist_id) for artist_id in ids]}
+        if parts == ['audio-features']:
+            return 200, {'audio_features': [self.library.audio_features(track_id) for track_id in ids]}
+        # Newer spotipy releases page playlist tracks through /items, older ones through /tracks
+        if len(parts) == 3 and parts[0] == 'playlists' and parts[2] in ('tracks', 'items'):
+            if method != 'GET':
+                return 200, {'snapshot_id': 'snapshot-1'}
+            track_ids = self.library.playlist_track_ids(parts[1])
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', ['100'])[0])
+            page = track_ids[offset:offset + limit]
+            next_url = None
+            if offset + limit < len(track_ids):
+                next_url = (f'http://{self.host}:{self.port}/v1/playlists/{parts[1]}/{parts[2]}'
+                            f'?offset={offset + limit}&limit={limit}')
+            return 200, {'items': [{'track': self.library.track(track_id)} for track_id in page], 'next': next_url}
+        return 404, {'error': {'status': 404, 'message': 'Not found'}}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                url = urlsplit(target)
+                status, payload = self.route(method, url.path, parse_qs(url.query))
+                if isinstance(payload, bytes):
+                    body, content_type = payload, 'image/png'
+                else:
+                    body, content_type = json.dumps(payload).encode(), 'application/json'
+                writer.write(
+                    f'HTTP/1.1 {status} OK\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n'.encode()
+                    + body)
+                await writer.drain()
+                self.requests_served += 1
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self):
+        """Runs the server on its own event loop in a daemon thread and returns once it accepts connections."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(
+                asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return f'http://{self.host}:{self.port}/v1/'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--playlists', type=int, default=20)
+    parser.add_argument('--tracks-per-playlist', type=int, default=200)
+    args = parser.parse_args()
+
+    library = FakeLibrary(num_playlists=args.playlists, tracks_per_playlist=args.tracks_per_playlist)
+    api = FakeSpotifyApi(library, latency_ms=args.latency_ms, host=args.host, port=args.port)
+    print(f'Fake Spotify API listening on http://{args.host}:{args.port}/v1/ ({args.latency_ms} ms latency)')
+    asyncio.run(api.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Replays a request mix against a running instance of the app and reports throughput, latency
+percentiles, error rates and the RSS of each worker process, for a sweep of concurrency levels.
+
+The app must talk to the local fake Spotify API, started here on --api-port:
+
+    python tools/load_replay.py --write-token token_info.json
+    # settings.json: "SPOTIFY_API_PREFIX": "http://127.0.0.1:8900/v1/"
+    gunicorn -w 4 run:app &
+    python tools/load_replay.py --target http://127.0.0.1:8000 --pid $(pgrep -f 'gunicorn' | head -1) \\
+        --concurrency 1,4,16,64 --duration 20 --output report
+    python tools/load_replay.py --target http://127.0.0.1:8000 --rate 50,100,200,400 --concurrency 256 --slo-ms 500
+
+Requests follow a synthetic weighted mix over the playlists and tracks of the fake library, or are
+replayed from a file of recorded paths (--replay, one path or access log line per request).
+Without --rate the load is closed-loop and sweeps the concurrency levels. With --rate it is
+open-loop and sweeps the target rates instead, using the highest concurrency level as the pool of
+client connections: requests are scheduled at a fixed rate and latency is measured from the
+scheduled time, so a saturated app shows up as growing latency and a shortfall of the achieved rate.
+"""
+import argparse
+import html
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_spotify_api import FakeLibrary, FakeSpotifyApi  # noqa: E402
+
+# Synthetic mix: route template and relative weight
+DEFAULT_MIX = [
+    ('/', 1),
+    ('/get-all-playlists', 3),
+    ('/get-playlist/{playlist_id}', 3),
+    ('/playlist-metrics/{playlist_id}', 2),
+    ('/get-all-tracks-for-playlist/{playlist_id}', 3),
+    ('/get-track/{track_id}', 2),
+]
+
+# A concurrency step saturates the app when it adds less than this much throughput (closed loop)
+SATURATION_THROUGHPUT_GAIN = 0.05
+# A target rate saturates the app when the achieved rate falls short of it by more than this (open loop)
+SATURATION_RATE_SHORTFALL = 0.05
+
+ACCESS_LOG_REQUEST = re.compile(r'"(?:GET|POST|PUT|DELETE) (\S+)')
+
+
+def synthetic_paths(library, seed=1):
+    rng = random.Random(seed)
+    templates = [template for template, _ in DEFAULT_MIX]
+    weights = [weight for _, weight in DEFAULT_MIX]
+    while True:
+        template = rng.choices(templates, weights)[0]
+        playlist_id = f'pl{rng.randrange(library.num_playlists)}'
+        track_id = rng.choice(library.playlist_track_ids(playlist_id))
+        yield template.format(playlist_id=playlist_id, track_id=track_id)
+
+
+def replayed_paths(path):
+    with open(path) as f:
+        recorded = []
+        for line in f:
+            match = ACCESS_LOG_REQUEST.search(line)
+            recorded_path = match.group(1) if match else line.strip()
+            if recorded_path:
+                recorded.append(recorded_path)
+    if not recorded:
+        raise SystemExit(f"No requests found in {path}.")
+    while True:
+        yield from recorded
+
+
+def route_of(path):
+    # Group /get-playlist/pl3 and /get-playlist/pl7 under the same route
+    parts = path.split('?')[0].rstrip('/').split('/')
+    return '/'.join(parts[:2]) + ('/<id>' if len(parts) > 2 else '') if len(parts) > 1 else '/'
+
+
+def process_tree_rss(root_pid):
+    """Returns the RSS in MB of a process and each of its descendants, keyed by PID. Linux only."""
+    rss = {}
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss[pid] = round(int(line.split()[1]) / 1024, 1)
+            for task in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return rss
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_step(target, paths, concurrency, duration, rate, pid):
+    """Runs one load step and returns its measurements."""
+    results = []
+    results_lock = threading.Lock()
+    paths_lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    next_index = [0]
+
+    def next_request():
+        with paths_lock:
+            index = next_index[0]
+            next_index[0] += 1
+            return index, next(paths)
+
+    def worker():
+        session = requests.Session()
+        while True:
+            index, path = next_request()
+            scheduled = start + index / rate if rate else time.perf_counter()
+            if scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                response = session.get(target + path, timeout=60)
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+            latency = time.perf_counter() - scheduled
+            with results_lock:
+                results.append((route_of(path), status, latency))
+
+    peak_rss = {}
+
+    def sample_rss():
+        while time.perf_counter() < deadline:
+            for worker_pid, rss in process_tree_rss(pid).items():
+                peak_rss[worker_pid] = max(rss, peak_rss.get(worker_pid, 0))
+            time.sleep(1)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    if pid:
+        threads.append(threading.Thread(target=sample_rss, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return summarize_step(results, elapsed, concurrency, rate, peak_rss)
+
+
+def summarize_step(results, elapsed, concurrency, rate, peak_rss):
+    def summarize(step_results):
+        latencies = sorted(latency for _, status, latency in step_results)
+        errors = sum(1 for _, status, _ in step_results if status is None or status >= 500)
+        return {
+            'requests': len(step_results),
+            'errors': errors,
+            'error_rate': round(errors / len(step_results), 4) if step_results else 0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+        }
+
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[result[0]].append(result)
+
+    return dict(
+        summarize(results),
+        concurrency=concurrency,
+        target_rate=rate,
+        elapsed_seconds=round(elapsed, 2),
+        throughput_rps=round(len(results) / elapsed, 1) if elapsed else 0,
+        routes={route: summarize(route_results) for route, route_results in sorted(by_route.items())},
+        worker_rss_mb={str(pid): rss for pid, rss in sorted(peak_rss.items())},
+    )
+
+
+def find_saturation(steps, slo_ms):
+    """
+    Returns the concurrency at which throughput stops growing or the p99 exceeds the SLO, for a
+    closed-loop sweep. Adding concurrency says nothing once the rate is fixed, see find_saturation_rate.
+    """
+    for previous, step in zip(steps, steps[1:]):
+        if step['throughput_rps'] < previous['throughput_rps'] * (1 + SATURATION_THROUGHPUT_GAIN):
+            return previous['concurrency']
+        if slo_ms and step['p99_ms'] and step['p99_ms'] > slo_ms:
+            return previous['concurrency']
+    return None
+
+
+def find_saturation_rate(steps, slo_ms):
+    """
+    Returns the first target rate of an open-loop sweep the app did not sustain: the achieved rate
+    fell short of it, or the p99 (measured from the scheduled times) exceeded the SLO.
+    """
+    for step in steps:
+        if step['throughput_rps'] < step['target_rate'] * (1 - SATURATION_RATE_SHORTFALL):
+            return step['target_rate']
+        if slo_ms and step['p99_ms'] and step['p99_ms'] > slo_ms:
+            return step['target_rate']
+    return None
+
+
+def write_html_report(report, path):
+    level = 'target_rate' if report['target_rates'] else 'concurrency'
+    columns = [level, 'throughput_rps', 'requests', 'error_rate', 'p50_ms', 'p95_ms', 'p99_ms']
+    rows = []
+    for step in report['steps']:
+        cells = ''.join(f'<td>{html.escape(str(step[column]))}</td>' for column in columns)
+        rss = ', '.join(f'{pid}: {rss} MB' for pid, rss in step['worker_rss_mb'].items())
+        rows.append(f'<tr>{cells}<td>{html.escape(rss)}</td></tr>')
+        for route, route_summary in step['routes'].items():
+            route_cells = ''.join(
+                f'<td>{html.escape(str(route_summary.get(column, "")))}</td>' for column in columns[2:])
+            rows.append(f'<tr class="route"><td></td><td>{html.escape(route)}</td>{route_cells}<td></td></tr>')
+
+    with open(path, 'w') as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Load replay report</title>
+<style>
+body {{ font-family: sans-serif; margin: 2rem; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}
+tr.route td {{ color: #666; font-size: 0.9em; }}
+</style></head><body>
+<h1>Load replay report</h1>
+<p>Target: {html.escape(report['target'])}, {report['duration_seconds']} s per step,
+{html.escape(saturation_summary(report))}</p>
+<table>
+<tr>{''.join(f'<th>{column}</th>' for column in columns)}<th>worker RSS (peak)</th></tr>
+{''.join(rows)}
+</table></body></html>
+""")
+
+
+def saturation_summary(report):
+    if report['target_rates']:
+        return (f"open loop at {report['steps'][0]['concurrency']} connections, "
+                f"first unsustained rate: {report['saturation_rate']} rps")
+    return f"closed loop, saturation at concurrency: {report['saturation_concurrency']}"
+
+
+def write_fake_token(path):
+    """Writes a long-lived token the app accepts; the fake API accepts any bearer token."""
+    with open(path, 'w') as f:
+        json.dump({
+            'access_token': 'loadtest', 'token_type': 'Bearer', 'expires_in': 3600,
+            'refresh_token': 'loadtest', 'expires_at': int(time.time()) + 10 * 365 * 86400,
+            'scope': 'user-read-private user-read-email user-read-recently-played user-top-read '
+                     'playlist-modify-public playlist-modify-private',
+        }, f)
+    print(f'Wrote fake token to {path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='http://127.0.0.1:5000', help='Base URL of the app under test.')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels to sweep.')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per concurrency level.')
+    parser.add_argument('--rate', help='Comma-separated target request rates to sweep (open loop, using the highest '
+                                       'concurrency level as client connections); closed loop if omitted.')
+    parser.add_argument('--replay', help='File of recorded request paths or access log lines.')
+    parser.add_argument('--pid', type=int, help='PID of the app (e.g. the gunicorn master) to sample worker RSS.')
+    parser.add_argument('--slo-ms', type=float, help='p99 latency above which a level counts as saturated.')
+    parser.add_argument('--output', default='load_report', help='Report path, without extension (.json and .html).')
+    parser.add_argument('--api-port', type=int, default=8900)
+    parser.add_argument('--api-latency-ms', type=float, default=100)
+    parser.add_argument('--playlists', type=int, default=20)
+    parser.add_argument('--tracks-per-playlist', type=int, default=200)
+    parser.add_argument('--no-api', action='store_true', help='Do not start the fake Spotify API (already running).')
+    parser.add_argument('--write-token', metavar='PATH', help='Write a fake token_info.json for the app and exit.')
+    args = parser.parse_args()
+
+    if args.write_token:
+        write_fake_token(args.write_token)
+        return
+
+    library = FakeLibrary(num_playlists=args.playlists, tracks_per_playlist=args.tracks_per_playlist)
+    if not args.no_api:
+        api = FakeSpotifyApi(library, latency_ms=args.api_latency_ms, port=args.api_port)
+        print(f'Fake Spotify API listening on {api.start_in_thread()}')
+
+    paths = replayed_paths(args.replay) if args.replay else synthetic_paths(library)
+    target = args.target.rstrip('/')
+
+    # Warm the app's cache so the first step does not measure the initial crawl
+    requests.get(target + '/get-all-playlists', timeout=600)
+
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+    target_rates = [float(rate) for rate in args.rate.split(',')] if args.rate else []
+    if target_rates:
+        levels = [(max(concurrency_levels), rate) for rate in target_rates]
+    else:
+        levels = [(concurrency, None) for concurrency in concurrency_levels]
+
+    steps = []
+    for concurrency, rate in levels:
+        step = run_step(target, paths, concurrency, args.duration, rate, args.pid)
+        steps.append(step)
+        print(f"{f'rate {rate}' if rate else f'concurrency {concurrency}'}: {step['throughput_rps']} rps, "
+              f"p50 {step['p50_ms']} ms, p95 {step['p95_ms']} ms, p99 {step['p99_ms']} ms, errors {step['error_rate']:.2%}")
+
+    report = {
+        'target': target,
+        'target_rates': target_rates,
+        'duration_seconds': args.duration,
+        'mix': 'replay' if args.replay else DEFAULT_MIX,
+        'steps': steps,
+        'saturation_concurrency': None if target_rates else find_saturation(steps, args.slo_ms),
+        'saturation_rate': find_saturation_rate(steps, args.slo_ms) if target_rates else None,
+    }
+    with open(args.output + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    write_html_report(report, args.output + '.html')
+    print(f"{saturation_summary(report)}, report written to {args.output}.json and {args.output}.html")
+
+
+if __name__ == '__main__':
+    main()